@@ -7,38 +7,89 @@ from .models import (
     Tratamiento,
     Medicamento,
     RecetaMedica,
+    MovimientoInventario,
+    FacturaAseguradora,
+    FacturaPaciente,
     Seguro,
     Horario,
     CitaMedica,
     HistorialClinico,
 )
+from .autocompletar import FUENTES
 
-class MedicoAdmin(admin.ModelAdmin):
+class BusquedaIndexadaMixin:
+    """
+    Búsqueda del changelist y del autocompletado de FK con el mismo filtro
+    que /web/autocompletar/<fuente>/ (rangos de prefijo sobre columnas
+    indexadas) en vez de los istartswith/icontains de search_fields.
+    """
+    fuente_busqueda = None
+
+    def get_search_results(self, request, queryset, search_term):
+        termino = search_term.strip()
+        if not termino:
+            return queryset, False
+        return queryset.filter(FUENTES[self.fuente_busqueda].filtro(termino)), False
+
+class EspecialidadAdmin(BusquedaIndexadaMixin, admin.ModelAdmin):
+    list_display = ('nombre', 'descripcion')
+    search_fields = ('nombre',) # Ver get_search_results
+    fuente_busqueda = 'especialidades'
+    ordering = ('nombre',)
+
+class MedicoAdmin(BusquedaIndexadaMixin, admin.ModelAdmin):
     list_display = ('rut', 'nombre', 'apellido', 'genero', 'especialidad', 'telefono', 'activo')
     list_display_links = ('rut', 'nombre', 'apellido')
-    search_fields = ('rut', 'nombre', 'apellido', 'correo')
+    # RUT, correo o prefijo de nombre/apellido sobre las claves indexadas (también
+    # lo usa el autocompletado de FK de horarios, citas e historiales)
+    search_fields = ('rut', 'apellido', 'nombre', 'correo') # Ver get_search_results
+    fuente_busqueda = 'medicos'
+    autocomplete_fields = ('especialidad',)
     list_filter = ('especialidad', 'genero', 'activo')
     ordering = ('apellido',)
 
-class ConsultaMedicaAdmin(admin.ModelAdmin):
+    def get_queryset(self, request):
+        # __str__ de Medico muestra la especialidad (changelist y autocompletado)
+        return super().get_queryset(request).select_related('especialidad')
+
+class ConsultaMedicaAdmin(BusquedaIndexadaMixin, admin.ModelAdmin):
     list_display = ('id', 'paciente', 'medico', 'fecha_consulta', 'estado', 'prioridad')
-    search_fields = ('paciente__rut', 'medico__rut', 'motivo')
+    # N° de consulta, o paciente/médico por sus claves indexadas (también lo usa
+    # el autocompletado de FK de tratamientos y citas)
+    search_fields = ('paciente__rut', 'medico__rut') # Ver get_search_results
+    fuente_busqueda = 'consultas'
     list_filter = ('estado', 'prioridad', 'fecha_consulta')
     date_hierarchy = 'fecha_consulta'
+    ordering = ('-fecha_consulta',)
+    autocomplete_fields = ('paciente', 'medico')
+
+    def get_queryset(self, request):
+        # __str__ de ConsultaMedica muestra paciente y médico (changelist y autocompletado)
+        return super().get_queryset(request).select_related('paciente', 'medico__especialidad')
 
 class PacienteAdmin(admin.ModelAdmin):
     list_display = ('rut', 'nombre', 'apellido', 'genero', 'tipo_sangre', 'telefono', 'activo')
     list_display_links = ('rut', 'nombre', 'apellido')
-    search_fields = ('rut', 'nombre', 'apellido', 'correo')
+    search_fields = ('rut', 'apellido', 'nombre', 'correo') # Ver get_search_results
     list_filter = ('genero', 'tipo_sangre', 'activo')
     ordering = ('apellido',)
 
-class MedicamentoAdmin(admin.ModelAdmin):
-    list_display = ('nombre', 'laboratorio', 'categoria', 'stock', 'precio_unitario')
+    def get_search_results(self, request, queryset, search_term):
+        # RUT en cualquier formato, correo o prefijo de nombre/apellido sobre las
+        # claves indexadas (también lo usa el autocompletado de SeguroAdmin)
+        if not search_term.strip():
+            return queryset, False
+        return queryset.buscar(search_term), False
+
+class MedicamentoAdmin(BusquedaIndexadaMixin, admin.ModelAdmin):
+    list_display = ('nombre', 'laboratorio', 'categoria', 'stock', 'stock_minimo', 'precio_unitario')
     list_display_links = ('nombre',)
-    search_fields = ('nombre', 'laboratorio')
+    search_fields = ('nombre',) # Ver get_search_results
+    fuente_busqueda = 'medicamentos'
     list_filter = ('categoria', 'laboratorio')
     ordering = ('nombre',)
+    # El stock cambia solo con movimientos de inventario (ver api/inventario.py)
+    readonly_fields = ('stock',)
 
 class SeguroAdmin(admin.ModelAdmin):
     list_display = ('numero_poliza', 'paciente', 'nombre_aseguradora', 'tipo_cobertura', 'porcentaje_cobertura', 'fecha_vencimiento', 'activo')
@@ -47,12 +98,14 @@ class SeguroAdmin(admin.ModelAdmin):
     list_filter = ('tipo_cobertura', 'activo', 'nombre_aseguradora')
     date_hierarchy = 'fecha_vencimiento'
     ordering = ('-fecha_vencimiento',)
+    autocomplete_fields = ('paciente',)
 
 class HorarioAdmin(admin.ModelAdmin):
     list_display = ('medico', 'dia_semana', 'hora_inicio', 'hora_fin', 'duracion_consulta_minutos', 'activo')
     list_filter = ('dia_semana', 'activo', 'medico__especialidad')
     search_fields = ('medico__nombre', 'medico__apellido', 'medico__rut')
     ordering = ('medico', 'dia_semana', 'hora_inicio')
+    autocomplete_fields = ('medico',)
 
 class CitaMedicaAdmin(admin.ModelAdmin):
     list_display = ('id', 'paciente', 'medico', 'fecha_hora_cita', 'estado', 'consulta_realizada')
@@ -61,6 +114,7 @@ class CitaMedicaAdmin(admin.ModelAdmin):
     list_filter = ('estado', 'fecha_hora_cita', 'medico__especialidad')
     date_hierarchy = 'fecha_hora_cita'
     ordering = ('-fecha_hora_cita',)
+    autocomplete_fields = ('paciente', 'medico', 'consulta_realizada')
 
 class HistorialClinicoAdmin(admin.ModelAdmin):
     list_display = ('id', 'paciente', 'tipo_registro', 'fecha_registro', 'registrado_por')
@@ -69,6 +123,60 @@ class HistorialClinicoAdmin(admin.ModelAdmin):
     list_filter = ('tipo_registro', 'fecha_registro', 'registrado_por')
     date_hierarchy = 'fecha_registro'
     ordering = ('-fecha_registro',)
+    autocomplete_fields = ('paciente', 'registrado_por')
+
+class TratamientoAdmin(BusquedaIndexadaMixin, admin.ModelAdmin):
+    list_display = ('id', 'consulta', 'descripcion', 'duracion_dias')
+    list_select_related = ('consulta__paciente', 'consulta__medico')
+    search_fields = ('descripcion',) # Ver get_search_results
+    fuente_busqueda = 'tratamientos'
+    autocomplete_fields = ('consulta',)
+
+class RecetaMedicaAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tratamiento', 'medicamento', 'dosis', 'frecuencia', 'via_administracion', 'cantidad')
+    list_select_related = ('tratamiento', 'medicamento')
+    autocomplete_fields = ('tratamiento', 'medicamento')
+
+class MovimientoInventarioAdmin(admin.ModelAdmin):
+    # Libro de solo lectura: los movimientos se registran desde la API y las recetas
+    list_display = ('id', 'medicamento', 'tipo', 'cantidad', 'receta_id', 'fecha', 'nota')
+    list_select_related = ('medicamento',)
+    list_filter = ('tipo',)
+    date_hierarchy = 'fecha'
+    ordering = ('-fecha', '-id')
+    autocomplete_fields = ('medicamento',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+class FacturaAseguradoraAdmin(admin.ModelAdmin):
+    # Solo lectura: las filas las reemplaza el comando facturar_mes
+    list_display = ('periodo', 'aseguradora', 'pacientes', 'recetas', 'total', 'cubierto', 'copago', 'generado')
+    list_filter = ('periodo',)
+    search_fields = ('aseguradora',)
+    ordering = ('-periodo', 'aseguradora')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+class FacturaPacienteAdmin(FacturaAseguradoraAdmin):
+    list_display = ('periodo', 'aseguradora', 'paciente', 'recetas', 'total', 'cubierto', 'copago')
+    list_select_related = ('paciente',)
+    search_fields = ('aseguradora', 'paciente__rut', 'paciente__apellido')
+    ordering = ('-periodo', 'aseguradora', 'paciente')
+    autocomplete_fields = ('paciente',)
 
 admin.site.register(Medico, MedicoAdmin)
 admin.site.register(ConsultaMedica, ConsultaMedicaAdmin)
@@ -78,6 +186,9 @@ admin.site.register(Seguro, SeguroAdmin)
 admin.site.register(Horario, HorarioAdmin)
 admin.site.register(CitaMedica, CitaMedicaAdmin)
 admin.site.register(HistorialClinico, HistorialClinicoAdmin)
-admin.site.register(Especialidad)
-admin.site.register(Tratamiento)
-admin.site.register(RecetaMedica)
+admin.site.register(Especialidad, EspecialidadAdmin)
+admin.site.register(Tratamiento, TratamientoAdmin)
+admin.site.register(RecetaMedica, RecetaMedicaAdmin)
+admin.site.register(MovimientoInventario, MovimientoInventarioAdmin)
+admin.site.register(FacturaAseguradora, FacturaAseguradoraAdmin)
+admin.site.register(FacturaPaciente, FacturaPacienteAdmin)
@@ -0,0 +1,145 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .models import Medico, Horario, CitaMedica
+from .disponibilidad import (
+    ESTADOS_CITA_LIBERAN_CUPO,
+    DURACION_POR_DEFECTO_MINUTOS,
+    IndiceIntervalos,
+    cargar_horarios,
+    duracion_cita,
+)
+
+# ======================================================================
+# SERVICIO DE AGENDAMIENTO DE CITAS
+# Serializa las reservas que compiten por la agenda de un mismo médico:
+# cada escritura toma un bloqueo de fila sobre el Medico dentro de una
+# transacción, revisa solapamientos y recién entonces guarda la cita.
+# Las reservas de médicos distintos bloquean filas distintas y siguen
+# ejecutándose en paralelo. La restricción única (medico, fecha_hora_cita)
+# del modelo es la última barrera si dos escrituras llegan a la vez.
+# Los lotes (/api/citas/lote/) bloquean de una vez a todos sus médicos y
+# revisan cada cita contra las ya agendadas y contra las del mismo lote.
+# ======================================================================
+
+
+class CitaNoDisponible(APIException):
+    """ El cupo pedido ya está ocupado por otra cita del médico (HTTP 409). """
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'El médico ya tiene una cita agendada en ese horario.'
+    default_code = 'cita_no_disponible'
+
+
+def hay_solapamiento(medico_id, fecha_hora, excluir_id=None):
+    """
+    Indica si una cita del médico en 'fecha_hora' se solapa con otra ya
+    agendada (no cancelada). La duración de cada cita se toma del bloque
+    de Horario que la contiene.
+    """
+    horarios = list(Horario.objects.filter(medico_id=medico_id, activo=True).order_by())
+    duracion = duracion_cita(horarios, fecha_hora)
+    duracion_maxima = _duracion_maxima(horarios)
+
+    citas = (
+        CitaMedica.objects
+        .filter(
+            medico_id=medico_id,
+            fecha_hora_cita__gt=fecha_hora - duracion_maxima,
+            fecha_hora_cita__lt=fecha_hora + duracion,
+        )
+        .exclude(estado__in=ESTADOS_CITA_LIBERAN_CUPO)
+        .order_by()
+    )
+    if excluir_id is not None:
+        citas = citas.exclude(pk=excluir_id)
+
+    indice = IndiceIntervalos(
+        (inicio, inicio + duracion_cita(horarios, inicio))
+        for inicio in citas.values_list('fecha_hora_cita', flat=True)
+    )
+    return indice.solapa(fecha_hora, fecha_hora + duracion)
+
+
+def agendar_cita(serializer):
+    """
+    Guarda la cita de un CitaMedicaSerializer ya validado (alta o edición)
+    sólo si el cupo está libre. Lanza CitaNoDisponible en caso contrario.
+    """
+    instancia = serializer.instance
+    datos = serializer.validated_data
+    medico = datos.get('medico') or instancia.medico
+    fecha_hora = datos.get('fecha_hora_cita') or instancia.fecha_hora_cita
+    estado = datos.get('estado') or (instancia.estado if instancia else 'AGENDADA')
+
+    try:
+        with transaction.atomic():
+            # Bloqueo de fila por médico: las reservas de un mismo médico
+            # esperan su turno, las de otros médicos no se ven afectadas.
+            list(Medico.objects.select_for_update().filter(pk=medico.pk).values_list('pk'))
+            if estado not in ESTADOS_CITA_LIBERAN_CUPO and hay_solapamiento(
+                medico.pk, fecha_hora, excluir_id=instancia.pk if instancia else None
+            ):
+                raise CitaNoDisponible()
+            return serializer.save()
+    except IntegrityError:
+        raise CitaNoDisponible()
+
+
+def _duracion_maxima(horarios):
+    return max(
+        [timedelta(minutes=h.duracion_consulta_minutos) for h in horarios]
+        + [timedelta(minutes=DURACION_POR_DEFECTO_MINUTOS)]
+    )
+
+
+def comprobar_cupos_lote(citas):
+    """
+    Revisa los cupos de un lote de citas (altas o ediciones aún sin
+    guardar) contra las citas ya agendadas y entre sí. Se llama dentro de
+    la transacción que escribe el lote: bloquea las filas de sus médicos,
+    en orden de id, hasta que el lote se confirma. Lanza CitaNoDisponible.
+    """
+    por_medico = defaultdict(list)
+    for cita in citas:
+        if cita.estado not in ESTADOS_CITA_LIBERAN_CUPO:
+            por_medico[cita.medico_id].append(cita)
+    if not por_medico:
+        return
+    list(Medico.objects.select_for_update().filter(pk__in=sorted(por_medico)).order_by('pk').values_list('pk'))
+    horarios_por_medico = cargar_horarios(list(por_medico))
+    # Las citas editadas en el lote se revisan con sus valores nuevos, no con los guardados
+    del_lote = [cita.pk for cita in citas if cita.pk is not None]
+
+    for medico_id, propias in por_medico.items():
+        horarios = horarios_por_medico[medico_id]
+        intervalos = sorted(
+            (cita.fecha_hora_cita, cita.fecha_hora_cita + duracion_cita(horarios, cita.fecha_hora_cita))
+            for cita in propias
+        )
+        max_fin = None
+        for inicio, fin in intervalos:
+            if max_fin is not None and inicio < max_fin:
+                raise CitaNoDisponible('Dos citas del lote ocupan el mismo horario del médico.')
+            max_fin = fin if max_fin is None or fin > max_fin else max_fin
+
+        agendadas = (
+            CitaMedica.objects
+            .filter(
+                medico_id=medico_id,
+                fecha_hora_cita__gt=intervalos[0][0] - _duracion_maxima(horarios),
+                fecha_hora_cita__lt=max_fin,
+            )
+            .exclude(estado__in=ESTADOS_CITA_LIBERAN_CUPO)
+            .exclude(pk__in=del_lote)
+            .order_by()
+        )
+        indice = IndiceIntervalos(
+            (inicio, inicio + duracion_cita(horarios, inicio))
+            for inicio in agendadas.values_list('fecha_hora_cita', flat=True)
+        )
+        if any(indice.solapa(inicio, fin) for inicio, fin in intervalos):
+            raise CitaNoDisponible()
@@ -1,6 +1,40 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from .inventario import liberar_receta
+        from . import resumenes
+        from .versiones import (
+            MODELOS_VERSIONADOS, PARTICIONES, modelo_eliminado, modelo_guardado, recordar_particiones,
+        )
+
+        # Versiones por modelo para la caché de respuestas y los ETag (ver api/versiones.py)
+        for etiqueta in MODELOS_VERSIONADOS:
+            modelo = self.apps.get_model(etiqueta)
+            post_save.connect(modelo_guardado, sender=modelo, dispatch_uid=f'api_versiones_post_save_{etiqueta}')
+            post_delete.connect(modelo_eliminado, sender=modelo, dispatch_uid=f'api_versiones_post_delete_{etiqueta}')
+        for etiqueta in PARTICIONES:
+            post_init.connect(
+                recordar_particiones,
+                sender=self.apps.get_model(etiqueta),
+                dispatch_uid=f'api_versiones_post_init_{etiqueta}',
+            )
+        # Anular una receta (también en cascada o por lotes) devuelve su reserva de stock
+        post_delete.connect(
+            liberar_receta, sender=self.get_model('RecetaMedica'), dispatch_uid='api_inventario_liberar_receta',
+        )
+        # Resúmenes para tableros: cada alta, edición o baja ajusta sus grupos (ver api/resumenes.py)
+        for modelo in resumenes.SEGUIDOS:
+            nombre = modelo._meta.model_name
+            post_init.connect(resumenes.recordar_valores, sender=modelo, dispatch_uid=f'api_resumenes_post_init_{nombre}')
+            pre_save.connect(resumenes.antes_de_guardar, sender=modelo, dispatch_uid=f'api_resumenes_pre_save_{nombre}')
+            pre_delete.connect(resumenes.antes_de_guardar, sender=modelo,
+                               dispatch_uid=f'api_resumenes_pre_delete_{nombre}')
+            post_save.connect(resumenes.fila_guardada, sender=modelo, dispatch_uid=f'api_resumenes_post_save_{nombre}')
+            post_delete.connect(resumenes.fila_eliminada, sender=modelo,
+                                dispatch_uid=f'api_resumenes_post_delete_{nombre}')
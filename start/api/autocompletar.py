@@ -0,0 +1,161 @@
+from urllib.parse import quote
+
+from django.db.models import Q
+
+from .models import (
+    Especialidad,
+    Paciente,
+    Medico,
+    ConsultaMedica,
+    Tratamiento,
+    Medicamento,
+    condicion_busqueda_paciente,
+    plegar,
+)
+from .versiones import cache_activa, cache_respuestas, versiones
+
+# ======================================================================
+# AUTOCOMPLETADO PARA LOS SELECTORES DE FK
+# Cada fuente busca por prefijo en campos indexados (el RUT o las claves
+# plegadas de cada modelo, ver api/models.py) y devuelve como máximo
+# LIMITE_RESULTADOS pares (id, texto) armados con values(), sin instanciar
+# modelos ni llamar a __str__. Las respuestas se guardan en la caché
+# 'respuestas' con las versiones de los modelos que muestran (ver
+# api/versiones.py): un paciente o médico recién creado aparece en la
+# siguiente búsqueda, sin esperar a que la entrada venza.
+# ======================================================================
+
+LIMITE_RESULTADOS = 20
+LARGO_MINIMO = 2
+SEGUNDOS_CACHE = 60
+
+
+def prefijo_rango(campo, prefijo):
+    """
+    Filtro "empieza con" expresado como rango (campo >= p AND campo < p + U+FFFF).
+    A diferencia de LIKE, lo resuelve el índice B-tree del campo en cualquier motor.
+    """
+    return Q(**{f'{campo}__gte': prefijo, f'{campo}__lt': prefijo + '\uffff'})
+
+
+class Fuente:
+    """ Describe cómo buscar y rotular los registros de un modelo. """
+
+    def __init__(self, modelo, columnas, filtro, etiqueta, orden, relacionados=()):
+        self.modelo = modelo
+        self.columnas = columnas
+        self.filtro = filtro
+        self.etiqueta = etiqueta
+        self.orden = orden
+        # Otros modelos cuyos datos aparecen en el rótulo (invalidan la caché)
+        self.relacionados = relacionados
+
+    def buscar(self, termino):
+        filas = (
+            self.modelo.objects.filter(self.filtro(termino))
+            .order_by(*self.orden)
+            .values(*self.columnas)[:LIMITE_RESULTADOS]
+        )
+        return [{'id': fila['id'], 'texto': self.etiqueta(fila)} for fila in filas]
+
+    def texto(self, pk):
+        """ Rótulo de un registro puntual (para mostrar el valor inicial del widget). """
+        fila = self.modelo.objects.filter(pk=pk).values(*self.columnas).first()
+        return self.etiqueta(fila) if fila else ''
+
+
+def _filtro_persona(termino):
+    if '@' in termino:
+        return prefijo_rango('correo', termino)
+    clave = plegar(termino)
+    return (prefijo_rango('rut', termino) | prefijo_rango('busqueda_apellido', clave)
+            | prefijo_rango('busqueda_nombre', clave))
+
+
+def _filtro_id_o(campo):
+    # Un número busca por id exacto; un texto, por prefijo de la clave plegada 'campo'
+    def filtro(termino):
+        if termino.isdigit():
+            return Q(pk=int(termino))
+        return prefijo_rango(campo, plegar(termino))
+    return filtro
+
+
+def _filtro_consulta(termino):
+    # Un número busca por id exacto; un texto, por paciente (RUT, correo o
+    # nombre) o por médico. Primero se resuelven las personas con sus
+    # índices y luego sus consultas con los índices de paciente y médico.
+    if termino.isdigit():
+        return Q(pk=int(termino))
+    pacientes = Paciente.objects.filter(condicion_busqueda_paciente(termino)).values('pk')
+    medicos = Medico.objects.filter(_filtro_persona(termino)).values('pk')
+    return Q(paciente__in=pacientes) | Q(medico__in=medicos)
+
+
+FUENTES = {
+    'pacientes': Fuente(
+        Paciente,
+        ('id', 'rut', 'nombre', 'apellido'),
+        condicion_busqueda_paciente,
+        lambda f: f"{f['nombre']} {f['apellido']} ({f['rut']})",
+        ('apellido', 'nombre'),
+    ),
+    'medicos': Fuente(
+        Medico,
+        ('id', 'nombre', 'apellido', 'especialidad__nombre'),
+        _filtro_persona,
+        lambda f: f"Dr(a). {f['nombre']} {f['apellido']} - {f['especialidad__nombre']}",
+        ('apellido', 'nombre'),
+        (Especialidad,),
+    ),
+    'especialidades': Fuente(
+        Especialidad,
+        ('id', 'nombre'),
+        lambda t: prefijo_rango('busqueda_nombre', plegar(t)),
+        lambda f: f['nombre'],
+        ('busqueda_nombre',),
+    ),
+    'consultas': Fuente(
+        ConsultaMedica,
+        ('id', 'paciente__apellido', 'medico__apellido'),
+        _filtro_consulta,
+        lambda f: f"Consulta N°{f['id']} - {f['paciente__apellido']} con Dr(a). {f['medico__apellido']}",
+        ('-id',),
+        (Paciente, Medico),
+    ),
+    'tratamientos': Fuente(
+        Tratamiento,
+        ('id', 'consulta_id', 'descripcion'),
+        _filtro_id_o('busqueda_descripcion'),
+        lambda f: f"Tratamiento de Consulta N°{f['consulta_id']} - {f['descripcion'][:30]}...",
+        ('-id',),
+    ),
+    'medicamentos': Fuente(
+        Medicamento,
+        ('id', 'nombre', 'laboratorio'),
+        lambda t: prefijo_rango('busqueda_nombre', plegar(t)),
+        lambda f: f"{f['nombre']} ({f['laboratorio']})",
+        ('busqueda_nombre',),
+    ),
+}
+
+
+def autocompletar(nombre_fuente, termino):
+    """
+    Resultados de autocompletado para 'termino' en la fuente indicada.
+    Los términos más cortos que LARGO_MINIMO (salvo ids) no consultan la base de datos.
+    """
+    termino = termino.strip()
+    if len(termino) < LARGO_MINIMO and not termino.isdigit():
+        return []
+    fuente = FUENTES[nombre_fuente]
+    if not cache_activa():
+        return fuente.buscar(termino)
+    version = '.'.join(str(v) for v in versiones((fuente.modelo, *fuente.relacionados)))
+    clave = f'autocompletar:{nombre_fuente}:{version}:{quote(termino)}'
+    cache = cache_respuestas()
+    resultados = cache.get(clave)
+    if resultados is None:
+        resultados = fuente.buscar(termino)
+        cache.set(clave, resultados, SEGUNDOS_CACHE)
+    return resultados
@@ -0,0 +1,162 @@
+import time
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Medicamento, PuntoControl, Seguro
+from .versiones import registrar_cambio
+
+# ======================================================================
+# BARRIDOS POR LOTES
+# Revisiones periódicas de tablas completas (stock bajo el punto de
+# reposición, seguros vencidos que siguen activos) hechas de a lotes en
+# el orden de un índice, con paginación keyset: cada lote es una consulta
+# acotada y, si escribe, una transacción corta propia, por lo que nunca
+# se bloquea la tabla entera ni por mucho tiempo. La clave de la última
+# fila y el resumen se guardan en PuntoControl junto con cada lote: un
+# barrido interrumpido continúa donde quedó; uno terminado vuelve a
+# empezar en la siguiente ejecución.
+# ======================================================================
+
+# Filas detalladas que guarda el resumen de un barrido (los totales cuentan todas)
+MAXIMO_DETALLE = 500
+
+
+def _posteriores(campos, clave):
+    """ Q de las filas que van después de 'clave' en el orden ascendente de 'campos'. """
+    condicion = Q()
+    for i, campo in enumerate(campos):
+        iguales = dict(zip(campos[:i], clave[:i]))
+        condicion |= Q(**iguales, **{f'{campo}__gt': clave[i]})
+    return condicion
+
+
+class Barrido:
+    """
+    Recorrido por lotes de las filas de pendientes() en el orden 'orden'
+    (que debe ser único y estar indexado). procesar() recibe cada lote como
+    diccionarios con 'orden' + 'columnas' y acumula en el resumen.
+    """
+    nombre = None
+    orden = ('id',)
+    columnas = ()
+
+    def resumen_inicial(self):
+        """ Resumen al comenzar una ejecución (incluye los parámetros que deben mantenerse al retomarla). """
+        return {}
+
+    def pendientes(self, resumen):
+        raise NotImplementedError
+
+    def procesar(self, filas, resumen):
+        raise NotImplementedError
+
+    def informe(self, resumen):
+        """ Líneas de texto con el resultado de la ejecución. """
+        return []
+
+
+class MedicamentosBajoMinimo(Barrido):
+    """ Informa los medicamentos con stock bajo su punto de reposición (no modifica nada). """
+    nombre = 'medicamentos_bajo_minimo'
+    columnas = ('nombre', 'stock', 'stock_minimo')
+
+    def resumen_inicial(self):
+        return {'bajo_minimo': 0, 'medicamentos': []}
+
+    def pendientes(self, resumen):
+        # stock < stock_minimo compara dos columnas y no tiene índice: se
+        # recorre la tabla por id y la condición se evalúa en cada lote
+        return Medicamento.objects.all()
+
+    def procesar(self, filas, resumen):
+        bajos = [fila for fila in filas if fila['stock'] < fila['stock_minimo']]
+        resumen['bajo_minimo'] += len(bajos)
+        espacio = MAXIMO_DETALLE - len(resumen['medicamentos'])
+        resumen['medicamentos'] += bajos[:max(espacio, 0)]
+
+    def informe(self, resumen):
+        lineas = [f"{resumen['bajo_minimo']} medicamentos bajo su stock mínimo."]
+        lineas += [
+            f"  {fila['id']} {fila['nombre']}: stock {fila['stock']}, mínimo {fila['stock_minimo']}"
+            for fila in resumen['medicamentos']
+        ]
+        if resumen['bajo_minimo'] > len(resumen['medicamentos']):
+            lineas.append(f"  ... y {resumen['bajo_minimo'] - len(resumen['medicamentos'])} más.")
+        return lineas
+
+
+class SegurosVencidos(Barrido):
+    """ Desactiva los seguros activos cuya fecha de vencimiento ya pasó. """
+    nombre = 'seguros_vencidos'
+    # Orden del índice parcial seguro_activo_vencimiento_idx (solo activos):
+    # cada lote lee exactamente las filas que necesita
+    orden = ('fecha_vencimiento', 'paciente_id', 'id')
+    columnas = ('nombre_aseguradora',)
+
+    def resumen_inicial(self):
+        # La fecha de corte se fija al comenzar y se mantiene al retomar
+        return {'fecha_corte': timezone.localdate(), 'desactivados': 0, 'vencidos_por_aseguradora': {}}
+
+    def pendientes(self, resumen):
+        return Seguro.objects.filter(activo=True, fecha_vencimiento__lt=resumen['fecha_corte'])
+
+    def procesar(self, filas, resumen):
+        # El UPDATE repite la condición: un seguro renovado desde la lectura no se toca
+        desactivados = self.pendientes(resumen).filter(pk__in=[fila['id'] for fila in filas]).update(activo=False)
+        if desactivados:
+            registrar_cambio(Seguro)
+        resumen['desactivados'] += desactivados
+        por_aseguradora = resumen['vencidos_por_aseguradora']
+        for fila in filas:
+            aseguradora = fila['nombre_aseguradora']
+            por_aseguradora[aseguradora] = por_aseguradora.get(aseguradora, 0) + 1
+
+    def informe(self, resumen):
+        lineas = [f"{resumen['desactivados']} seguros vencidos antes del {resumen['fecha_corte']} desactivados."]
+        lineas += [
+            f'  {aseguradora}: {cantidad}'
+            for aseguradora, cantidad in sorted(resumen['vencidos_por_aseguradora'].items())
+        ]
+        return lineas
+
+
+BARRIDOS = {barrido.nombre: barrido for barrido in [MedicamentosBajoMinimo(), SegurosVencidos()]}
+
+
+def ejecutar(barrido, tamano_lote=1000, reiniciar=False, max_lotes=None, pausa=0, informar=None):
+    """
+    Ejecuta (o retoma) 'barrido'. 'max_lotes' corta la ejecución antes de
+    terminar (queda pendiente para la siguiente); 'pausa' son los segundos
+    de espera entre lotes para no competir con el tráfico. Devuelve el PuntoControl.
+    """
+    punto, creado = PuntoControl.objects.get_or_create(nombre=barrido.nombre)
+    if creado or reiniciar or punto.terminado:
+        punto.posicion = None
+        punto.resumen = {'lotes': 0, 'revisados': 0, **barrido.resumen_inicial()}
+        punto.iniciado = timezone.now()
+        punto.terminado = None
+        punto.save()
+
+    lotes = 0
+    while punto.terminado is None and (max_lotes is None or lotes < max_lotes):
+        queryset = barrido.pendientes(punto.resumen).order_by(*barrido.orden)
+        if punto.posicion is not None:
+            queryset = queryset.filter(_posteriores(barrido.orden, punto.posicion))
+        filas = list(queryset.values(*barrido.orden, *barrido.columnas)[:tamano_lote])
+        with transaction.atomic():
+            if filas:
+                barrido.procesar(filas, punto.resumen)
+                punto.posicion = [filas[-1][campo] for campo in barrido.orden]
+                punto.resumen['lotes'] += 1
+                punto.resumen['revisados'] += len(filas)
+            if len(filas) < tamano_lote:
+                punto.terminado = timezone.now()
+            punto.save()
+        lotes += 1
+        if informar is not None:
+            informar(punto)
+        if pausa and punto.terminado is None:
+            time.sleep(pausa)
+    return punto
@@ -0,0 +1,268 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import BaseFilterBackend
+
+# ======================================================================
+# BÚSQUEDA DE TEXTO COMPLETO EN EL TEXTO CLÍNICO
+# Un índice invertido por tabla sobre sus campos de texto libre:
+#   - SQLite: tabla virtual FTS5 'busqueda_<modelo>' de contenido externo
+#     (no duplica el texto), sin distinguir tildes ni mayúsculas;
+#   - PostgreSQL: columna tsvector generada 'busqueda_texto' (configuración
+#     'spanish', con raíces) y un índice GIN sobre ella.
+# El índice se mantiene en la base de datos misma (triggers en SQLite,
+# columna generada en PostgreSQL): cada alta, edición o borrado lo
+# actualiza de forma incremental, incluidos bulk_create, update() y los
+# INSERT directos de generar_datos. 'reconstruir_busqueda' lo regenera
+# desde cero.
+# La misma API (filtrar / buscar) vale para ambos motores; con otro motor
+# se recurre a icontains sin índice.
+# ======================================================================
+
+CONFIGURACION_PG = 'spanish'
+INICIO_RESALTADO = '<mark>'
+FIN_RESALTADO = '</mark>'
+PALABRAS_FRAGMENTO = 16
+MAX_TERMINOS = 8
+
+
+class IndiceTexto:
+    """ Campos de texto de una tabla cubiertos por el índice. """
+
+    def __init__(self, tabla, campos):
+        self.tabla = tabla
+        self.campos = tuple(campos)
+
+    @property
+    def tabla_fts(self):
+        # api_consultamedica -> busqueda_consultamedica
+        return 'busqueda_' + self.tabla.split('_', 1)[1]
+
+    @property
+    def indice_gin(self):
+        return f'{self.tabla}_busqueda_gin'
+
+    def texto_pg(self, alias=''):
+        prefijo = f'{alias}.' if alias else ''
+        return " || ' ' || ".join(f"coalesce({prefijo}{campo}, '')" for campo in self.campos)
+
+
+# Tipo de documento (parámetro ?tipo= de /api/busqueda/) -> índice
+INDICES = {
+    'historial': IndiceTexto('api_historialclinico', ['descripcion']),
+    'consulta': IndiceTexto('api_consultamedica', ['motivo', 'diagnostico']),
+    'tratamiento': IndiceTexto('api_tratamiento', ['observaciones']),
+}
+
+
+def motor(conexion=None):
+    """ 'sqlite', 'postgresql' u otro (sin índice de texto). """
+    return (conexion or connection).vendor
+
+
+# ======================================================================
+# CREACIÓN Y MANTENIMIENTO DEL ÍNDICE (migraciones y comando)
+# ======================================================================
+
+def _sql_crear_sqlite(indice):
+    fts, tabla = indice.tabla_fts, indice.tabla
+    campos = ', '.join(indice.campos)
+    nuevos = ', '.join(f'new.{campo}' for campo in indice.campos)
+    viejos = ', '.join(f'old.{campo}' for campo in indice.campos)
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({campos}, content='{tabla}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {tabla} BEGIN "
+        f"INSERT INTO {fts}(rowid, {campos}) VALUES (new.id, {nuevos}); END",
+        f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {tabla} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {campos}) VALUES ('delete', old.id, {viejos}); END",
+        f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {campos} ON {tabla} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {campos}) VALUES ('delete', old.id, {viejos}); "
+        f"INSERT INTO {fts}(rowid, {campos}) VALUES (new.id, {nuevos}); END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def _sql_eliminar_sqlite(indice):
+    fts = indice.tabla_fts
+    return [f'DROP TRIGGER IF EXISTS {fts}_{sufijo}' for sufijo in ('ai', 'ad', 'au')] + [
+        f'DROP TABLE IF EXISTS {fts}',
+    ]
+
+
+def _sql_crear_postgresql(indice):
+    return [
+        f"ALTER TABLE {indice.tabla} ADD COLUMN busqueda_texto tsvector GENERATED ALWAYS AS "
+        f"(to_tsvector('{CONFIGURACION_PG}'::regconfig, {indice.texto_pg()})) STORED",
+        f'CREATE INDEX {indice.indice_gin} ON {indice.tabla} USING GIN (busqueda_texto)',
+    ]
+
+
+def _sql_eliminar_postgresql(indice):
+    return [
+        f'DROP INDEX IF EXISTS {indice.indice_gin}',
+        f'ALTER TABLE {indice.tabla} DROP COLUMN IF EXISTS busqueda_texto',
+    ]
+
+
+def _ejecutar(conexion, sentencias):
+    with conexion.cursor() as cursor:
+        for sentencia in sentencias:
+            cursor.execute(sentencia)
+
+
+def crear_indices(conexion, indices):
+    """ Crea los índices de texto (operación de la migración). """
+    generador = {'sqlite': _sql_crear_sqlite, 'postgresql': _sql_crear_postgresql}.get(motor(conexion))
+    if generador is not None:
+        for indice in indices:
+            _ejecutar(conexion, generador(indice))
+
+
+def eliminar_indices(conexion, indices):
+    generador = {'sqlite': _sql_eliminar_sqlite, 'postgresql': _sql_eliminar_postgresql}.get(motor(conexion))
+    if generador is not None:
+        for indice in indices:
+            _ejecutar(conexion, generador(indice))
+
+
+def reconstruir(indice):
+    """ Regenera el índice completo desde la tabla. """
+    if motor() == 'sqlite':
+        _ejecutar(connection, [
+            f"INSERT INTO {indice.tabla_fts}({indice.tabla_fts}) VALUES ('rebuild')",
+            f"INSERT INTO {indice.tabla_fts}({indice.tabla_fts}) VALUES ('optimize')",
+        ])
+    elif motor() == 'postgresql':
+        # La columna generada siempre está al día: basta con rehacer el índice GIN
+        _ejecutar(connection, [f'REINDEX INDEX {indice.indice_gin}'])
+
+
+def verificar(indice):
+    """ Verifica que el índice coincida con la tabla (lanza DatabaseError si no). """
+    if motor() == 'sqlite':
+        _ejecutar(connection, [
+            f"INSERT INTO {indice.tabla_fts}({indice.tabla_fts}, rank) VALUES ('integrity-check', 1)",
+        ])
+
+
+# ======================================================================
+# CONSULTAS
+# ======================================================================
+
+def terminos(texto):
+    """ Palabras de la búsqueda, sin operadores ni puntuación. """
+    return re.findall(r'\w+', texto.lower())[:MAX_TERMINOS]
+
+
+def _consulta_sqlite(palabras):
+    # Todas las palabras deben aparecer; la última, como prefijo (mientras se escribe)
+    return ' '.join(f'"{p}"' for p in palabras[:-1]) + f' "{palabras[-1]}"*'
+
+
+def _consulta_postgresql(palabras):
+    return ' & '.join(palabras[:-1] + [f'{palabras[-1]}:*'])
+
+
+def _sql_coincidencias(indice, palabras):
+    """ (SQL, parámetros) de la subconsulta con los id que coinciden. """
+    if motor() == 'sqlite':
+        return (f'SELECT rowid FROM {indice.tabla_fts} WHERE {indice.tabla_fts} MATCH %s',
+                [_consulta_sqlite(palabras)])
+    return (f"SELECT id FROM {indice.tabla} WHERE busqueda_texto @@ to_tsquery('{CONFIGURACION_PG}', %s)",
+            [_consulta_postgresql(palabras)])
+
+
+def filtrar(queryset, indice, texto):
+    """ Restringe 'queryset' a las filas cuyo texto coincide con la búsqueda. """
+    palabras = terminos(texto)
+    if not palabras:
+        return queryset.none()
+    if motor() not in ('sqlite', 'postgresql'):
+        condicion = Q()
+        for palabra in palabras:
+            condicion &= Q(*[Q(**{f'{campo}__icontains': palabra}) for campo in indice.campos], _connector=Q.OR)
+        return queryset.filter(condicion)
+    return queryset.filter(pk__in=RawSQL(*_sql_coincidencias(indice, palabras)))
+
+
+def buscar(indice, texto, limite):
+    """
+    Mejores 'limite' coincidencias, de mayor a menor relevancia:
+    lista de {'id', 'rango', 'fragmento'} (fragmento con las palabras resaltadas).
+    """
+    palabras = terminos(texto)
+    if not palabras:
+        return []
+    if motor() == 'sqlite':
+        fts = indice.tabla_fts
+        sql = (
+            f"SELECT rowid, -bm25({fts}), "
+            f"snippet({fts}, -1, '{INICIO_RESALTADO}', '{FIN_RESALTADO}', '…', {PALABRAS_FRAGMENTO}) "
+            f"FROM {fts} WHERE {fts} MATCH %s ORDER BY rank LIMIT %s"
+        )
+        parametros = [_consulta_sqlite(palabras), limite]
+    elif motor() == 'postgresql':
+        # El fragmento (ts_headline, caro) se calcula solo para las filas ya limitadas
+        opciones = (f'StartSel={INICIO_RESALTADO}, StopSel={FIN_RESALTADO}, '
+                    f'MaxWords={PALABRAS_FRAGMENTO}, MinWords=5')
+        sql = (
+            f"SELECT m.id, m.rango, ts_headline('{CONFIGURACION_PG}', {indice.texto_pg('t')}, m.q, '{opciones}') "
+            f"FROM (SELECT id, ts_rank_cd(busqueda_texto, q) AS rango, q "
+            f"      FROM {indice.tabla}, to_tsquery('{CONFIGURACION_PG}', %s) AS q "
+            f"      WHERE busqueda_texto @@ q ORDER BY rango DESC, id DESC LIMIT %s) AS m "
+            f"JOIN {indice.tabla} AS t ON t.id = m.id ORDER BY m.rango DESC, m.id DESC"
+        )
+        parametros = [_consulta_postgresql(palabras), limite]
+    else:
+        return _buscar_sin_indice(indice, palabras, limite)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, parametros)
+        return [{'id': id_, 'rango': float(rango), 'fragmento': fragmento}
+                for id_, rango, fragmento in cursor.fetchall()]
+
+
+def _buscar_sin_indice(indice, palabras, limite):
+    columnas = ', '.join(indice.campos)
+    condiciones = ' AND '.join(
+        '(' + ' OR '.join(f'LOWER({campo}) LIKE %s' for campo in indice.campos) + ')' for _ in palabras
+    )
+    parametros = [f'%{palabra}%' for palabra in palabras for _ in indice.campos]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT id, {columnas} FROM {indice.tabla} WHERE {condiciones} ORDER BY id DESC LIMIT %s',
+            parametros + [limite],
+        )
+        return [{'id': fila[0], 'rango': 0.0, 'fragmento': ' '.join(t for t in fila[1:] if t)[:200]}
+                for fila in cursor.fetchall()]
+
+
+class BusquedaTextoFilter(BaseFilterBackend):
+    """
+    ?texto= en los ViewSets que declaran 'indice_texto' (clave de INDICES):
+    filtra con el índice de texto completo en vez de LIKE '%...%'.
+    El orden sigue siendo el del listado; para ordenar por relevancia está
+    /api/busqueda/.
+    """
+    parametro = 'texto'
+
+    def filter_queryset(self, request, queryset, view):
+        texto = request.query_params.get(self.parametro)
+        nombre = getattr(view, 'indice_texto', None)
+        if nombre is None or not texto:
+            return queryset
+        return filtrar(queryset, INDICES[nombre], texto)
+
+    def get_schema_operation_parameters(self, view):
+        if getattr(view, 'indice_texto', None) is None:
+            return []
+        return [{
+            'name': self.parametro,
+            'required': False,
+            'in': 'query',
+            'description': 'Búsqueda de texto completo (todas las palabras; la última como prefijo).',
+            'schema': {'type': 'string'},
+        }]
@@ -0,0 +1,43 @@
+from hashlib import sha1
+
+from rest_framework.response import Response
+
+from .versiones import cache_respuestas
+
+# ======================================================================
+# CACHÉ DE RESPUESTAS PARA ENDPOINTS DE CATÁLOGO
+# Los GET de listado y detalle guardan los datos serializados de la
+# respuesta con una clave formada por el ViewSet, la acción, la URL
+# completa (con su query string) y la versión de los datos de los que
+# depende el serializer (la misma que valida el ETag, ver
+# api/condicional.py). Cuando uno de esos modelos cambia su versión
+# avanza y las entradas viejas dejan de leerse; el backend de caché
+# ('respuestas' en settings.CACHES, acotado y con desalojo LRU) las
+# descarta con el tiempo.
+# ======================================================================
+
+
+class RespuestaEnCacheMixin:
+    """
+    Cachea 'list' y 'retrieve' de un ViewSet que hereda de
+    BaseModelViewSet. Los modelos de los que depende la respuesta son el
+    del queryset más 'modelos_relacionados'. Ej: MedicoSerializer muestra
+    el nombre de la especialidad, así que MedicoViewSet depende de Medico
+    y de Especialidad.
+    """
+
+    def clave_cache(self, request):
+        version, _ = self.version_datos(request)
+        url = sha1(request.build_absolute_uri().encode()).hexdigest()
+        return f'respuesta:{type(self).__name__}:{self.action}:{version}:{url}'
+
+    def obtener_respuesta(self, generar, request, *args, **kwargs):
+        cache = cache_respuestas()
+        clave = self.clave_cache(request)
+        datos = cache.get(clave)
+        if datos is not None:
+            return Response(datos)
+        response = super().obtener_respuesta(generar, request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(clave, response.data)
+        return response
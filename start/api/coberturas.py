@@ -0,0 +1,162 @@
+from bisect import bisect_right
+from collections import defaultdict, namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import RecetaMedica, Seguro
+from .versiones import cache_activa, cache_respuestas, versiones_particion
+
+# ======================================================================
+# COBERTURA DE SEGUROS Y COSTO DE LAS RECETAS
+# Resuelve qué seguro cubre a un paciente en una fecha y con él estima el
+# costo de las recetas de uno o muchos tratamientos, en el servidor.
+#   - Dan cobertura los seguros activos y los desactivados que ya
+#     vencieron: el barrido seguros_vencidos los desactiva después de
+#     vencer, lo que no les quita la cobertura de los días en que
+#     estuvieron vigentes. Un seguro desactivado antes de vencer (anulado)
+#     no cubre ningún día. La facturación mensual lee las pólizas con la
+#     misma función (leer_polizas).
+#   - Las pólizas de cada paciente forman un índice de intervalos
+#     [fecha_inicio, fecha_vencimiento] (ambos días incluidos) que se
+#     guarda en la caché 'respuestas' con la versión de la partición
+#     Seguro.paciente (api/versiones.py): escribir un seguro del paciente,
+#     o cualquier cambio masivo de seguros, lo invalida.
+#   - Si varias pólizas están vigentes el mismo día se aplica la de mayor
+#     porcentaje de cobertura (y, a igualdad, la más reciente).
+#   - Los montos se calculan con Decimal y se redondean al centavo
+#     (ROUND_HALF_UP) por receta; los totales son la suma de las recetas.
+# Estimar N tratamientos cuesta 3 consultas SQL (tratamientos, recetas y
+# pólizas de los pacientes que no estaban en caché) sin importar N.
+# ======================================================================
+
+# Tratamientos por petición en la estimación por lotes
+MAX_TRATAMIENTOS_ESTIMACION = 500
+
+CENTAVO = Decimal('0.01')
+CIEN = Decimal('100')
+
+Poliza = namedtuple('Poliza', 'inicio fin porcentaje_cobertura id nombre_aseguradora numero_poliza')
+
+
+class IndicePolizas:
+    """ Pólizas de un paciente ordenadas por inicio, con búsqueda por fecha en O(log n + vigentes). """
+
+    def __init__(self, polizas):
+        self.polizas = sorted(polizas)
+        self.inicios = [poliza.inicio for poliza in self.polizas]
+
+    def vigente(self, fecha):
+        """ Póliza que aplica en 'fecha', o None. """
+        candidatas = self.polizas[:bisect_right(self.inicios, fecha)]
+        vigentes = [poliza for poliza in candidatas if poliza.fin >= fecha]
+        if not vigentes:
+            return None
+        return max(vigentes, key=lambda poliza: (poliza.porcentaje_cobertura, poliza.inicio, poliza.id))
+
+
+def leer_polizas(paciente_ids=None, desde=None, hasta=None):
+    """
+    {paciente_id: [Poliza]} con las pólizas que dan cobertura, en una
+    consulta. Opcionalmente solo de 'paciente_ids' y de las vigentes algún
+    día entre 'desde' y 'hasta' (ambos incluidos).
+    """
+    seguros = Seguro.objects.filter(Q(activo=True) | Q(fecha_vencimiento__lt=timezone.localdate()))
+    if paciente_ids is not None:
+        seguros = seguros.filter(paciente_id__in=paciente_ids)
+    if desde is not None:
+        seguros = seguros.filter(fecha_vencimiento__gte=desde)
+    if hasta is not None:
+        seguros = seguros.filter(fecha_inicio__lte=hasta)
+    polizas = defaultdict(list)
+    for paciente_id, *poliza in seguros.values_list(
+        'paciente_id', 'fecha_inicio', 'fecha_vencimiento', 'porcentaje_cobertura', 'id',
+        'nombre_aseguradora', 'numero_poliza',
+    ):
+        polizas[paciente_id].append(Poliza(*poliza))
+    return polizas
+
+
+def _clave(paciente_id, version):
+    # Lleva la fecha: cada día cuentan también los seguros desactivados que vencieron la víspera
+    return f'cobertura:{paciente_id}:{version}:{timezone.localdate():%Y%m%d}'
+
+
+def indices_de_cobertura(paciente_ids):
+    """ {paciente_id: IndicePolizas}: de la caché o, los que falten, con una consulta. """
+    paciente_ids = set(paciente_ids)
+    if not paciente_ids:
+        return {}
+    if not cache_activa():
+        leidas = leer_polizas(paciente_ids)
+        return {pk: IndicePolizas(leidas.get(pk, [])) for pk in paciente_ids}
+    cache = cache_respuestas()
+    claves = {pk: _clave(pk, version) for pk, version in versiones_particion(Seguro, 'paciente', paciente_ids).items()}
+    encontrados = cache.get_many(list(claves.values()))
+    polizas = {pk: encontrados[clave] for pk, clave in claves.items() if clave in encontrados}
+
+    faltantes = paciente_ids - set(polizas)
+    if faltantes:
+        leidas = leer_polizas(faltantes)
+        leidas = {pk: leidas.get(pk, []) for pk in faltantes}
+        cache.set_many({claves[pk]: lista for pk, lista in leidas.items()})
+        polizas.update(leidas)
+    return {pk: IndicePolizas(lista) for pk, lista in polizas.items()}
+
+
+def cobertura(paciente_id, fecha=None):
+    """ Póliza que cubre al paciente en 'fecha' (por defecto hoy), o None. """
+    return indices_de_cobertura([paciente_id])[paciente_id].vigente(fecha or timezone.localdate())
+
+
+def _monto(valor):
+    return valor.quantize(CENTAVO, rounding=ROUND_HALF_UP)
+
+
+def estimar_costos(tratamientos, fecha=None):
+    """
+    Costo de las recetas de cada tratamiento de 'tratamientos' (queryset),
+    en orden de id. La cobertura se resuelve en 'fecha' o, sin ella, en la
+    fecha de la consulta de cada tratamiento.
+    """
+    filas = list(tratamientos.order_by('pk').values_list('pk', 'consulta__paciente_id', 'consulta__fecha_consulta'))
+    recetas = {pk: [] for pk, _, _ in filas}
+    for receta in (
+        RecetaMedica.objects.filter(tratamiento_id__in=list(recetas)).order_by('tratamiento_id', 'id')
+        .values('id', 'tratamiento_id', 'medicamento_id', 'medicamento__nombre', 'medicamento__precio_unitario',
+                'cantidad')
+    ):
+        recetas[receta['tratamiento_id']].append(receta)
+    indices = indices_de_cobertura(paciente_id for _, paciente_id, _ in filas)
+
+    resultados = []
+    for pk, paciente_id, fecha_consulta in filas:
+        dia = fecha or timezone.localtime(fecha_consulta).date()
+        poliza = indices[paciente_id].vigente(dia)
+        porcentaje = poliza.porcentaje_cobertura if poliza else Decimal(0)
+        detalle = []
+        for receta in recetas[pk]:
+            subtotal = receta['medicamento__precio_unitario'] * receta['cantidad']
+            cubierto = _monto(subtotal * porcentaje / CIEN)
+            detalle.append({
+                'receta': receta['id'],
+                'medicamento': receta['medicamento_id'],
+                'medicamento_nombre': receta['medicamento__nombre'],
+                'cantidad': receta['cantidad'],
+                'precio_unitario': receta['medicamento__precio_unitario'],
+                'subtotal': subtotal,
+                'cubierto': cubierto,
+                'copago': subtotal - cubierto,
+            })
+        resultados.append({
+            'tratamiento': pk,
+            'paciente': paciente_id,
+            'fecha': dia,
+            'seguro': poliza,
+            'recetas': detalle,
+            'total': sum((linea['subtotal'] for linea in detalle), Decimal(0)),
+            'cubierto': sum((linea['cubierto'] for linea in detalle), Decimal(0)),
+            'copago': sum((linea['copago'] for linea in detalle), Decimal(0)),
+        })
+    return resultados
@@ -0,0 +1,104 @@
+import time
+from hashlib import sha1
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .versiones import CAMPO_PK, cache_activa, claves_version, estado_version, normalizar_valor, particiones
+
+# ======================================================================
+# GET CONDICIONAL (ETag / Last-Modified)
+# 'list' y 'retrieve' responden con un ETag fuerte y Last-Modified
+# calculados a partir de los contadores de versión (api/versiones.py),
+# no del cuerpo: si el cliente manda If-None-Match (o If-Modified-Since)
+# y nada cambió, se responde 304 sin tocar la base de datos ni
+# serializar. Validar cuesta una sola lectura de caché.
+# El contador más fino disponible acota la invalidación: el detalle usa
+# el de su fila y un listado filtrado por un campo de PARTICIONES (ej.
+# /api/citas/?medico=7) el de ese valor, de modo que una cita de otro
+# médico no cambia el ETag.
+# ======================================================================
+
+
+class RespuestaCondicionalMixin:
+    """
+    GET condicional para 'list' y 'retrieve' de un ViewSet.
+    'modelos_relacionados' enumera los otros modelos cuyos datos aparecen
+    en la respuesta. Ej: CitaMedicaSerializer muestra los nombres del
+    paciente y del médico, así que CitaMedicaViewSet depende también de
+    Paciente y de Medico.
+    """
+    modelos_relacionados = ()
+
+    def particion_solicitada(self, request):
+        """ (campo, valor) del contador más fino que cubre la respuesta, o (None, None). """
+        modelo = self.queryset.model
+        if self.action == 'retrieve':
+            campos = [(CAMPO_PK, self.kwargs.get(self.lookup_url_kwarg or self.lookup_field))]
+        else:
+            campos = [(campo, request.query_params.get(campo)) for campo in particiones(modelo)]
+        for campo, valor in campos:
+            if valor in (None, ''):
+                continue
+            valor = normalizar_valor(modelo, campo, valor)
+            if valor is not None:
+                return campo, valor
+        return None, None
+
+    def version_datos(self, request):
+        """
+        (versión, última modificación) de los datos de la respuesta.
+        Se calcula una vez por petición: la reutiliza la caché de respuestas.
+        """
+        if getattr(self, '_version_datos', None) is None:
+            campo, valor = self.particion_solicitada(request)
+            modelo = self.queryset.model
+            claves = claves_version(modelo, campo, valor)
+            for relacionado in self.modelos_relacionados:
+                claves += claves_version(relacionado)
+            valores, modificado = estado_version(claves, (modelo, *self.modelos_relacionados))
+            self._version_datos = ('.'.join(str(v) for v in valores), modificado)
+        return self._version_datos
+
+    def etag(self, request):
+        version, _ = self.version_datos(request)
+        # El formato negociado entra en el ETag: JSON y la API navegable son
+        # representaciones distintas de la misma URL.
+        formato = getattr(request.accepted_renderer, 'format', '')
+        base = f'{type(self).__name__}:{self.action}:{formato}:{version}:{request.get_full_path()}'
+        return f'"{sha1(base.encode()).hexdigest()}"'
+
+    def obtener_respuesta(self, generar, request, *args, **kwargs):
+        """ Punto de extensión: produce la respuesta completa (ver RespuestaEnCacheMixin). """
+        return generar(request, *args, **kwargs)
+
+    def _respuesta_condicional(self, generar, request, *args, **kwargs):
+        if not cache_activa():
+            # Versiones locales al proceso: un ETag podría validar datos viejos
+            return generar(request, *args, **kwargs)
+        etag = self.etag(request)
+        _, modificado = self.version_datos(request)
+        # Last-Modified tiene resolución de segundos: mientras no termine el
+        # segundo de la última escritura, otra escritura podría compartir la
+        # fecha, así que recién entonces se informa y se valida por fecha.
+        if int(time.time()) <= int(modificado):
+            modificado = None
+        else:
+            modificado = int(modificado)
+        response = get_conditional_response(request, etag=etag, last_modified=modificado)
+        if response is None:
+            response = self.obtener_respuesta(generar, request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        if modificado is not None:
+            response['Last-Modified'] = http_date(modificado)
+        # El cliente puede guardar la respuesta, pero debe revalidarla siempre
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._respuesta_condicional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._respuesta_condicional(super().retrieve, request, *args, **kwargs)
@@ -0,0 +1,458 @@
+import random
+import unicodedata
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import (
+    Especialidad,
+    Laboratorio,
+    Paciente,
+    Medico,
+    ConsultaMedica,
+    Tratamiento,
+    Medicamento,
+    RecetaMedica,
+    MovimientoInventario,
+    CorteInventario,
+    FacturaAseguradora,
+    FacturaPaciente,
+    ResumenCitasDia,
+    ResumenConsultasDia,
+    ResumenRecetasDia,
+    Seguro,
+    Horario,
+    CitaMedica,
+    HistorialClinico,
+    TIPO_SANGRE_CHOICES,
+    GENERO_CHOICES,
+    PRIORIDAD_CHOICES,
+    CATEGORIA_MEDICAMENTO_CHOICES,
+    VIA_ADMINISTRACION_CHOICES,
+    TIPO_COBERTURA_CHOICES,
+    plegar,
+)
+from .resumenes import RESUMENES, reconstruir
+from .rut import formatear_rut
+from .versiones import registrar_cambio
+
+# ======================================================================
+# GENERADOR DE DATOS SINTÉTICOS
+# Arma un conjunto de datos realista y referencialmente consistente a la
+# escala pedida: Especialidad → Medico → Horario → CitaMedica →
+# ConsultaMedica → Tratamiento → RecetaMedica, más Seguro e Historial.
+# Todo sale de un random.Random con semilla, de modo que la misma semilla
+# produce siempre los mismos datos. Las tablas maestras se insertan por
+# lotes con bulk_create; las de atenciones (consultas, citas, tratamientos
+# y recetas), con executemany, una transacción por lote y sin cargar la
+# tabla completa en memoria.
+# ======================================================================
+
+# Proporciones respecto de la cantidad de consultas
+CONSULTAS_POR_PACIENTE = 10
+CONSULTAS_POR_MEDICO = 2000
+MEDICAMENTOS = 300
+
+# Cuerpos de RUT iniciales: médicos y pacientes usan rangos separados
+RUT_BASE_MEDICOS = 6000000
+RUT_BASE_PACIENTES = 10000000
+
+# Agenda tipo de cada médico: lunes a viernes, dos bloques de 30 minutos
+BLOQUES_HORARIO = [(time(9, 0), time(13, 0)), (time(15, 0), time(19, 0))]
+DURACION_CITA_MINUTOS = 30
+
+# Lunes desde el que se agendan las citas (fijo para que la salida sea determinista)
+FECHA_INICIO = date(2023, 1, 2)
+
+ESPECIALIDADES = [
+    'Medicina General', 'Cardiología', 'Dermatología', 'Pediatría', 'Traumatología', 'Ginecología',
+    'Neurología', 'Oftalmología', 'Otorrinolaringología', 'Psiquiatría', 'Endocrinología',
+    'Gastroenterología', 'Neumología', 'Urología', 'Nefrología', 'Reumatología', 'Oncología',
+    'Geriatría', 'Infectología', 'Hematología',
+]
+NOMBRES = [
+    'Juan', 'María', 'José', 'Francisca', 'Diego', 'Catalina', 'Matías', 'Valentina', 'Sebastián',
+    'Javiera', 'Benjamín', 'Constanza', 'Vicente', 'Fernanda', 'Tomás', 'Camila', 'Joaquín', 'Isidora',
+    'Cristóbal', 'Antonia', 'Felipe', 'Daniela', 'Martín', 'Sofía', 'Nicolás', 'Paula', 'Ignacio', 'Carla',
+]
+APELLIDOS = [
+    'González', 'Muñoz', 'Rojas', 'Díaz', 'Pérez', 'Soto', 'Contreras', 'Silva', 'Martínez', 'Sepúlveda',
+    'Morales', 'Rodríguez', 'López', 'Fuentes', 'Hernández', 'Torres', 'Araya', 'Flores', 'Espinoza',
+    'Valenzuela', 'Castillo', 'Tapia', 'Reyes', 'Gutiérrez', 'Castro', 'Pizarro', 'Álvarez', 'Vásquez',
+    'Sánchez', 'Fernández', 'Ramírez', 'Carrasco', 'Gómez', 'Cortés', 'Herrera', 'Núñez', 'Jara', 'Vergara',
+]
+CALLES = ['Av. Providencia', 'Los Leones', 'Av. Matta', 'Gran Avenida', 'Irarrázaval', 'Pajaritos', 'Vicuña Mackenna']
+LABORATORIOS = ['Laboratorio Chile', 'Saval', 'Recalcine', 'Andrómaco', 'Bagó', 'Pharma Investi', 'Mintlab']
+PRINCIPIOS_ACTIVOS = [
+    'Paracetamol', 'Ibuprofeno', 'Amoxicilina', 'Losartán', 'Omeprazol', 'Loratadina', 'Metformina',
+    'Atorvastatina', 'Enalapril', 'Azitromicina', 'Ketoprofeno', 'Cetirizina', 'Vitamina D',
+]
+ASEGURADORAS = ['Fonasa', 'Banmédica', 'Colmena', 'Consalud', 'Cruz Blanca', 'Vida Tres', 'Nueva Masvida']
+MOTIVOS = [
+    'Control de rutina', 'Dolor de cabeza', 'Dolor abdominal', 'Fiebre', 'Tos persistente',
+    'Control de presión', 'Dolor lumbar', 'Erupción cutánea', 'Chequeo preventivo', 'Mareos',
+]
+DIAGNOSTICOS = [
+    'Cefalea tensional', 'Gastritis aguda', 'Infección respiratoria alta', 'Hipertensión arterial',
+    'Lumbago mecánico', 'Dermatitis de contacto', 'Sin hallazgos patológicos', 'Rinitis alérgica',
+]
+TIPOS_REGISTRO = ['Alergia', 'Cirugía', 'Enfermedad Crónica', 'Vacuna', 'Hospitalización', 'Control']
+FRECUENCIAS = ['Cada 8 horas', 'Cada 12 horas', 'Cada 24 horas', 'Según dolor']
+
+# Estados de cita con su peso y el estado de la consulta que originan
+ESTADOS_CITA = [
+    ('REALIZADA', 60, 'REALIZADA'),
+    ('AGENDADA', 15, 'PENDIENTE'),
+    ('CONFIRMADA', 10, 'PENDIENTE'),
+    ('CANCELADA', 10, 'CANCELADA'),
+    ('NO_ASISTIO', 5, 'CANCELADA'),
+]
+
+
+def _ascii(texto):
+    """ Texto sin tildes ni espacios, para correos electrónicos. """
+    return unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode().replace(' ', '').lower()
+
+
+def _claves(choices):
+    return [clave for clave, _ in choices]
+
+
+def _horas_de_cupo():
+    """ Horas de inicio de los cupos de un día de la agenda tipo, en orden. """
+    horas = []
+    for inicio, fin in BLOQUES_HORARIO:
+        actual = datetime.combine(FECHA_INICIO, inicio)
+        while actual + timedelta(minutes=DURACION_CITA_MINUTOS) <= datetime.combine(FECHA_INICIO, fin):
+            horas.append(actual.time())
+            actual += timedelta(minutes=DURACION_CITA_MINUTOS)
+    return horas
+
+
+HORAS_DE_CUPO = _horas_de_cupo()
+
+
+class GeneradorDatos:
+    """
+    Genera y guarda los datos sintéticos.
+    'consultas' fija la escala; el resto de las tablas se dimensiona en proporción.
+    'informar' recibe (modelo, cantidad_acumulada) a medida que se insertan filas.
+    """
+
+    def __init__(self, consultas, semilla=0, tamano_lote=5000, informar=None):
+        self.consultas = consultas
+        self.medicos = max(5, consultas // CONSULTAS_POR_MEDICO)
+        self.pacientes = max(10, consultas // CONSULTAS_POR_PACIENTE)
+        self.tamano_lote = tamano_lote
+        self.azar = random.Random(semilla)
+        self.informar = informar or (lambda modelo, cantidad: None)
+        self.cantidades = {}
+
+    def _guardar(self, modelo, objetos):
+        """ Inserta 'objetos' (iterable) por lotes; devuelve los ids de los creados. """
+        creados = []
+        lote = []
+        for objeto in objetos:
+            lote.append(objeto)
+            if len(lote) >= self.tamano_lote:
+                creados += [objeto.pk for objeto in self._insertar(modelo, lote)]
+                lote = []
+        if lote:
+            creados += [objeto.pk for objeto in self._insertar(modelo, lote)]
+        return creados
+
+    def _insertar(self, modelo, objetos):
+        creados = modelo.objects.bulk_create(objetos)
+        self.cantidades[modelo] = self.cantidades.get(modelo, 0) + len(creados)
+        self.informar(modelo, self.cantidades[modelo])
+        return creados
+
+    def generar(self):
+        if connection.vendor == 'sqlite':
+            # Caché de páginas amplia (256 MB): los índices de las tablas grandes
+            # se actualizan en memoria en vez de releerse del disco en cada lote.
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA cache_size = -262144')
+        with transaction.atomic():
+            especialidades = self.generar_especialidades()
+            medicos = self.generar_medicos(especialidades)
+            self.generar_horarios(medicos)
+            pacientes = self.generar_pacientes()
+            self.generar_seguros(pacientes)
+            self.generar_historiales(pacientes, medicos)
+            medicamentos = self.generar_medicamentos()
+        self.generar_atenciones(medicos, pacientes, medicamentos)
+        # Las atenciones se insertan sin señales: los resúmenes se calculan al final
+        for resumen in RESUMENES.values():
+            reconstruir(resumen)
+        # Las inserciones masivas no emiten señales: se invalida la caché a mano
+        for modelo in self.cantidades:
+            registrar_cambio(modelo)
+        return self.cantidades
+
+    # ------------------------------------------------------------------
+    # Tablas maestras (pequeñas: se insertan en una única transacción)
+    # ------------------------------------------------------------------
+
+    def generar_especialidades(self):
+        especialidades = self._guardar(Especialidad, (
+            Especialidad(nombre=nombre, descripcion=f'Atención de {nombre.lower()}')
+            for nombre in ESPECIALIDADES[:self.medicos]
+        ))
+        return especialidades
+
+    def _persona(self, indice, base_rut, dominio):
+        nombre = self.azar.choice(NOMBRES)
+        apellido = f'{self.azar.choice(APELLIDOS)} {self.azar.choice(APELLIDOS)}'
+        return {
+            'rut': formatear_rut(base_rut + indice),
+            'nombre': nombre,
+            'apellido': apellido,
+            'genero': self.azar.choice(_claves(GENERO_CHOICES)),
+            'correo': f'{_ascii(nombre)}.{_ascii(apellido)}{indice}@{dominio}',
+            'telefono': f'+569{self.azar.randrange(10000000, 99999999)}',
+        }
+
+    def generar_medicos(self, especialidades):
+        medicos = self._guardar(Medico, (
+            Medico(
+                especialidad_id=especialidades[indice % len(especialidades)],
+                activo=self.azar.random() < 0.95,
+                **self._persona(indice, RUT_BASE_MEDICOS, 'saludvital.cl'),
+            )
+            for indice in range(self.medicos)
+        ))
+        return medicos
+
+    def generar_horarios(self, medicos):
+        self._guardar(Horario, (
+            Horario(medico_id=medico_id, dia_semana=dia, hora_inicio=inicio, hora_fin=fin,
+                    duracion_consulta_minutos=DURACION_CITA_MINUTOS)
+            for medico_id in medicos
+            for dia in range(1, 6)
+            for inicio, fin in BLOQUES_HORARIO
+        ))
+
+    def generar_pacientes(self):
+        pacientes = self._guardar(Paciente, (
+            Paciente(
+                fecha_nacimiento=FECHA_INICIO - timedelta(days=self.azar.randrange(365, 90 * 365)),
+                tipo_sangre=self.azar.choice(_claves(TIPO_SANGRE_CHOICES)),
+                direccion=f'{self.azar.choice(CALLES)} {self.azar.randrange(1, 9999)}, Santiago',
+                activo=self.azar.random() < 0.97,
+                **self._persona(indice, RUT_BASE_PACIENTES, 'correo.cl'),
+            )
+            for indice in range(self.pacientes)
+        ))
+        return pacientes
+
+    def _seguros(self, pacientes):
+        for indice, paciente_id in enumerate(pacientes):
+            if self.azar.random() >= 0.8:
+                continue
+            inicio = FECHA_INICIO - timedelta(days=self.azar.randrange(0, 5 * 365))
+            vencimiento = inicio + timedelta(days=365 * self.azar.randrange(1, 4))
+            yield Seguro(
+                paciente_id=paciente_id,
+                nombre_aseguradora=self.azar.choice(ASEGURADORAS),
+                numero_poliza=f'POL-{indice:09d}',
+                tipo_cobertura=self.azar.choice(_claves(TIPO_COBERTURA_CHOICES)),
+                fecha_inicio=inicio,
+                fecha_vencimiento=vencimiento,
+                porcentaje_cobertura=Decimal(self.azar.choice([50, 60, 70, 80, 90, 100])),
+                activo=vencimiento >= FECHA_INICIO,
+            )
+
+    def generar_seguros(self, pacientes):
+        self._guardar(Seguro, self._seguros(pacientes))
+
+    def _historiales(self, pacientes, medicos):
+        for paciente_id in pacientes:
+            for _ in range(self.azar.randrange(0, 5)):
+                yield HistorialClinico(
+                    paciente_id=paciente_id,
+                    fecha_registro=FECHA_INICIO - timedelta(days=self.azar.randrange(0, 20 * 365)),
+                    tipo_registro=self.azar.choice(TIPOS_REGISTRO),
+                    descripcion=self.azar.choice(DIAGNOSTICOS),
+                    registrado_por_id=self.azar.choice(medicos) if self.azar.random() < 0.7 else None,
+                )
+
+    def generar_historiales(self, pacientes, medicos):
+        self._guardar(HistorialClinico, self._historiales(pacientes, medicos))
+
+    def generar_medicamentos(self):
+        self._guardar(Laboratorio, (
+            Laboratorio(nombre=nombre, correo=f'contacto@{_ascii(nombre)}.cl') for nombre in LABORATORIOS
+        ))
+        categorias = _claves(CATEGORIA_MEDICAMENTO_CHOICES)
+        medicamentos = self._guardar(Medicamento, (
+            Medicamento(
+                nombre=f'{self.azar.choice(PRINCIPIOS_ACTIVOS)} {self.azar.choice([100, 200, 250, 500, 800])} mg',
+                laboratorio=self.azar.choice(LABORATORIOS),
+                categoria=self.azar.choice(categorias),
+                stock=self.azar.randrange(0, 2000),
+                precio_unitario=Decimal(self.azar.randrange(500, 50000)) / 100,
+            )
+            for _ in range(MEDICAMENTOS)
+        ))
+        return medicamentos
+
+    # ------------------------------------------------------------------
+    # Atenciones (tablas grandes: un lote por transacción)
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _fecha_hora_cupo(cupo):
+        """
+        Fecha y hora del cupo número 'cupo' de la agenda de un médico,
+        recorriendo los días de lunes a viernes, semana a semana.
+        """
+        dia, indice = divmod(cupo, len(HORAS_DE_CUPO))
+        semana, dia = divmod(dia, 5)
+        fecha = FECHA_INICIO + timedelta(weeks=semana, days=dia)
+        return timezone.make_aware(datetime.combine(fecha, HORAS_DE_CUPO[indice]))
+
+    def _insertar_filas(self, modelo, campos, filas):
+        """
+        Inserta tuplas de valores (en el orden de 'campos') con executemany.
+        Para las tablas de millones de filas evita construir una instancia
+        del modelo y compilar el SQL campo por campo, que es donde
+        bulk_create gasta la mayor parte del tiempo. Las fechas se adaptan
+        igual que lo haría el ORM para el motor en uso.
+        """
+        opts = modelo._meta
+        columnas = [opts.get_field(campo) for campo in campos]
+        fechas = [i for i, campo in enumerate(columnas) if isinstance(campo, models.DateTimeField)]
+        if fechas:
+            adaptar = connection.ops.adapt_datetimefield_value
+            filas = [
+                tuple(adaptar(valor) if i in fechas else valor for i, valor in enumerate(fila))
+                for fila in filas
+            ]
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            connection.ops.quote_name(opts.db_table),
+            ', '.join(connection.ops.quote_name(campo.column) for campo in columnas),
+            ', '.join(['%s'] * len(columnas)),
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, filas)
+        self.cantidades[modelo] = self.cantidades.get(modelo, 0) + len(filas)
+        self.informar(modelo, self.cantidades[modelo])
+
+    @staticmethod
+    def _siguiente_id(modelo):
+        return (modelo.objects.aggregate(maximo=Max('pk'))['maximo'] or 0) + 1
+
+    def generar_atenciones(self, medicos, pacientes, medicamentos):
+        """
+        Cada cita genera su consulta (mismo médico, paciente y hora); las
+        citas realizadas quedan vinculadas a ella y la mitad de esas
+        consultas recibe un tratamiento con una a tres recetas.
+        Las citas se reparten en orden por la agenda de cada médico, por lo
+        que nunca hay dos citas en el mismo cupo.
+        Los ids se asignan aquí para enlazar las filas sin volver a leerlas;
+        al terminar se sincronizan las secuencias del motor.
+        """
+        estados = [estado for estado, _, _ in ESTADOS_CITA]
+        pesos = [peso for _, peso, _ in ESTADOS_CITA]
+        estado_consulta = {estado: consulta for estado, _, consulta in ESTADOS_CITA}
+        prioridades = _claves(PRIORIDAD_CHOICES)
+        vias = _claves(VIA_ADMINISTRACION_CHOICES)
+        creacion = timezone.now()
+
+        id_consulta = self._siguiente_id(ConsultaMedica)
+        id_cita = self._siguiente_id(CitaMedica)
+        id_tratamiento = self._siguiente_id(Tratamiento)
+        id_receta = self._siguiente_id(RecetaMedica)
+
+        for desde in range(0, self.consultas, self.tamano_lote):
+            consultas, citas, tratamientos, recetas = [], [], [], []
+            for indice in range(desde, min(desde + self.tamano_lote, self.consultas)):
+                cupo, posicion = divmod(indice, len(medicos))
+                medico_id = medicos[posicion]
+                paciente_id = self.azar.choice(pacientes)
+                fecha_hora = self._fecha_hora_cupo(cupo)
+                estado = self.azar.choices(estados, pesos)[0]
+                motivo = self.azar.choice(MOTIVOS)
+                realizada = estado == 'REALIZADA'
+                diagnostico = self.azar.choice(DIAGNOSTICOS) if realizada else None
+
+                consultas.append((
+                    id_consulta, paciente_id, medico_id, fecha_hora, motivo, diagnostico,
+                    estado_consulta[estado], self.azar.choice(prioridades),
+                ))
+                citas.append((
+                    id_cita, paciente_id, medico_id, fecha_hora, motivo, estado, creacion,
+                    id_consulta if realizada else None,
+                ))
+                id_cita += 1
+
+                if realizada and self.azar.random() < 0.5:
+                    duracion = self.azar.choice([3, 5, 7, 10, 14, 30])
+                    descripcion = f'Tratamiento para {diagnostico.lower()}'
+                    tratamientos.append((id_tratamiento, id_consulta, descripcion, plegar(descripcion), duracion))
+                    for _ in range(self.azar.randrange(1, 4)):
+                        recetas.append((
+                            id_receta, id_tratamiento, self.azar.choice(medicamentos),
+                            f'{self.azar.choice([1, 1, 2])} comprimido(s)', self.azar.choice(FRECUENCIAS),
+                            f'{duracion} días', self.azar.choice(vias), 1 + duracion // 10,
+                        ))
+                        id_receta += 1
+                    id_tratamiento += 1
+                id_consulta += 1
+
+            with transaction.atomic():
+                self._insertar_filas(ConsultaMedica, [
+                    'id', 'paciente', 'medico', 'fecha_consulta', 'motivo', 'diagnostico', 'estado', 'prioridad',
+                ], consultas)
+                self._insertar_filas(CitaMedica, [
+                    'id', 'paciente', 'medico', 'fecha_hora_cita', 'motivo', 'estado', 'fecha_creacion',
+                    'consulta_realizada',
+                ], citas)
+                # Sin pasar por el modelo, la clave de búsqueda se calcula aquí
+                self._insertar_filas(Tratamiento, [
+                    'id', 'consulta', 'descripcion', 'busqueda_descripcion', 'duracion_dias',
+                ], tratamientos)
+                # Recetas históricas (ya despachadas): no reservan stock
+                self._insertar_filas(RecetaMedica, [
+                    'id', 'tratamiento', 'medicamento', 'dosis', 'frecuencia', 'duracion', 'via_administracion',
+                    'cantidad',
+                ], recetas)
+
+        self._sincronizar_secuencias([ConsultaMedica, CitaMedica, Tratamiento, RecetaMedica])
+
+    @staticmethod
+    def _sincronizar_secuencias(modelos):
+        """ Ajusta las secuencias de PK tras insertar ids explícitos (PostgreSQL, Oracle). """
+        sentencias = connection.ops.sequence_reset_sql(no_style(), modelos)
+        if sentencias:
+            with connection.cursor() as cursor:
+                for sentencia in sentencias:
+                    cursor.execute(sentencia)
+
+# Modelos que cubre el generador, en orden de borrado (hijos primero)
+MODELOS_GENERADOS = [
+    ResumenRecetasDia, ResumenCitasDia, ResumenConsultasDia, FacturaAseguradora, FacturaPaciente,
+    CorteInventario, MovimientoInventario, RecetaMedica, Tratamiento, CitaMedica, ConsultaMedica, HistorialClinico,
+    Seguro, Horario, Paciente, Medico, Medicamento, Laboratorio, Especialidad,
+]
+
+
+def limpiar():
+    """
+    Vacía las tablas de MODELOS_GENERADOS con un DELETE por tabla, sin
+    cargar filas ni emitir señales: los datos se reemplazan completos, así
+    que no hay reservas de stock que devolver ni grupos de resúmenes que
+    ajustar (sus tablas se vacían también). Borrar con el ORM costaría
+    varias consultas por receta, consulta o cita.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        for modelo in MODELOS_GENERADOS:
+            cursor.execute(f'DELETE FROM {connection.ops.quote_name(modelo._meta.db_table)}')
+    for modelo in MODELOS_GENERADOS:
+        registrar_cambio(modelo)
+
@@ -0,0 +1,143 @@
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from .models import Horario, CitaMedica
+
+# ======================================================================
+# MOTOR DE DISPONIBILIDAD DE MÉDICOS
+# Expande los bloques de Horario en cupos (slots) y descuenta las citas
+# ya agendadas. Los datos se obtienen con un número fijo de consultas:
+# una para los horarios y otra para las citas, sin importar cuántos
+# médicos o días abarque la búsqueda.
+# ======================================================================
+
+# Estados de cita que NO ocupan el cupo (se puede volver a agendar)
+ESTADOS_CITA_LIBERAN_CUPO = ['CANCELADA']
+
+# Duración usada cuando una cita cae fuera de todo bloque de Horario
+DURACION_POR_DEFECTO_MINUTOS = 30
+
+# Límite del rango consultable para acotar el tamaño de la respuesta
+MAX_DIAS_CONSULTA = 31
+
+
+class IndiceIntervalos:
+    """
+    Índice de intervalos [inicio, fin) ordenados por inicio.
+    Guarda el máximo acumulado de los fines para responder en O(log n)
+    si un intervalo cualquiera se solapa con alguno de los indexados.
+    """
+
+    def __init__(self, intervalos):
+        intervalos = sorted(intervalos)
+        self.inicios = [inicio for inicio, _ in intervalos]
+        self.max_fines = []
+        max_fin = None
+        for _, fin in intervalos:
+            max_fin = fin if max_fin is None or fin > max_fin else max_fin
+            self.max_fines.append(max_fin)
+
+    def solapa(self, inicio, fin):
+        # Candidatos: todos los intervalos que comienzan antes de 'fin'.
+        # Alguno se solapa si el mayor de sus fines supera 'inicio'.
+        idx = bisect_left(self.inicios, fin)
+        return idx > 0 and self.max_fines[idx - 1] > inicio
+
+
+def _combinar(fecha, hora):
+    """ Convierte fecha + hora local en un datetime consciente de zona horaria. """
+    return timezone.make_aware(datetime.combine(fecha, hora))
+
+
+def _dias(desde, hasta):
+    dia = desde
+    while dia <= hasta:
+        yield dia
+        dia += timedelta(days=1)
+
+
+def duracion_cita(horarios, fecha_hora):
+    """
+    Devuelve la duración (timedelta) de una cita según el bloque de Horario
+    del médico que la contiene, o la duración por defecto si no hay bloque.
+    """
+    local = timezone.localtime(fecha_hora)
+    for horario in horarios:
+        if (horario.dia_semana == local.isoweekday()
+                and horario.hora_inicio <= local.time() < horario.hora_fin):
+            return timedelta(minutes=horario.duracion_consulta_minutos)
+    return timedelta(minutes=DURACION_POR_DEFECTO_MINUTOS)
+
+
+def cargar_horarios(medico_ids):
+    """ Horarios activos agrupados por médico (una sola consulta). """
+    horarios_por_medico = defaultdict(list)
+    horarios = Horario.objects.filter(medico_id__in=medico_ids, activo=True).order_by()
+    for horario in horarios:
+        horarios_por_medico[horario.medico_id].append(horario)
+    return horarios_por_medico
+
+
+def cargar_citas(medico_ids, inicio, fin):
+    """ Fechas de las citas que ocupan cupo, agrupadas por médico (una sola consulta). """
+    citas_por_medico = defaultdict(list)
+    citas = (
+        CitaMedica.objects
+        .filter(medico_id__in=medico_ids, fecha_hora_cita__gte=inicio, fecha_hora_cita__lt=fin)
+        .exclude(estado__in=ESTADOS_CITA_LIBERAN_CUPO)
+        .order_by()
+        .values_list('medico_id', 'fecha_hora_cita')
+    )
+    for medico_id, fecha_hora in citas:
+        citas_por_medico[medico_id].append(fecha_hora)
+    return citas_por_medico
+
+
+def expandir_slots(horarios, desde, hasta):
+    """ Genera los cupos (inicio, fin) de los horarios entre dos fechas, en orden. """
+    por_dia = defaultdict(list)
+    for horario in horarios:
+        por_dia[horario.dia_semana].append(horario)
+
+    for dia in _dias(desde, hasta):
+        for horario in sorted(por_dia.get(dia.isoweekday(), []), key=lambda h: h.hora_inicio):
+            paso = timedelta(minutes=horario.duracion_consulta_minutos)
+            if paso <= timedelta(0):
+                continue
+            inicio = _combinar(dia, horario.hora_inicio)
+            limite = _combinar(dia, horario.hora_fin)
+            while inicio + paso <= limite:
+                yield inicio, inicio + paso
+                inicio += paso
+
+
+def calcular_disponibilidad(medico_ids, desde, hasta):
+    """
+    Calcula los cupos libres de cada médico entre 'desde' y 'hasta'
+    (fechas, ambas inclusive). Devuelve un dict {medico_id: [(inicio, fin), ...]}.
+    """
+    medico_ids = list(medico_ids)
+    inicio_rango = _combinar(desde, datetime.min.time())
+    fin_rango = _combinar(hasta + timedelta(days=1), datetime.min.time())
+
+    horarios_por_medico = cargar_horarios(medico_ids)
+    # Se amplía el rango de citas en un día para considerar citas que
+    # comienzan antes del rango pero se extienden dentro de él.
+    citas_por_medico = cargar_citas(medico_ids, inicio_rango - timedelta(days=1), fin_rango)
+
+    disponibilidad = {}
+    for medico_id in medico_ids:
+        horarios = horarios_por_medico.get(medico_id, [])
+        indice = IndiceIntervalos(
+            (fecha_hora, fecha_hora + duracion_cita(horarios, fecha_hora))
+            for fecha_hora in citas_por_medico.get(medico_id, [])
+        )
+        disponibilidad[medico_id] = [
+            (inicio, fin)
+            for inicio, fin in expandir_slots(horarios, desde, hasta)
+            if not indice.solapa(inicio, fin)
+        ]
+    return disponibilidad
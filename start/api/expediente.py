@@ -0,0 +1,71 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from .models import (
+    ConsultaMedica,
+    Tratamiento,
+    RecetaMedica,
+    Seguro,
+    CitaMedica,
+    HistorialClinico,
+)
+
+# ======================================================================
+# EXPEDIENTE DEL PACIENTE
+# Árbol clínico completo de un paciente (seguros, historial, citas y
+# consultas -> tratamientos -> recetas -> medicamento) cargado con
+# prefetch_related: siempre 7 consultas (paciente, seguros, historial,
+# citas, consultas, tratamientos y recetas con su medicamento), sin
+# importar cuántas consultas, tratamientos o recetas tenga el paciente.
+# La ventana opcional [desde, hasta] (fechas locales, ambas incluidas)
+# acota historial, citas y consultas; los seguros se devuelven siempre.
+# ======================================================================
+
+
+def _inicio_del_dia(fecha):
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def _ventana(campo, desde, hasta, con_hora):
+    """ Filtro de rango sobre 'campo' que aprovecha el índice (paciente, -campo). """
+    filtro = {}
+    if desde is not None:
+        filtro[f'{campo}__gte'] = _inicio_del_dia(desde) if con_hora else desde
+    if hasta is not None:
+        if con_hora:
+            filtro[f'{campo}__lt'] = _inicio_del_dia(hasta + timedelta(days=1))
+        else:
+            filtro[f'{campo}__lte'] = hasta
+    return filtro
+
+
+def con_expediente(queryset, desde=None, hasta=None):
+    """ 'queryset' de pacientes con el árbol clínico precargado. """
+    recetas = RecetaMedica.objects.select_related('medicamento').order_by('id')
+    tratamientos = Tratamiento.objects.order_by('id').prefetch_related(
+        Prefetch('recetamedica_set', queryset=recetas),
+    )
+    consultas = (
+        ConsultaMedica.objects.filter(**_ventana('fecha_consulta', desde, hasta, con_hora=True))
+        .select_related('medico')
+        .order_by('-fecha_consulta', '-id')
+        .prefetch_related(Prefetch('tratamiento_set', queryset=tratamientos))
+    )
+    citas = (
+        CitaMedica.objects.filter(**_ventana('fecha_hora_cita', desde, hasta, con_hora=True))
+        .select_related('medico')
+        .order_by('-fecha_hora_cita', '-id')
+    )
+    historial = (
+        HistorialClinico.objects.filter(**_ventana('fecha_registro', desde, hasta, con_hora=False))
+        .select_related('registrado_por')
+        .order_by('-fecha_registro', '-id')
+    )
+    return queryset.prefetch_related(
+        Prefetch('seguros', queryset=Seguro.objects.order_by('-fecha_vencimiento', '-id')),
+        Prefetch('historial_clinico', queryset=historial),
+        Prefetch('citas', queryset=citas),
+        Prefetch('consultamedica_set', queryset=consultas),
+    )
@@ -0,0 +1,104 @@
+import csv
+from io import StringIO
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.decorators import action
+from rest_framework.renderers import BaseRenderer
+
+from .renderizadores import codificar_json
+
+# ======================================================================
+# EXPORTACIÓN EN STREAMING (NDJSON / CSV)
+# GET /api/<recurso>/exportar/ entrega todas las filas que cumplen los
+# mismos filtros y búsquedas del listado, sin paginar. En vez de armar la
+# lista completa en memoria, la respuesta es un generador: las filas se
+# leen de la base de datos por bloques con iterator(chunk_size=...) (en
+# PostgreSQL con un cursor del lado del servidor), se convierten con el
+# serializer de lectura y se escriben a medida que el cliente las
+# consume. La memoria usada no depende del tamaño del resultado.
+# El formato se elige con ?format=ndjson|csv o con la cabecera Accept.
+# ======================================================================
+
+# Filas leídas de la base de datos por vuelta del cursor
+TAMANO_BLOQUE_BD = 2000
+# Filas agrupadas en cada trozo enviado al cliente
+FILAS_POR_TROZO = 500
+
+
+class RenderizadorStreaming(BaseRenderer):
+    """
+    Renderizador por generador: 'iterar' produce la respuesta por trozos.
+    'render' existe para que DRF pueda responder errores (400, 404) en el
+    mismo formato negociado.
+    """
+    charset = 'utf-8'
+
+    def iterar(self, filas, campos):
+        raise NotImplementedError
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return codificar_json(data)
+
+
+class RenderizadorNDJSON(RenderizadorStreaming):
+    """ Un objeto JSON por línea. """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def iterar(self, filas, campos):
+        trozo = []
+        for fila in filas:
+            trozo.append(codificar_json(fila))
+            if len(trozo) == FILAS_POR_TROZO:
+                yield b'\n'.join(trozo) + b'\n'
+                trozo = []
+        if trozo:
+            yield b'\n'.join(trozo) + b'\n'
+
+
+class RenderizadorCSV(RenderizadorStreaming):
+    """ CSV con encabezado; los valores nulos quedan vacíos. """
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def iterar(self, filas, campos):
+        buffer = StringIO()
+        escritor = csv.writer(buffer)
+        escritor.writerow(campos)
+        for numero, fila in enumerate(filas, start=1):
+            escritor.writerow([fila[campo] for campo in campos])
+            if numero % FILAS_POR_TROZO == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+
+class ExportacionMixin:
+    """
+    Agrega /exportar/ a un ViewSet que declara 'lectura_serializer_class'.
+    Usa el mismo queryset anotado que el listado, ordenado por
+    'cursor_ordering' para que dos exportaciones iguales salgan iguales.
+    """
+
+    @action(detail=False, methods=['get'], renderer_classes=[RenderizadorNDJSON, RenderizadorCSV],
+            pagination_class=None)
+    def exportar(self, request):
+        """ Todas las filas filtradas, en streaming. GET /api/<recurso>/exportar/?format=ndjson|csv """
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = queryset.order_by(*getattr(self, 'cursor_ordering', ('-id',)))
+        serializer = self.get_serializer()
+        filas = map(serializer.to_representation, queryset.iterator(chunk_size=TAMANO_BLOQUE_BD))
+
+        renderizador = request.accepted_renderer
+        campos = list(serializer.fields)
+        response = StreamingHttpResponse(
+            renderizador.iterar(filas, campos),
+            content_type=f'{renderizador.media_type}; charset={renderizador.charset}',
+        )
+        nombre = f'{self.basename}-{timezone.localdate():%Y%m%d}.{renderizador.format}'
+        response['Content-Disposition'] = f'attachment; filename="{nombre}"'
+        return response
@@ -0,0 +1,201 @@
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from operator import mul
+
+from django.db import transaction
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .coberturas import IndicePolizas, leer_polizas
+from .models import FacturaAseguradora, FacturaPaciente, PuntoControl, RecetaMedica
+
+# ======================================================================
+# FACTURACIÓN MENSUAL
+# Totales del mes por paciente y por aseguradora de las recetas de las
+# consultas del mes (las canceladas no se facturan). En lugar de recorrer
+# consultas -> tratamientos -> recetas como objetos del ORM, el mes se lee
+# en dos consultas por columnas (recetas con su paciente, día y precio, y
+# los seguros vigentes en el mes) y los montos se calculan columna a
+# columna sobre listas paralelas:
+#   - Los montos se llevan en centavos enteros, así que son exactos; lo
+#     cubierto de cada receta se redondea al centavo con ROUND_HALF_UP,
+#     igual que en api/coberturas.py, por lo que la factura coincide con
+#     la estimación de costos de los mismos tratamientos.
+#   - El seguro de cada receta es el vigente el día local de la consulta
+#     (IndicePolizas); se resuelve una vez por par (paciente, día). Las
+#     pólizas se leen con coberturas.leer_polizas, la misma regla de la
+#     estimación (cuentan los seguros desactivados después de vencer).
+# Los resultados se escriben por aseguradora, cada una en su transacción
+# con bulk_create, y el avance queda en PuntoControl: una facturación
+# interrumpida continúa con las aseguradoras que faltaban.
+# ======================================================================
+
+SIN_SEGURO = ''
+
+# Filas por INSERT al escribir las facturas de los pacientes
+TAMANO_LOTE_ESCRITURA = 500
+
+
+def periodo_de(texto):
+    """ Primer día del mes 'AAAA-MM'; ValueError si no es un mes válido. """
+    try:
+        anio, mes = (int(parte) for parte in texto.split('-'))
+        return date(anio, mes, 1)
+    except (AttributeError, TypeError, ValueError):
+        raise ValueError(f'Periodo inválido: {texto!r} (se espera AAAA-MM).')
+
+
+def periodo_anterior(hoy=None):
+    """ Mes anterior al de 'hoy' (por defecto la fecha local): el que se factura a fin de mes. """
+    hoy = hoy or timezone.localdate()
+    return date(hoy.year - 1, 12, 1) if hoy.month == 1 else date(hoy.year, hoy.month - 1, 1)
+
+
+def _mes_siguiente(periodo):
+    return date(periodo.year + 1, 1, 1) if periodo.month == 12 else date(periodo.year, periodo.month + 1, 1)
+
+
+def _centavos(valor):
+    """ Decimal con dos decimales como entero de centavos (exacto). """
+    return int(valor.scaleb(2))
+
+
+def _monto(centavos):
+    return Decimal(centavos).scaleb(-2)
+
+
+# ======================================================================
+# CÁLCULO
+# ======================================================================
+
+def calcular(periodo):
+    """
+    Totales del mes: {aseguradora: {paciente_id: [recetas, total, cubierto]}},
+    con los montos en centavos. Dos consultas SQL sin importar el volumen.
+    """
+    inicio = timezone.make_aware(datetime.combine(periodo, time.min))
+    fin = timezone.make_aware(datetime.combine(_mes_siguiente(periodo), time.min))
+    filas = (
+        RecetaMedica.objects
+        .filter(tratamiento__consulta__fecha_consulta__gte=inicio, tratamiento__consulta__fecha_consulta__lt=fin)
+        .exclude(tratamiento__consulta__estado='CANCELADA')
+        .values_list('tratamiento__consulta__paciente_id', TruncDate('tratamiento__consulta__fecha_consulta'),
+                     'medicamento__precio_unitario', 'cantidad')
+    )
+    columnas = list(zip(*filas))
+    if not columnas:
+        return {}
+    pacientes, dias, precios, cantidades = columnas
+
+    indices = {
+        pk: IndicePolizas(lista)
+        for pk, lista in leer_polizas(desde=periodo, hasta=_mes_siguiente(periodo) - timedelta(days=1)).items()
+    }
+    sin_polizas = IndicePolizas([])
+    vigentes = {
+        par: indices.get(par[0], sin_polizas).vigente(par[1])
+        for par in set(zip(pacientes, dias))
+    }
+    polizas = [vigentes[par] for par in zip(pacientes, dias)]
+
+    # Porcentajes en centésimas de punto: cubierto = subtotal * porcentaje / 10000,
+    # redondeado hacia arriba desde la mitad (los montos nunca son negativos)
+    subtotales = list(map(mul, map(_centavos, precios), cantidades))
+    porcentajes = [_centavos(poliza.porcentaje_cobertura) if poliza else 0 for poliza in polizas]
+    cubiertos = [(subtotal * porcentaje + 5000) // 10000 for subtotal, porcentaje in zip(subtotales, porcentajes)]
+    aseguradoras = [poliza.nombre_aseguradora if poliza else SIN_SEGURO for poliza in polizas]
+
+    totales = defaultdict(lambda: defaultdict(lambda: [0, 0, 0]))
+    for aseguradora, paciente_id, subtotal, cubierto in zip(aseguradoras, pacientes, subtotales, cubiertos):
+        acumulado = totales[aseguradora][paciente_id]
+        acumulado[0] += 1
+        acumulado[1] += subtotal
+        acumulado[2] += cubierto
+    return totales
+
+
+# ======================================================================
+# ESCRITURA Y AVANCE
+# ======================================================================
+
+def escribir(periodo, aseguradora, por_paciente, generado=None):
+    """
+    Reemplaza las facturas de 'aseguradora' en 'periodo' (llamar dentro de
+    una transacción). Devuelve la FacturaAseguradora creada, o None si la
+    aseguradora no tiene recetas en el mes.
+    """
+    FacturaPaciente.objects.filter(periodo=periodo, aseguradora=aseguradora).delete()
+    FacturaAseguradora.objects.filter(periodo=periodo, aseguradora=aseguradora).delete()
+    if not por_paciente:
+        return None
+    FacturaPaciente.objects.bulk_create(
+        [
+            FacturaPaciente(
+                periodo=periodo, aseguradora=aseguradora, paciente_id=paciente_id, recetas=recetas,
+                total=_monto(total), cubierto=_monto(cubierto), copago=_monto(total - cubierto),
+            )
+            for paciente_id, (recetas, total, cubierto) in sorted(por_paciente.items())
+        ],
+        batch_size=TAMANO_LOTE_ESCRITURA,
+    )
+    total = sum(fila[1] for fila in por_paciente.values())
+    cubierto = sum(fila[2] for fila in por_paciente.values())
+    return FacturaAseguradora.objects.create(
+        periodo=periodo, aseguradora=aseguradora, pacientes=len(por_paciente),
+        recetas=sum(fila[0] for fila in por_paciente.values()),
+        total=_monto(total), cubierto=_monto(cubierto), copago=_monto(total - cubierto),
+        generado=generado or timezone.now(),
+    )
+
+
+def facturar(periodo, aseguradoras=None, reiniciar=False, max_aseguradoras=None, informar=None):
+    """
+    Factura (o retoma) 'periodo'. Con 'aseguradoras' recalcula solo esas,
+    aunque ya estuvieran facturadas; 'max_aseguradoras' corta la ejecución
+    (el resto queda para la siguiente). Devuelve el PuntoControl, cuyo
+    resumen lleva los totales de cada aseguradora ya escrita.
+    """
+    punto, creado = PuntoControl.objects.get_or_create(nombre=f'facturacion:{periodo:%Y-%m}')
+    if creado or reiniciar or (punto.terminado and aseguradoras is None):
+        punto.resumen = {'periodo': periodo, 'aseguradoras': {}}
+        punto.iniciado = timezone.now()
+        punto.terminado = None
+        punto.save()
+
+    totales = calcular(periodo)
+    hechas = punto.resumen['aseguradoras']
+    # Aseguradoras facturadas antes que ya no tienen recetas en el mes (p. ej. un seguro corregido)
+    sobrantes = set(
+        FacturaAseguradora.objects.filter(periodo=periodo).exclude(aseguradora__in=list(totales))
+        .values_list('aseguradora', flat=True)
+    )
+    if aseguradoras is None:
+        pendientes = sorted(aseguradora for aseguradora in totales if aseguradora not in hechas)
+    else:
+        pendientes = sorted(aseguradora for aseguradora in aseguradoras if aseguradora in totales)
+        sobrantes &= set(aseguradoras)
+
+    escritas = 0
+    for aseguradora in pendientes:
+        if max_aseguradoras is not None and escritas >= max_aseguradoras:
+            break
+        with transaction.atomic():
+            factura = escribir(periodo, aseguradora, totales[aseguradora])
+            hechas[aseguradora] = {
+                'pacientes': factura.pacientes, 'recetas': factura.recetas,
+                'total': factura.total, 'cubierto': factura.cubierto, 'copago': factura.copago,
+            }
+            punto.save()
+        escritas += 1
+        if informar is not None:
+            informar(aseguradora, punto)
+    else:
+        with transaction.atomic():
+            for aseguradora in sorted(sobrantes):
+                escribir(periodo, aseguradora, {})
+                hechas.pop(aseguradora, None)
+            if aseguradoras is None:
+                punto.terminado = timezone.now()
+            punto.save()
+    return punto
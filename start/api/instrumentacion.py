@@ -0,0 +1,249 @@
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+
+# ======================================================================
+# INSTRUMENTACIÓN DE VISTAS (TIEMPO, CONSULTAS SQL Y CONSULTAS LENTAS)
+# Con INSTRUMENTACION_ACTIVA = True el middleware mide, para cada
+# petición, el tiempo total, la cantidad de consultas SQL, el tiempo
+# pasado en la base de datos y las consultas repetidas (mismo SQL con
+# distintos parámetros: la firma de un N+1). Las consultas más lentas que
+# el umbral se registran en el log junto con su plan (EXPLAIN).
+# Los totales por vista se acumulan en memoria (por proceso) y se exponen
+# en /metricas/ con el formato de texto de Prometheus.
+# ======================================================================
+
+logger = logging.getLogger(__name__)
+
+# Límites (ms) de los buckets del histograma de latencia por vista
+BUCKETS_MS_POR_DEFECTO = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def _configuracion(nombre, por_defecto):
+    return getattr(settings, f'INSTRUMENTACION_{nombre}', por_defecto)
+
+
+class MetricasVista:
+    """ Totales acumulados de una vista. """
+
+    def __init__(self, buckets_ms):
+        self.buckets_ms = buckets_ms
+        self.histograma = [0] * len(buckets_ms)
+        self.peticiones = 0
+        self.segundos = 0.0
+        self.consultas = 0
+        self.segundos_bd = 0.0
+        self.duplicadas = 0
+        self.lentas = 0
+
+    def registrar(self, medicion):
+        duracion_ms = medicion.segundos * 1000
+        for indice, limite in enumerate(self.buckets_ms):
+            if duracion_ms <= limite:
+                self.histograma[indice] += 1
+                break
+        self.peticiones += 1
+        self.segundos += medicion.segundos
+        self.consultas += medicion.consultas
+        self.segundos_bd += medicion.segundos_bd
+        self.duplicadas += medicion.duplicadas
+        self.lentas += medicion.lentas
+
+
+class RegistroMetricas:
+    """ Métricas por vista del proceso, protegidas con un lock. """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.vistas = {}
+
+    def registrar(self, vista, medicion):
+        buckets = tuple(_configuracion('BUCKETS_MS', BUCKETS_MS_POR_DEFECTO))
+        with self._lock:
+            if vista not in self.vistas:
+                self.vistas[vista] = MetricasVista(buckets)
+            self.vistas[vista].registrar(medicion)
+
+    def reiniciar(self):
+        with self._lock:
+            self.vistas = {}
+
+    def exportar(self):
+        """ Texto en formato de exposición de Prometheus. """
+        with self._lock:
+            vistas = sorted(self.vistas.items())
+            lineas = [
+                '# HELP vista_latencia_segundos Duración de las peticiones por vista.',
+                '# TYPE vista_latencia_segundos histogram',
+            ]
+            for vista, m in vistas:
+                acumulado = 0
+                for limite, cantidad in zip(m.buckets_ms, m.histograma):
+                    acumulado += cantidad
+                    lineas.append(f'vista_latencia_segundos_bucket{{vista="{vista}",le="{limite / 1000}"}} {acumulado}')
+                lineas.append(f'vista_latencia_segundos_bucket{{vista="{vista}",le="+Inf"}} {m.peticiones}')
+                lineas.append(f'vista_latencia_segundos_sum{{vista="{vista}"}} {m.segundos:.6f}')
+                lineas.append(f'vista_latencia_segundos_count{{vista="{vista}"}} {m.peticiones}')
+
+            contadores = [
+                ('vista_consultas_sql_total', 'Consultas SQL ejecutadas por vista.', 'consultas', '{}'),
+                ('vista_bd_segundos_total', 'Tiempo en la base de datos por vista.', 'segundos_bd', '{:.6f}'),
+                ('vista_consultas_duplicadas_total', 'Consultas repetidas dentro de una misma petición (N+1).',
+                 'duplicadas', '{}'),
+                ('vista_consultas_lentas_total', 'Consultas sobre el umbral de lentitud.', 'lentas', '{}'),
+            ]
+            for nombre, ayuda, atributo, formato in contadores:
+                lineas.append(f'# HELP {nombre} {ayuda}')
+                lineas.append(f'# TYPE {nombre} counter')
+                for vista, m in vistas:
+                    lineas.append(f'{nombre}{{vista="{vista}"}} ' + formato.format(getattr(m, atributo)))
+        return '\n'.join(lineas) + '\n'
+
+
+metricas = RegistroMetricas()
+
+
+class MedicionPeticion:
+    """
+    Envoltorio de ejecución (connection.execute_wrapper) que cronometra
+    cada consulta de una petición y explica las lentas.
+    """
+
+    def __init__(self, umbral_ms, explicar):
+        self.umbral = umbral_ms / 1000
+        self.explicar = explicar
+        self.vista = None
+        self.segundos = 0.0
+        self.consultas = 0
+        self.segundos_bd = 0.0
+        self.lentas = 0
+        self.sentencias = Counter()
+        self._explicando = False
+
+    @property
+    def duplicadas(self):
+        return sum(repeticiones - 1 for repeticiones in self.sentencias.values())
+
+    def __call__(self, execute, sql, params, many, context):
+        if self._explicando:
+            return execute(sql, params, many, context)
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracion = time.perf_counter() - inicio
+            self.consultas += 1
+            self.segundos_bd += duracion
+            self.sentencias[sql] += 1
+            if duracion >= self.umbral:
+                self.lentas += 1
+                self._registrar_lenta(context['connection'], sql, params, many, duracion)
+
+    def _registrar_lenta(self, conexion, sql, params, many, duracion):
+        plan = ''
+        if self.explicar and not many and sql.lstrip()[:6].upper() == 'SELECT':
+            self._explicando = True
+            try:
+                with conexion.cursor() as cursor:
+                    cursor.execute(f'{conexion.ops.explain_query_prefix()} {sql}', params)
+                    plan = '\n'.join(' '.join(str(columna) for columna in fila) for fila in cursor.fetchall())
+            except Exception as error:  # el plan es informativo: nunca debe romper la petición
+                plan = f'(no se pudo obtener el plan: {error})'
+            finally:
+                self._explicando = False
+        logger.warning(
+            'Consulta lenta (%.1f ms) en %s: %s\nPlan:\n%s',
+            duracion * 1000, self.vista or '?', sql, plan,
+            extra={'vista': self.vista, 'duracion_ms': duracion * 1000, 'sql': sql, 'plan': plan},
+        )
+
+
+def _nombre_vista(request):
+    coincidencia = getattr(request, 'resolver_match', None)
+    if coincidencia is None:
+        return f'{request.method} <sin ruta>'
+    return f'{request.method} {coincidencia.view_name or coincidencia.route}'
+
+
+class InstrumentacionMiddleware:
+    """
+    Mide cada petición y acumula el resultado en 'metricas'.
+    Agrega la cabecera Server-Timing (app y bd) para verla desde el navegador.
+    Si INSTRUMENTACION_ACTIVA es False, Django lo descarta al arrancar y no
+    tiene costo alguno.
+    """
+
+    def __init__(self, get_response):
+        if not _configuracion('ACTIVA', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        medicion = MedicionPeticion(
+            _configuracion('CONSULTA_LENTA_MS', 100),
+            _configuracion('EXPLAIN', True),
+        )
+        inicio = time.perf_counter()
+        with self._midiendo(medicion):
+            request.medicion_instrumentacion = medicion
+            response = self.get_response(request)
+        medicion.vista = _nombre_vista(request)
+
+        if response.streaming and not getattr(response, 'is_async', False):
+            # El cuerpo (y sus consultas, ej. /exportar/) se genera después de
+            # que la vista retorna: la medición sigue mientras se consume y se
+            # registra con el último fragmento. Las cabeceras ya salieron, así
+            # que estas respuestas no llevan Server-Timing.
+            response.streaming_content = self._medir_flujo(response.streaming_content, request, medicion, inicio)
+            return response
+
+        medicion.segundos = time.perf_counter() - inicio
+        self._registrar(request, medicion)
+        response['Server-Timing'] = (
+            f'app;dur={medicion.segundos * 1000:.1f}, '
+            f'bd;dur={medicion.segundos_bd * 1000:.1f};desc="{medicion.consultas} consultas"'
+        )
+        return response
+
+    @staticmethod
+    def _midiendo(medicion):
+        pila = ExitStack()
+        for conexion in connections.all():
+            pila.enter_context(conexion.execute_wrapper(medicion))
+        return pila
+
+    def _medir_flujo(self, contenido, request, medicion, inicio):
+        try:
+            with self._midiendo(medicion):
+                yield from contenido
+        finally:
+            # También si el cliente corta la descarga (el generador se cierra)
+            medicion.segundos = time.perf_counter() - inicio
+            self._registrar(request, medicion)
+
+    @staticmethod
+    def _registrar(request, medicion):
+        if getattr(request, 'resolver_match', None) is None or request.resolver_match.url_name != 'metricas':
+            metricas.registrar(medicion.vista, medicion)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # La vista ya está resuelta: las consultas lentas se informan con su nombre
+        medicion = getattr(request, 'medicion_instrumentacion', None)
+        if medicion is not None:
+            medicion.vista = _nombre_vista(request)
+
+
+def vista_metricas(request):
+    """ GET /metricas/: métricas por vista para un scraper (solo desde IPs permitidas). """
+    if not _configuracion('ACTIVA', False):
+        raise Http404('Instrumentación desactivada')
+    if request.META.get('REMOTE_ADDR') not in _configuracion('IPS_PERMITIDAS', ('127.0.0.1', '::1')):
+        return HttpResponseForbidden()
+    return HttpResponse(metricas.exportar(), content_type='text/plain; version=0.0.4; charset=utf-8')
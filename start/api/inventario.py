@@ -0,0 +1,326 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Case, DateTimeField, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .models import CorteInventario, Medicamento, MovimientoInventario, RecetaMedica
+from .versiones import registrar_cambio
+
+# ======================================================================
+# SERVICIO DE INVENTARIO
+# Aplica movimientos al stock de los medicamentos y los asienta en el
+# libro (MovimientoInventario) dentro de una misma transacción:
+#   - el stock se suma con UPDATE ... SET stock = stock + CASE ... por
+#     lote de medicamentos; las salidas exigen stock suficiente en el
+#     WHERE, así que la comprobación y la escritura son una sola sentencia
+#     y no hay lectura previa que pueda quedar vieja. Si algún
+#     medicamento no alcanza se deshace todo y se responde 409;
+#   - una receta reserva su 'cantidad' y la libera al anularse o al
+#     cambiar de medicamento o cantidad. Lo reservado por cada receta se
+#     lee del libro, de modo que una receta sin reserva (cargada por SQL
+#     directo) no libera stock que nunca tomó;
+#   - los cortes (CorteInventario) guardan el saldo del libro a una fecha:
+#     el stock a cualquier fecha es el último corte anterior más la suma
+#     de los movimientos posteriores, ambos resueltos con un índice;
+#   - la conciliación compara, de a lotes, el stock con el saldo del libro.
+# ======================================================================
+
+# Medicamentos por sentencia UPDATE (cada uno agrega una rama a cada CASE)
+TAMANO_LOTE_STOCK = 200
+
+# Filas por sentencia INSERT del libro
+TAMANO_BATCH_BD = 500
+
+# Hasta cuántos medicamentos se invalidan fila a fila en la caché; con más se avanza la época
+MAXIMO_CAMBIOS_POR_FILA = 20
+
+# Los cortes se toman hasta 'ahora - MARGEN_CORTE': un movimiento lleva la
+# hora en que se creó y puede confirmarse un poco después
+MARGEN_CORTE = timedelta(minutes=5)
+
+# Movimientos que forman la reserva de una receta
+TIPOS_RESERVA = ('RESERVA', 'LIBERACION')
+
+# Fecha anterior a todo movimiento (medicamentos sin cortes)
+ORIGEN = datetime(1900, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class StockInsuficiente(APIException):
+    """ Algún medicamento no tiene stock para la salida pedida (HTTP 409). """
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'No hay stock suficiente del medicamento.'
+    default_code = 'stock_insuficiente'
+
+
+class _Faltante(Exception):
+    """ Un UPDATE condicional no alcanzó a todos sus medicamentos (deshace la transacción). """
+
+
+# ======================================================================
+# MOVIMIENTOS
+# ======================================================================
+
+def _deltas(movimientos):
+    """ {medicamento_id: cambio neto de stock}, sin los que se compensan. """
+    deltas = defaultdict(int)
+    for movimiento in movimientos:
+        deltas[movimiento.medicamento_id] += movimiento.cantidad
+    return {pk: delta for pk, delta in deltas.items() if delta}
+
+
+def _actualizar_stock(deltas):
+    """
+    Suma los deltas al stock, un UPDATE por lote. Devuelve False si algún
+    medicamento no tenía stock para su salida (o no existe).
+    Los lotes van en orden de id: dos transacciones que tocan los mismos
+    medicamentos los bloquean en el mismo orden y no se interbloquean.
+    """
+    ids = sorted(deltas)
+    for desde in range(0, len(ids), TAMANO_LOTE_STOCK):
+        lote = ids[desde:desde + TAMANO_LOTE_STOCK]
+        salidas = [pk for pk in lote if deltas[pk] < 0]
+        condicion = Q(pk__in=[pk for pk in lote if deltas[pk] > 0])
+        if salidas:
+            necesario = Case(*[When(pk=pk, then=Value(-deltas[pk])) for pk in salidas], output_field=IntegerField())
+            condicion |= Q(pk__in=salidas, stock__gte=necesario)
+        delta = Case(*[When(pk=pk, then=Value(deltas[pk])) for pk in lote], output_field=IntegerField())
+        if Medicamento.objects.filter(condicion).update(stock=F('stock') + delta) != len(lote):
+            return False
+    return True
+
+
+def _detalle_faltante(deltas):
+    """ Mensaje con los medicamentos que no alcanzan (leído tras deshacer la transacción). """
+    salidas = {pk: -delta for pk, delta in deltas.items() if delta < 0}
+    faltantes = [
+        f'{nombre} (disponible {stock}, se piden {salidas[pk]})'
+        for pk, nombre, stock in Medicamento.objects.filter(pk__in=salidas).order_by('pk')
+        .values_list('pk', 'nombre', 'stock')
+        if stock < salidas[pk]
+    ]
+    if not faltantes:
+        return None
+    return 'Stock insuficiente: ' + ', '.join(faltantes) + '.'
+
+
+def _registrar(ids):
+    """ Invalida las respuestas en caché de los medicamentos tocados y del libro. """
+    if len(ids) <= MAXIMO_CAMBIOS_POR_FILA:
+        for pk in ids:
+            registrar_cambio(Medicamento, Medicamento(pk=pk))
+    else:
+        registrar_cambio(Medicamento)
+    registrar_cambio(MovimientoInventario)
+
+
+def asentar(movimientos):
+    """ Agrega 'movimientos' al libro sin tocar el stock (ya escrito por otra vía). """
+    movimientos = [movimiento for movimiento in movimientos if movimiento.cantidad]
+    if movimientos:
+        MovimientoInventario.objects.bulk_create(movimientos, batch_size=TAMANO_BATCH_BD)
+        registrar_cambio(MovimientoInventario)
+    return movimientos
+
+
+def aplicar_movimientos(movimientos):
+    """
+    Aplica 'movimientos' (MovimientoInventario sin guardar) al stock y los
+    asienta, todo o nada. Lanza StockInsuficiente si alguna salida no alcanza.
+    """
+    movimientos = [movimiento for movimiento in movimientos if movimiento.cantidad]
+    if not movimientos:
+        return []
+    deltas = _deltas(movimientos)
+    try:
+        with transaction.atomic():
+            if not _actualizar_stock(deltas):
+                raise _Faltante()
+            MovimientoInventario.objects.bulk_create(movimientos, batch_size=TAMANO_BATCH_BD)
+    except _Faltante:
+        raise StockInsuficiente(_detalle_faltante(deltas))
+    _registrar(deltas)
+    return movimientos
+
+
+def registrar_movimiento(medicamento_id, tipo, cantidad, nota=''):
+    """ Ingreso o ajuste manual de stock. Devuelve el movimiento guardado. """
+    movimiento = MovimientoInventario(medicamento_id=medicamento_id, tipo=tipo, cantidad=cantidad, nota=nota)
+    aplicar_movimientos([movimiento])
+    return movimiento
+
+
+def registrar_stock_inicial(medicamentos):
+    """ Asienta el stock con que se crearon 'medicamentos' (lo escribió el INSERT). """
+    asentar([
+        MovimientoInventario(medicamento_id=medicamento.pk, tipo='INGRESO', cantidad=medicamento.stock,
+                             nota='Stock inicial')
+        for medicamento in medicamentos if medicamento.pk is not None
+    ])
+
+
+# ======================================================================
+# RESERVAS DE LAS RECETAS
+# ======================================================================
+
+def _reservado(recetas):
+    """ {receta_id: {medicamento_id: unidades}} que cada receta tiene reservadas según el libro. """
+    reservado = defaultdict(dict)
+    filas = (
+        MovimientoInventario.objects
+        .filter(receta_id__in=[receta.pk for receta in recetas], tipo__in=TIPOS_RESERVA)
+        .values_list('receta_id', 'medicamento_id')
+        .annotate(neto=Sum('cantidad'))
+        .order_by()
+    )
+    for receta_id, medicamento_id, neto in filas:
+        if neto:
+            reservado[receta_id][medicamento_id] = -neto
+    return reservado
+
+
+def _movimientos_reserva(receta, reservado, vigente=True):
+    """ Movimientos que llevan la reserva de 'receta' de 'reservado' a lo que pide (nada si no es vigente). """
+    pedido = {receta.medicamento_id: receta.cantidad} if vigente and receta.cantidad else {}
+    if reservado == pedido:
+        return []
+    movimientos = [
+        MovimientoInventario(medicamento_id=medicamento_id, tipo='LIBERACION', cantidad=unidades, receta_id=receta.pk)
+        for medicamento_id, unidades in reservado.items()
+    ]
+    movimientos += [
+        MovimientoInventario(medicamento_id=medicamento_id, tipo='RESERVA', cantidad=-unidades, receta_id=receta.pk)
+        for medicamento_id, unidades in pedido.items()
+    ]
+    return movimientos
+
+
+def reservar_recetas(recetas, nuevas=False):
+    """
+    Ajusta la reserva de stock de 'recetas' ya guardadas a su medicamento y
+    cantidad actuales. Con 'nuevas' (recién insertadas) no hay reserva previa
+    que leer. Lanza StockInsuficiente; quien llama debe estar en una transacción.
+    """
+    recetas = [receta for receta in recetas if receta.pk is not None]
+    if not recetas:
+        return
+    reservado = {}
+    if not nuevas:
+        # Bloqueo de fila por receta: dos ediciones simultáneas de la misma
+        # receta no pueden partir de la misma reserva
+        list(RecetaMedica.objects.select_for_update().filter(pk__in=[r.pk for r in recetas]).values_list('pk'))
+        reservado = _reservado(recetas)
+    aplicar_movimientos([
+        movimiento for receta in recetas
+        for movimiento in _movimientos_reserva(receta, reservado.get(receta.pk, {}))
+    ])
+
+
+def liberar_receta(sender, instance, **kwargs):
+    """
+    Receptor de post_delete de RecetaMedica: devuelve al stock lo que la
+    receta tenía reservado (también al borrarse en cascada o por lotes).
+    """
+    reservado = _reservado([instance]).get(instance.pk, {})
+    aplicar_movimientos(_movimientos_reserva(instance, reservado, vigente=False))
+
+
+# ======================================================================
+# SALDOS, CORTES Y CONCILIACIÓN
+# ======================================================================
+
+def con_saldo(queryset, instante=None):
+    """
+    'queryset' de medicamentos anotado con 'saldo': el stock según el libro
+    en 'instante' (None: con todos los movimientos). Es el último corte
+    anterior más la suma de los movimientos posteriores, con subconsultas
+    correlacionadas que usan los índices (medicamento, fecha) de ambas tablas.
+    'movimientos_pendientes' queda en NULL si no hay movimientos desde el corte.
+    """
+    cortes = CorteInventario.objects.filter(medicamento=OuterRef('pk')).order_by('-fecha')
+    movimientos = MovimientoInventario.objects.filter(medicamento=OuterRef('pk'), fecha__gt=OuterRef('corte_fecha'))
+    if instante is not None:
+        cortes = cortes.filter(fecha__lte=instante)
+        movimientos = movimientos.filter(fecha__lte=instante)
+    suma = movimientos.order_by().values('medicamento').annotate(total=Sum('cantidad')).values('total')
+    return queryset.annotate(
+        corte_fecha=Coalesce(Subquery(cortes.values('fecha')[:1]), Value(ORIGEN, output_field=DateTimeField())),
+        corte_stock=Coalesce(Subquery(cortes.values('stock')[:1]), 0),
+        movimientos_pendientes=Subquery(suma),
+    ).annotate(
+        saldo=F('corte_stock') + Coalesce(F('movimientos_pendientes'), 0),
+    )
+
+
+def stock_en(medicamento_id, instante):
+    """ Stock del medicamento en 'instante' según el libro. DoesNotExist si no existe. """
+    queryset = con_saldo(Medicamento.objects.filter(pk=medicamento_id), instante)
+    return queryset.values_list('saldo', flat=True).get()
+
+
+def _lotes(tamano_lote, instante=None):
+    """ Medicamentos con su saldo, de a 'tamano_lote' por consulta (keyset sobre el id). """
+    ultimo = 0
+    while True:
+        queryset = con_saldo(Medicamento.objects.filter(pk__gt=ultimo).order_by('pk'), instante)
+        filas = list(queryset.values_list('pk', 'stock', 'saldo', 'movimientos_pendientes')[:tamano_lote])
+        if filas:
+            yield filas
+        if len(filas) < tamano_lote:
+            return
+        ultimo = filas[-1][0]
+
+
+def cortar(instante=None, tamano_lote=1000):
+    """
+    Corte al 'instante' (por defecto ahora - MARGEN_CORTE) de cada
+    medicamento con movimientos desde su último corte. Devuelve cuántos se
+    crearon: los que ya existían (otra ejecución simultánea los guardó
+    primero) se omiten y no se cuentan.
+    """
+    if instante is None:
+        instante = timezone.now() - MARGEN_CORTE
+    creados = 0
+    for filas in _lotes(tamano_lote, instante):
+        cortes = [
+            CorteInventario(medicamento_id=pk, fecha=instante, stock=saldo)
+            for pk, _, saldo, pendientes in filas if pendientes is not None
+        ]
+        if not cortes:
+            continue
+        # ignore_conflicts no informa qué filas insertó: se cuentan las del lote antes y después
+        existentes = CorteInventario.objects.filter(
+            medicamento_id__in=[corte.medicamento_id for corte in cortes], fecha=instante,
+        )
+        antes = existentes.count()
+        CorteInventario.objects.bulk_create(cortes, batch_size=TAMANO_BATCH_BD, ignore_conflicts=True)
+        creados += existentes.count() - antes
+    if creados:
+        registrar_cambio(CorteInventario)
+    return creados
+
+
+def conciliar(tamano_lote=1000, corregir=False):
+    """
+    Compara el stock de cada medicamento con el saldo del libro (leídos en
+    la misma consulta, por lo tanto del mismo instante). Devuelve
+    [(medicamento_id, stock, saldo)] de los que no cuadran. Con 'corregir'
+    asienta un movimiento CONCILIACION por cada diferencia: el stock se da
+    por bueno (lo que descuadra son escrituras que no pasaron por aquí).
+    """
+    diferencias = []
+    for filas in _lotes(tamano_lote):
+        lote = [(pk, stock, saldo) for pk, stock, saldo, _ in filas if stock != saldo]
+        if corregir and lote:
+            with transaction.atomic():
+                asentar([
+                    MovimientoInventario(medicamento_id=pk, tipo='CONCILIACION', cantidad=stock - saldo,
+                                         nota='Conciliación con el stock registrado')
+                    for pk, stock, saldo in lote
+                ])
+        diferencias.extend(lote)
+    return diferencias
@@ -0,0 +1,155 @@
+import base64
+import heapq
+from datetime import datetime, time
+from itertools import islice
+
+from django.db.models import DateTimeField
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import CitaMedica, ConsultaMedica, HistorialClinico
+
+# ======================================================================
+# LÍNEA DE TIEMPO DEL PACIENTE
+# Un solo feed cronológico (más reciente primero) con las citas, las
+# consultas y los registros del historial de un paciente. Cada tabla es
+# un flujo ya ordenado por su índice (paciente, -fecha); la página sale
+# de mezclar los tres flujos con heapq.merge (mezcla de k vías), y cada
+# flujo se lee por bloques con paginación keyset, solo cuando la mezcla
+# necesita su siguiente fila: una página de N eventos lee a lo sumo N+1
+# filas de cada tabla, sin importar cuántos años de historia haya detrás.
+#
+# El orden total es (instante, tipo, id) descendente. Los registros del
+# historial solo tienen fecha: su instante es el comienzo de ese día en
+# la zona horaria local. El cursor (opaco para el cliente) codifica la
+# clave del último evento entregado.
+# ======================================================================
+
+
+class Flujo:
+    """ Una tabla de eventos del paciente, leída en orden descendente de 'campo'. """
+
+    def __init__(self, rango, tipo, modelo, campo, columnas, evento):
+        # 'rango' desempata eventos de distintas tablas con el mismo instante
+        self.rango = rango
+        self.tipo = tipo
+        self.modelo = modelo
+        self.campo = campo
+        self.columnas = ('id', campo) + tuple(columnas)
+        self.evento = evento
+        self.solo_fecha = not isinstance(modelo._meta.get_field(campo), DateTimeField)
+
+    def instante(self, valor):
+        if self.solo_fecha:
+            return timezone.make_aware(datetime.combine(valor, time.min))
+        return valor
+
+    def posteriores(self, queryset, instante, rango, pk):
+        """
+        Restringe 'queryset' a las filas cuya clave (instante, rango, id) es
+        menor que la del cursor, expresado sobre la columna para usar el índice.
+        """
+        valor = instante
+        exacto = True
+        if self.solo_fecha:
+            valor = timezone.localtime(instante).date()
+            # Un instante que no cae a medianoche no coincide con ningún día:
+            # todos los días hasta el suyo quedan antes del cursor
+            exacto = self.instante(valor) == instante
+        if not exacto or self.rango < rango:
+            return queryset.filter(**{f'{self.campo}__lte': valor})
+        if self.rango > rango:
+            return queryset.filter(**{f'{self.campo}__lt': valor})
+        return queryset.filter(**{f'{self.campo}__lte': valor}).exclude(**{self.campo: valor, 'id__gte': pk})
+
+    def leer(self, paciente_id, cursor, bloque):
+        """ Genera (clave, evento) desde el cursor, consultando de a 'bloque' filas. """
+        base = (
+            self.modelo.objects.filter(paciente_id=paciente_id)
+            .order_by(f'-{self.campo}', '-id')
+            .values(*self.columnas)
+        )
+        while True:
+            queryset = base if cursor is None else self.posteriores(base, *cursor)
+            filas = list(queryset[:bloque])
+            for fila in filas:
+                cursor = (self.instante(fila[self.campo]), self.rango, fila['id'])
+                yield cursor, fila
+            if len(filas) < bloque:
+                return
+
+
+def _medico(fila, prefijo='medico'):
+    if fila[f'{prefijo}__nombre'] is None:
+        return None
+    return f"Dr(a). {fila[f'{prefijo}__nombre']} {fila[f'{prefijo}__apellido']}"
+
+
+FLUJOS = [
+    Flujo(0, 'cita', CitaMedica, 'fecha_hora_cita',
+          ('motivo', 'estado', 'observaciones', 'medico__nombre', 'medico__apellido'),
+          lambda f: {'titulo': f['motivo'], 'detalle': f['observaciones'], 'estado': f['estado'],
+                     'medico': _medico(f)}),
+    Flujo(1, 'consulta', ConsultaMedica, 'fecha_consulta',
+          ('motivo', 'diagnostico', 'estado', 'medico__nombre', 'medico__apellido'),
+          lambda f: {'titulo': f['motivo'], 'detalle': f['diagnostico'], 'estado': f['estado'],
+                     'medico': _medico(f)}),
+    Flujo(2, 'historial', HistorialClinico, 'fecha_registro',
+          ('tipo_registro', 'descripcion', 'registrado_por__nombre', 'registrado_por__apellido'),
+          lambda f: {'titulo': f['tipo_registro'], 'detalle': f['descripcion'], 'estado': None,
+                     'medico': _medico(f, 'registrado_por')}),
+]
+TIPOS = {flujo.tipo: flujo for flujo in FLUJOS}
+
+
+# ======================================================================
+# CURSOR OPACO
+# ======================================================================
+
+def codificar_cursor(clave):
+    instante, rango, pk = clave
+    texto = f'{instante.isoformat()}|{rango}|{pk}'
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """ Clave (instante, rango, id) del cursor; ValueError si está dañado. """
+    try:
+        texto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        instante, rango, pk = texto.split('|')
+        instante = parse_datetime(instante)
+        rango, pk = int(rango), int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError('Cursor inválido.')
+    if instante is None or timezone.is_naive(instante) or not 0 <= rango < len(FLUJOS):
+        raise ValueError('Cursor inválido.')
+    return instante, rango, pk
+
+
+# ======================================================================
+# PÁGINA
+# ======================================================================
+
+def pagina(paciente_id, tamano, cursor=None, tipos=None):
+    """
+    Hasta 'tamano' eventos del paciente anteriores al cursor (None: los más
+    recientes). Devuelve (eventos, cursor de la página siguiente o None).
+    """
+    clave = decodificar_cursor(cursor) if cursor else None
+    flujos = [flujo for flujo in FLUJOS if not tipos or flujo.tipo in tipos]
+    mezcla = heapq.merge(
+        *[flujo.leer(paciente_id, clave, tamano + 1) for flujo in flujos],
+        key=lambda par: par[0], reverse=True,
+    )
+    leidos = list(islice(mezcla, tamano + 1))
+    eventos = []
+    for clave_evento, fila in leidos[:tamano]:
+        flujo = FLUJOS[clave_evento[1]]
+        eventos.append({
+            'tipo': flujo.tipo,
+            'id': fila['id'],
+            'fecha': fila[flujo.campo] if flujo.solo_fecha else timezone.localtime(fila[flujo.campo]),
+            **flujo.evento(fila),
+        })
+    siguiente = codificar_cursor(leidos[tamano - 1][0]) if len(leidos) > tamano else None
+    return eventos, siguiente
@@ -0,0 +1,257 @@
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import ProtectedError, RestrictedError
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.field_mapping import get_unique_error_message
+
+from .serializer import PrimaryKeyRelatedFieldLote
+from .versiones import registrar_cambio
+
+# ======================================================================
+# OPERACIONES MASIVAS (LOTES) PARA LOS VIEWSETS
+# Permite crear, actualizar o eliminar muchos registros en una sola
+# petición: se valida todo el lote, se escribe con bulk_create/bulk_update
+# dentro de una única transacción y los errores se informan por elemento.
+# Las FK de cada lote se resuelven con una consulta IN por campo, y los
+# campos únicos se comprueban igual (no con un UniqueValidator por elemento).
+# bulk_create/bulk_update no emiten señales: el cambio se registra a mano
+# para invalidar las respuestas en caché (ver api/versiones.py).
+# ======================================================================
+
+# Máximo de elementos aceptados en una petición
+MAX_ELEMENTOS_LOTE = 10000
+
+# Filas por sentencia INSERT/UPDATE enviada a la base de datos
+TAMANO_BATCH_BD = 500
+
+
+def _pk_desde_dato(campo_pk, dato):
+    """ Normaliza un valor de PK recibido (int o str); None si no es válido. """
+    if dato is None or dato == '' or isinstance(dato, bool):
+        return None
+    try:
+        return campo_pk.to_python(dato)
+    except (TypeError, ValueError, DjangoValidationError):
+        return None
+
+
+def precargar_relaciones(serializer, items):
+    """
+    Resuelve de una vez las FK de todo el lote: por cada campo de relación
+    escribible del serializer hace una sola consulta IN con los ids recibidos.
+    Devuelve {nombre_campo: {pk: objeto}} para el contexto 'fk_precargadas'.
+    """
+    precargados = {}
+    for nombre, campo in serializer.fields.items():
+        if campo.read_only or not isinstance(campo, PrimaryKeyRelatedFieldLote):
+            continue
+        queryset = campo.get_queryset()
+        campo_pk = queryset.model._meta.pk
+        pks = {
+            _pk_desde_dato(campo_pk, item.get(nombre))
+            for item in items if isinstance(item, dict)
+        }
+        pks.discard(None)
+        precargados[nombre] = queryset.in_bulk(pks) if pks else {}
+    return precargados
+
+
+def _campos_unicos(serializer):
+    """ {campo: (columna, mensaje)} de los campos escribibles del serializer con valor único en el modelo. """
+    opciones = serializer.Meta.model._meta
+    columnas = getattr(serializer, 'columnas_unicas', {})
+    unicos = {}
+    for nombre, campo in serializer.fields.items():
+        if campo.read_only:
+            continue
+        try:
+            campo_modelo = opciones.get_field(campo.source)
+        except FieldDoesNotExist:
+            continue
+        if campo_modelo.unique and not campo_modelo.primary_key:
+            unicos[nombre] = (columnas.get(nombre, campo_modelo.attname), get_unique_error_message(campo_modelo))
+    return unicos
+
+
+def comprobar_unicos(serializer, objetos, campos=None):
+    """
+    Duplicados de los campos únicos de todo el lote (ya validado sin
+    UniqueValidator, ver contexto 'unicos_por_lote'): entre los propios
+    elementos y, con una consulta IN por campo, contra las demás filas de la
+    base. 'campos' limita la comprobación a los atributos escritos por el lote.
+    Devuelve los errores alineados con 'objetos'.
+    """
+    modelo = serializer.Meta.model
+    for objeto in objetos:
+        if hasattr(objeto, 'completar_claves'):
+            objeto.completar_claves()
+    propios = [objeto.pk for objeto in objetos if objeto.pk is not None]
+
+    errores = [{} for _ in objetos]
+    for nombre, (columna, mensaje) in _campos_unicos(serializer).items():
+        if campos is not None and serializer.fields[nombre].source not in campos:
+            continue
+        indices = {}
+        for indice, objeto in enumerate(objetos):
+            valor = getattr(objeto, columna)
+            if valor is None:
+                continue
+            if valor in indices:
+                errores[indice][nombre] = [f'Valor repetido en el lote (elemento {indices[valor]}).']
+            else:
+                indices[valor] = indice
+        if not indices:
+            continue
+        existentes = (modelo._default_manager.filter(**{f'{columna}__in': indices})
+                      .exclude(pk__in=propios).values_list(columna, flat=True))
+        for valor in existentes:
+            if valor in indices:
+                errores[indices[valor]][nombre] = [mensaje]
+    return errores
+
+
+def _errores_por_elemento(errores):
+    # ListSerializer entrega los errores como lista alineada con la entrada
+    # o como dict {indice: errores}, según la versión/configuración de DRF.
+    pares = errores.items() if isinstance(errores, dict) else enumerate(errores)
+    return [
+        {'indice': indice, 'errores': error}
+        for indice, error in sorted(pares, key=lambda par: par[0]) if error
+    ]
+
+
+def _validar_lista(datos):
+    if not isinstance(datos, list) or not datos:
+        raise ValidationError({'detail': 'Se esperaba una lista no vacía de elementos.'})
+    if len(datos) > MAX_ELEMENTOS_LOTE:
+        raise ValidationError({'detail': f'El lote no puede superar {MAX_ELEMENTOS_LOTE} elementos.'})
+
+
+def _conflicto(error):
+    return Response({'detail': str(error)}, status=status.HTTP_409_CONFLICT)
+
+
+class OperacionesMasivasMixin:
+    """
+    Agrega a un ModelViewSet el endpoint /<recurso>/lote/:
+      - POST   [{...}, ...]               crea todos los elementos.
+      - PUT    [{"id": 1, ...}, ...]      actualiza todos los elementos.
+      - PATCH  [{"id": 1, ...}, ...]      actualización parcial.
+      - DELETE [1, 2, 3]                  elimina por id.
+    El lote es atómico: si un elemento falla no se escribe ninguno.
+    """
+
+    def comprobar_lote(self, objetos):
+        """
+        Reglas que involucran a todo el lote y a la base de datos (p. ej. los
+        cupos de las citas). Se llama dentro de la transacción, antes de
+        escribir; una APIException descarta el lote completo.
+        """
+
+    @action(detail=False, methods=['post', 'put', 'patch', 'delete'], url_path='lote')
+    def lote(self, request, *args, **kwargs):
+        if request.method == 'POST':
+            return self.crear_lote(request)
+        if request.method == 'DELETE':
+            return self.eliminar_lote(request)
+        return self.actualizar_lote(request, parcial=request.method == 'PATCH')
+
+    def crear_lote(self, request):
+        datos = request.data
+        _validar_lista(datos)
+
+        serializer = self.get_serializer(data=datos, many=True)
+        serializer.context['unicos_por_lote'] = True
+        serializer.context['fk_precargadas'] = precargar_relaciones(serializer.child, datos)
+        if not serializer.is_valid():
+            return Response({'errores': _errores_por_elemento(serializer.errors)},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        modelo = self.get_queryset().model
+        objetos = [modelo(**atributos) for atributos in serializer.validated_data]
+        errores = comprobar_unicos(serializer.child, objetos)
+        if any(errores):
+            return Response({'errores': _errores_por_elemento(errores)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            with transaction.atomic():
+                self.comprobar_lote(objetos)
+                modelo.objects.bulk_create(objetos, batch_size=TAMANO_BATCH_BD)
+                registrar_cambio(modelo)
+        except IntegrityError as error:
+            return _conflicto(error)
+
+        return Response(self.get_serializer(objetos, many=True).data, status=status.HTTP_201_CREATED)
+
+    def actualizar_lote(self, request, parcial=False):
+        datos = request.data
+        _validar_lista(datos)
+
+        modelo = self.get_queryset().model
+        campo_pk = modelo._meta.pk
+        ids = [_pk_desde_dato(campo_pk, item.get('id')) if isinstance(item, dict) else None for item in datos]
+        instancias = self.get_queryset().in_bulk([pk for pk in ids if pk is not None])
+
+        serializer_class = self.get_serializer_class()
+        contexto = self.get_serializer_context()
+        contexto['unicos_por_lote'] = True
+        contexto['fk_precargadas'] = precargar_relaciones(serializer_class(context=contexto), datos)
+
+        errores = []
+        validos = []
+        for item, pk in zip(datos, ids):
+            instancia = instancias.get(pk)
+            if instancia is None:
+                errores.append({'id': ['No existe un elemento con ese id.']})
+                continue
+            serializer = serializer_class(instancia, data=item, partial=parcial, context=contexto)
+            if serializer.is_valid():
+                validos.append((instancia, serializer.validated_data))
+                errores.append({})
+            else:
+                errores.append(serializer.errors)
+
+        if any(errores):
+            return Response({'errores': _errores_por_elemento(errores)}, status=status.HTTP_400_BAD_REQUEST)
+
+        campos = set()
+        for instancia, atributos in validos:
+            for nombre, valor in atributos.items():
+                setattr(instancia, nombre, valor)
+                campos.add(nombre)
+        errores = comprobar_unicos(serializer_class(context=contexto), [i for i, _ in validos], campos)
+        if any(errores):
+            return Response({'errores': _errores_por_elemento(errores)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            with transaction.atomic():
+                self.comprobar_lote([i for i, _ in validos])
+                modelo.objects.bulk_update([i for i, _ in validos], sorted(campos), batch_size=TAMANO_BATCH_BD)
+                registrar_cambio(modelo)
+        except IntegrityError as error:
+            return _conflicto(error)
+
+        return Response(self.get_serializer([i for i, _ in validos], many=True).data)
+
+    def eliminar_lote(self, request):
+        datos = request.data
+        _validar_lista(datos)
+
+        modelo = self.get_queryset().model
+        campo_pk = modelo._meta.pk
+        ids = {_pk_desde_dato(campo_pk, dato) for dato in datos}
+        ids.discard(None)
+
+        queryset = modelo.objects.filter(pk__in=ids)
+        existentes = set(queryset.values_list('pk', flat=True))
+        try:
+            with transaction.atomic():
+                queryset.delete()
+        except (ProtectedError, RestrictedError) as error:
+            return _conflicto(error.args[0])
+
+        return Response({
+            'eliminados': len(existentes),
+            'no_encontrados': sorted(ids - existentes),
+        })
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import inventario
+
+# Diferencias que se listan en la salida
+MAXIMO_LISTADO = 50
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara, por lotes, el stock de cada medicamento con el saldo del libro de '
+        'movimientos. Termina con error si hay diferencias; con --corregir asienta un '
+        'movimiento de conciliación por cada una (el stock registrado se da por bueno).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help='Medicamentos por consulta.')
+        parser.add_argument('--corregir', action='store_true',
+                            help='Asienta las diferencias en el libro en vez de solo informarlas.')
+
+    def handle(self, *args, **opciones):
+        if opciones['lote'] < 1:
+            raise CommandError('--lote debe ser mayor que cero.')
+        diferencias = inventario.conciliar(opciones['lote'], opciones['corregir'])
+        for pk, stock, saldo in diferencias[:MAXIMO_LISTADO]:
+            self.stdout.write(f'Medicamento {pk}: stock {stock}, libro {saldo} ({stock - saldo:+d}).')
+        if len(diferencias) > MAXIMO_LISTADO:
+            self.stdout.write(f'... y {len(diferencias) - MAXIMO_LISTADO} más.')
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS('El stock cuadra con el libro de movimientos.'))
+        elif opciones['corregir']:
+            self.stdout.write(self.style.SUCCESS(f'{len(diferencias)} diferencias asentadas en el libro.'))
+        else:
+            raise CommandError(f'{len(diferencias)} medicamentos no cuadran con el libro (use --corregir).')
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import resumenes
+from api.management.commands.reconstruir_resumenes import _rango, _tipos
+
+# Diferencias que se listan en la salida (por resumen)
+MAXIMO_LISTADO = 50
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara, de a tramos de días, las tablas de resumen de los tableros con los conteos '
+        'calculados desde las tablas de atenciones. Termina con error si hay diferencias; con '
+        '--corregir reconstruye los tramos que las tienen.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipos', nargs='*', help=f'Resúmenes a comparar: {", ".join(resumenes.RESUMENES)}.')
+        parser.add_argument('--desde', help='Primer día a comparar (AAAA-MM-DD). Por defecto, el primero con datos.')
+        parser.add_argument('--hasta', help='Último día a comparar (AAAA-MM-DD). Por defecto, el último con datos.')
+        parser.add_argument('--corregir', action='store_true',
+                            help='Reconstruye los tramos con diferencias en vez de solo informarlas.')
+
+    def handle(self, *args, **opciones):
+        tipos = _tipos(opciones['tipos'])
+        desde, hasta = _rango(opciones['desde'], opciones['hasta'])
+        total = 0
+        for tipo in tipos:
+            resumen = resumenes.RESUMENES[tipo]
+            diferencias = resumenes.conciliar(resumen, desde, hasta, opciones['corregir'])
+            for grupo, esperado, guardado in diferencias[:MAXIMO_LISTADO]:
+                detalle = ', '.join(
+                    f'{medida} {valor} (resumen {actual})'
+                    for medida, valor, actual in zip(resumen.medidas, esperado, guardado)
+                )
+                self.stdout.write(f"{tipo} {' '.join(str(parte) for parte in grupo)}: {detalle}")
+            if len(diferencias) > MAXIMO_LISTADO:
+                self.stdout.write(f'... y {len(diferencias) - MAXIMO_LISTADO} más.')
+            self.stdout.write(f'{tipo}: {len(diferencias)} grupos con diferencias.')
+            total += len(diferencias)
+
+        if not total:
+            self.stdout.write(self.style.SUCCESS('Los resúmenes cuadran con las tablas de atenciones.'))
+        elif opciones['corregir']:
+            self.stdout.write(self.style.SUCCESS(f'{total} grupos corregidos.'))
+        else:
+            raise CommandError(f'{total} grupos no cuadran con las tablas de atenciones (use --corregir).')
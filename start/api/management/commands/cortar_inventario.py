@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from api import inventario
+
+
+class Command(BaseCommand):
+    help = (
+        'Guarda un corte de inventario (el stock según el libro de movimientos) de cada '
+        'medicamento con movimientos desde su último corte. Programado a diario, acota '
+        'el cálculo del stock en una fecha a los movimientos de un día.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help='Fecha y hora del corte (ISO 8601). Por defecto, '
+                            f'ahora menos {inventario.MARGEN_CORTE}.')
+        parser.add_argument('--lote', type=int, default=1000, help='Medicamentos por consulta.')
+
+    def handle(self, *args, **opciones):
+        if opciones['lote'] < 1:
+            raise CommandError('--lote debe ser mayor que cero.')
+        instante = None
+        if opciones['fecha']:
+            instante = parse_datetime(opciones['fecha'])
+            if instante is None:
+                raise CommandError('--fecha debe ser una fecha y hora ISO 8601 (ej: 2024-05-01T00:00).')
+            if timezone.is_naive(instante):
+                instante = timezone.make_aware(instante)
+            if instante > timezone.now() - inventario.MARGEN_CORTE:
+                raise CommandError(f'El corte debe ser anterior a ahora menos {inventario.MARGEN_CORTE}: '
+                                   'los movimientos en curso podrían quedar fuera.')
+
+        inicio = time.perf_counter()
+        creados = inventario.cortar(instante, opciones['lote'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{creados} cortes de inventario en {time.perf_counter() - inicio:.1f} s.'
+        ))
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import barridos
+
+
+class Command(BaseCommand):
+    help = (
+        'Ejecuta los barridos por lotes (stock bajo el mínimo, seguros vencidos). '
+        'Un barrido interrumpido se retoma desde su último lote. Sin argumentos, todos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('nombres', nargs='*', help=f'Barridos a ejecutar: {", ".join(barridos.BARRIDOS)}.')
+        parser.add_argument('--lote', type=int, default=1000, help='Filas por lote.')
+        parser.add_argument('--max-lotes', type=int, help='Lotes por ejecución; el resto queda para la siguiente.')
+        parser.add_argument('--pausa', type=float, default=0, help='Segundos de espera entre lotes.')
+        parser.add_argument('--reiniciar', action='store_true',
+                            help='Empieza desde el principio aunque haya una ejecución a medias.')
+
+    def handle(self, *args, **opciones):
+        nombres = opciones['nombres'] or list(barridos.BARRIDOS)
+        desconocidos = [nombre for nombre in nombres if nombre not in barridos.BARRIDOS]
+        if desconocidos:
+            raise CommandError(f'Barridos desconocidos: {", ".join(desconocidos)}.')
+        if opciones['lote'] < 1 or (opciones['max_lotes'] is not None and opciones['max_lotes'] < 1):
+            raise CommandError('--lote y --max-lotes deben ser mayores que cero.')
+
+        for nombre in nombres:
+            barrido = barridos.BARRIDOS[nombre]
+            inicio = time.perf_counter()
+            punto = barridos.ejecutar(
+                barrido, opciones['lote'], opciones['reiniciar'], opciones['max_lotes'], opciones['pausa'],
+            )
+            resumen = punto.resumen
+            estado = 'terminado' if punto.terminado else 'pendiente (se retoma en la próxima ejecución)'
+            self.stdout.write(
+                f"{nombre}: {resumen['revisados']} filas en {resumen['lotes']} lotes, {estado} "
+                f"({time.perf_counter() - inicio:.1f} s)."
+            )
+            for linea in barrido.informe(resumen):
+                self.stdout.write(linea)
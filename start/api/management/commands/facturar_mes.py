@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import facturacion
+
+
+class Command(BaseCommand):
+    help = (
+        'Calcula la facturación de un mes (recetas de las consultas del mes con la cobertura '
+        'de sus seguros) y la guarda por paciente y por aseguradora. Una facturación '
+        'interrumpida se retoma con las aseguradoras que faltaban.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('periodo', nargs='?', help='Mes a facturar (AAAA-MM). Por defecto, el mes anterior.')
+        parser.add_argument('--aseguradora', action='append', dest='aseguradoras',
+                            help='Recalcula solo esta aseguradora (repetible; "" para las recetas sin seguro).')
+        parser.add_argument('--max-aseguradoras', type=int,
+                            help='Aseguradoras por ejecución; el resto queda para la siguiente.')
+        parser.add_argument('--reiniciar', action='store_true',
+                            help='Recalcula todas las aseguradoras aunque haya una facturación a medias.')
+
+    def handle(self, *args, **opciones):
+        try:
+            periodo = facturacion.periodo_de(opciones['periodo']) if opciones['periodo'] else facturacion.periodo_anterior()
+        except ValueError as error:
+            raise CommandError(str(error))
+        if opciones['max_aseguradoras'] is not None and opciones['max_aseguradoras'] < 1:
+            raise CommandError('--max-aseguradoras debe ser mayor que cero.')
+
+        def informar(aseguradora, punto):
+            fila = punto.resumen['aseguradoras'][aseguradora]
+            self.stdout.write(
+                f"  {aseguradora or 'Sin seguro'}: {fila['pacientes']} pacientes, {fila['recetas']} recetas, "
+                f"total {fila['total']}, cubierto {fila['cubierto']}, copago {fila['copago']}"
+            )
+
+        inicio = time.perf_counter()
+        punto = facturacion.facturar(
+            periodo, opciones['aseguradoras'], opciones['reiniciar'], opciones['max_aseguradoras'], informar,
+        )
+        estado = 'terminada' if punto.terminado else 'pendiente (se retoma en la próxima ejecución)'
+        self.stdout.write(self.style.SUCCESS(
+            f"Facturación {periodo:%Y-%m}: {len(punto.resumen['aseguradoras'])} aseguradoras, {estado} "
+            f"({time.perf_counter() - inicio:.1f} s)."
+        ))
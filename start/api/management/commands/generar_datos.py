@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.datos_sinteticos import GeneradorDatos, MODELOS_GENERADOS, limpiar
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera un conjunto de datos sintéticos realista y consistente '
+        '(médicos, pacientes, citas, consultas, tratamientos, recetas, seguros e historiales). '
+        'La misma semilla produce siempre los mismos datos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consultas', type=int, default=10000,
+                            help='Cantidad de consultas (y citas); el resto de las tablas escala en proporción.')
+        parser.add_argument('--semilla', type=int, default=0, help='Semilla del generador aleatorio.')
+        parser.add_argument('--lote', type=int, default=5000, help='Filas por bulk_create.')
+        parser.add_argument('--limpiar', action='store_true',
+                            help='Elimina los datos existentes de las tablas generadas antes de empezar.')
+
+    def handle(self, *args, **opciones):
+        if opciones['consultas'] < 1 or opciones['lote'] < 1:
+            raise CommandError('--consultas y --lote deben ser mayores que cero.')
+
+        if opciones['limpiar']:
+            limpiar()
+        elif any(modelo.objects.exists() for modelo in MODELOS_GENERADOS):
+            raise CommandError('La base de datos ya contiene datos; use --limpiar para reemplazarlos.')
+
+        avance = {}
+
+        def informar(modelo, cantidad):
+            nombre = modelo.__name__
+            if cantidad - avance.get(nombre, 0) >= 100000:
+                avance[nombre] = cantidad
+                self.stdout.write(f'  {nombre}: {cantidad}...')
+
+        inicio = time.perf_counter()
+        generador = GeneradorDatos(opciones['consultas'], opciones['semilla'], opciones['lote'], informar)
+        cantidades = generador.generar()
+
+        for modelo, cantidad in cantidades.items():
+            self.stdout.write(f'{modelo.__name__}: {cantidad}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Datos generados en {time.perf_counter() - inicio:.1f} s (semilla {opciones["semilla"]}).'
+        ))
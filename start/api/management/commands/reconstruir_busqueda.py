@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from api import busqueda_texto
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstruye desde cero los índices de búsqueda de texto completo '
+        '(FTS5 en SQLite, índice GIN en PostgreSQL). Sin argumentos, todos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipos', nargs='*', help=f'Índices a reconstruir: {", ".join(busqueda_texto.INDICES)}.')
+        parser.add_argument('--verificar', action='store_true',
+                            help='Solo verifica que el índice coincida con la tabla (SQLite).')
+
+    def handle(self, *args, **opciones):
+        tipos = opciones['tipos'] or list(busqueda_texto.INDICES)
+        desconocidos = [tipo for tipo in tipos if tipo not in busqueda_texto.INDICES]
+        if desconocidos:
+            raise CommandError(f'Índices desconocidos: {", ".join(desconocidos)}.')
+        if busqueda_texto.motor() not in ('sqlite', 'postgresql'):
+            raise CommandError(f'El motor {busqueda_texto.motor()} no tiene índice de texto completo.')
+
+        for tipo in tipos:
+            indice = busqueda_texto.INDICES[tipo]
+            inicio = time.perf_counter()
+            if opciones['verificar']:
+                try:
+                    busqueda_texto.verificar(indice)
+                except DatabaseError as error:
+                    raise CommandError(f'{tipo}: el índice no coincide con la tabla ({error}).')
+                self.stdout.write(f'{tipo}: índice consistente.')
+            else:
+                busqueda_texto.reconstruir(indice)
+                self.stdout.write(f'{tipo}: reconstruido en {time.perf_counter() - inicio:.1f} s.')
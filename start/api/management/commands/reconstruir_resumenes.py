@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from api import resumenes
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstruye las tablas de resumen de los tableros desde las tablas de atenciones, '
+        'de a tramos de días, cada uno en su transacción. Con --desde, solo desde ese día '
+        '(p. ej. tras una carga por SQL directo). Sin argumentos, todos los resúmenes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipos', nargs='*', help=f'Resúmenes a reconstruir: {", ".join(resumenes.RESUMENES)}.')
+        parser.add_argument('--desde', help='Primer día a reconstruir (AAAA-MM-DD). Por defecto, el primero con datos.')
+        parser.add_argument('--hasta', help='Último día a reconstruir (AAAA-MM-DD). Por defecto, el último con datos.')
+
+    def handle(self, *args, **opciones):
+        tipos = _tipos(opciones['tipos'])
+        desde, hasta = _rango(opciones['desde'], opciones['hasta'])
+        for tipo in tipos:
+            inicio = time.perf_counter()
+            escritos = resumenes.reconstruir(resumenes.RESUMENES[tipo], desde, hasta)
+            self.stdout.write(f'{tipo}: {escritos} grupos en {time.perf_counter() - inicio:.1f} s.')
+
+
+def _tipos(tipos):
+    tipos = tipos or list(resumenes.RESUMENES)
+    desconocidos = [tipo for tipo in tipos if tipo not in resumenes.RESUMENES]
+    if desconocidos:
+        raise CommandError(f'Resúmenes desconocidos: {", ".join(desconocidos)}.')
+    return tipos
+
+
+def _rango(desde, hasta):
+    fechas = []
+    for nombre, texto in (('--desde', desde), ('--hasta', hasta)):
+        fecha = None
+        if texto:
+            try:
+                fecha = parse_date(texto)
+            except ValueError:
+                pass
+            if fecha is None:
+                raise CommandError(f'{nombre} debe ser una fecha AAAA-MM-DD.')
+        fechas.append(fecha)
+    if all(fechas) and fechas[1] < fechas[0]:
+        raise CommandError('--hasta debe ser posterior o igual a --desde.')
+    return fechas
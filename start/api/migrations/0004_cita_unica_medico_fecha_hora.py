@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_citamedica_historialclinico_horario_laboratorio_and_more'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='citamedica',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado', 'CANCELADA'), _negated=True), fields=('medico', 'fecha_hora_cita'), name='cita_unica_medico_fecha_hora'),
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_cita_unica_medico_fecha_hora'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='citamedica',
+            index=models.Index(fields=['paciente', 'estado', '-fecha_hora_cita'], name='cita_paciente_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='citamedica',
+            index=models.Index(fields=['medico', 'fecha_hora_cita'], name='cita_medico_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='citamedica',
+            index=models.Index(fields=['-fecha_hora_cita', '-id'], name='cita_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='consultamedica',
+            index=models.Index(fields=['medico', 'estado', '-fecha_consulta'], name='consulta_medico_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='consultamedica',
+            index=models.Index(fields=['paciente', '-fecha_consulta'], name='consulta_paciente_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='consultamedica',
+            index=models.Index(fields=['-fecha_consulta', '-id'], name='consulta_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historialclinico',
+            index=models.Index(fields=['paciente', '-fecha_registro'], name='historial_paciente_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historialclinico',
+            index=models.Index(fields=['tipo_registro'], name='historial_tipo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historialclinico',
+            index=models.Index(fields=['-fecha_registro', '-id'], name='historial_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='horario',
+            index=models.Index(fields=['medico', 'dia_semana', 'activo'], name='horario_medico_dia_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='horario',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['medico', 'dia_semana'], name='horario_activo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicamento',
+            index=models.Index(fields=['nombre'], name='medicamento_nombre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicamento',
+            index=models.Index(fields=['categoria', 'nombre'], name='medicamento_categoria_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medico',
+            index=models.Index(fields=['apellido', 'nombre'], name='medico_apellido_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medico',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['especialidad', 'apellido'], name='medico_activo_esp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paciente',
+            index=models.Index(fields=['apellido', 'nombre'], name='paciente_apellido_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='seguro',
+            index=models.Index(fields=['paciente', 'activo'], name='seguro_paciente_activo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='seguro',
+            index=models.Index(fields=['fecha_vencimiento'], name='seguro_vencimiento_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='seguro',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['fecha_vencimiento', 'paciente'], name='seguro_activo_vencimiento_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations
+
+from api.busqueda_texto import IndiceTexto, crear_indices, eliminar_indices
+
+# Definición congelada al momento de la migración (api/busqueda_texto.py puede cambiar)
+INDICES = [
+    IndiceTexto('api_historialclinico', ['descripcion']),
+    IndiceTexto('api_consultamedica', ['motivo', 'diagnostico']),
+    IndiceTexto('api_tratamiento', ['observaciones']),
+]
+
+
+def crear(apps, schema_editor):
+    crear_indices(schema_editor.connection, INDICES)
+
+
+def eliminar(apps, schema_editor):
+    eliminar_indices(schema_editor.connection, INDICES)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_indices_filtros_api'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear, eliminar),
+    ]
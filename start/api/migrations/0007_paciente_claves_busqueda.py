@@ -0,0 +1,88 @@
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+import api.rut
+
+TAMANO_LOTE = 2000
+
+# Copias de api.rut.clave_rut y api.models.plegar tal como estaban al crear
+# esta migración: un cambio posterior de esas funciones no debe alterar lo
+# que calcula (ni un error al importarlas impedir migrar una base nueva).
+SEPARADORES_RUT = re.compile(r'[.\-\s]')
+
+
+def clave_rut(texto):
+    return SEPARADORES_RUT.sub('', texto).upper().lstrip('0')
+
+
+def plegar(texto):
+    descompuesto = unicodedata.normalize('NFKD', texto)
+    return ' '.join(''.join(c for c in descompuesto if not unicodedata.combining(c)).lower().split())
+
+
+def completar_claves(apps, schema_editor):
+    # Mismo cálculo que Paciente.completar_claves (el modelo histórico no tiene métodos).
+    # Los RUT anteriores a esta migración no se validaban: la clave de uno mal
+    # escrito puede tener hasta 12 caracteres, igual que rut, y por eso la
+    # columna tiene ese largo (con 10, PostgreSQL rechazaría el UPDATE).
+    Paciente = apps.get_model('api', 'Paciente')
+    lote = []
+    for paciente in Paciente.objects.only('id', 'rut', 'nombre', 'apellido').iterator(chunk_size=TAMANO_LOTE):
+        paciente.rut_normalizado = clave_rut(paciente.rut)
+        paciente.busqueda_apellido = plegar(f'{paciente.apellido} {paciente.nombre}')
+        paciente.busqueda_nombre = plegar(f'{paciente.nombre} {paciente.apellido}')
+        lote.append(paciente)
+        if len(lote) == TAMANO_LOTE:
+            Paciente.objects.bulk_update(lote, ['rut_normalizado', 'busqueda_apellido', 'busqueda_nombre'])
+            lote = []
+    Paciente.objects.bulk_update(lote, ['rut_normalizado', 'busqueda_apellido', 'busqueda_nombre'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_busqueda_texto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paciente',
+            name='rut_normalizado',
+            field=models.CharField(default='', editable=False, max_length=12),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='paciente',
+            name='busqueda_apellido',
+            field=models.CharField(default='', editable=False, max_length=201),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='paciente',
+            name='busqueda_nombre',
+            field=models.CharField(default='', editable=False, max_length=201),
+            preserve_default=False,
+        ),
+        migrations.RunPython(completar_claves, migrations.RunPython.noop),
+        # Si falla aquí, hay pacientes con el mismo RUT escrito en formatos distintos
+        migrations.AlterField(
+            model_name='paciente',
+            name='rut_normalizado',
+            field=models.CharField(editable=False, max_length=12, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='paciente',
+            name='rut',
+            field=models.CharField(max_length=12, unique=True, validators=[api.rut.validar_rut]),
+        ),
+        migrations.AddIndex(
+            model_name='paciente',
+            index=models.Index(fields=['busqueda_apellido'], name='paciente_busqueda_apellido_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paciente',
+            index=models.Index(fields=['busqueda_nombre'], name='paciente_busqueda_nombre_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_paciente_claves_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='citamedica',
+            index=models.Index(fields=['paciente', '-fecha_hora_cita', '-id'], name='cita_paciente_fecha_idx'),
+        ),
+    ]
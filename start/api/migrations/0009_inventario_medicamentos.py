@@ -0,0 +1,63 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+TAMANO_LOTE = 2000
+
+
+def asentar_stock_inicial(apps, schema_editor):
+    # El stock existente abre el libro de cada medicamento (ver api/inventario.py)
+    Medicamento = apps.get_model('api', 'Medicamento')
+    MovimientoInventario = apps.get_model('api', 'MovimientoInventario')
+    lote = []
+    for pk, stock in Medicamento.objects.exclude(stock=0).values_list('pk', 'stock').iterator(chunk_size=TAMANO_LOTE):
+        lote.append(MovimientoInventario(medicamento_id=pk, tipo='INGRESO', cantidad=stock, nota='Stock inicial'))
+        if len(lote) == TAMANO_LOTE:
+            MovimientoInventario.objects.bulk_create(lote)
+            lote = []
+    MovimientoInventario.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_cita_paciente_fecha'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recetamedica',
+            name='cantidad',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.CreateModel(
+            name='CorteInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField()),
+                ('stock', models.IntegerField()),
+                ('medicamento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cortes', to='api.medicamento')),
+            ],
+            options={
+                'verbose_name_plural': 'Cortes de Inventario',
+                'constraints': [models.UniqueConstraint(fields=('medicamento', 'fecha'), name='corte_unico_medicamento_fecha')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MovimientoInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('INGRESO', 'Ingreso de stock'), ('RESERVA', 'Reserva por receta'), ('LIBERACION', 'Liberación de receta'), ('AJUSTE', 'Ajuste manual'), ('CONCILIACION', 'Conciliación')], max_length=15)),
+                ('cantidad', models.IntegerField()),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('nota', models.CharField(blank=True, default='', max_length=255)),
+                ('medicamento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimientos', to='api.medicamento')),
+                ('receta', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='movimientos_inventario', to='api.recetamedica')),
+            ],
+            options={
+                'verbose_name_plural': 'Movimientos de Inventario',
+                'indexes': [models.Index(fields=['medicamento', 'fecha'], name='movimiento_medicamento_idx')],
+            },
+        ),
+        migrations.RunPython(asentar_stock_inicial, migrations.RunPython.noop),
+    ]
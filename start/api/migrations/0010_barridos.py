@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:29
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_inventario_medicamentos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PuntoControl',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True)),
+                ('posicion', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('resumen', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('iniciado', models.DateTimeField(default=django.utils.timezone.now)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('terminado', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Puntos de Control',
+            },
+        ),
+        migrations.AddField(
+            model_name='medicamento',
+            name='stock_minimo',
+            field=models.PositiveIntegerField(default=10),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:35
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_barridos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacturaAseguradora',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.DateField()),
+                ('aseguradora', models.CharField(blank=True, max_length=100)),
+                ('pacientes', models.PositiveIntegerField()),
+                ('recetas', models.PositiveIntegerField()),
+                ('total', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('cubierto', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('copago', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('generado', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name_plural': 'Facturas por Aseguradora',
+                'constraints': [models.UniqueConstraint(fields=('periodo', 'aseguradora'), name='factura_unica_periodo_aseguradora')],
+            },
+        ),
+        migrations.CreateModel(
+            name='FacturaPaciente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.DateField()),
+                ('aseguradora', models.CharField(blank=True, max_length=100)),
+                ('recetas', models.PositiveIntegerField()),
+                ('total', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('cubierto', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('copago', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('paciente', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='facturas', to='api.paciente')),
+            ],
+            options={
+                'verbose_name_plural': 'Facturas por Paciente',
+                'indexes': [models.Index(fields=['paciente', '-periodo'], name='factura_paciente_idx')],
+                'constraints': [models.UniqueConstraint(fields=('periodo', 'aseguradora', 'paciente'), name='factura_unica_periodo_paciente')],
+            },
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+# (resumen, origen, instante que define el día, claves del grupo, medidas) (ver api/resumenes.py)
+RESUMENES = [
+    ('ResumenConsultasDia', 'ConsultaMedica', 'fecha_consulta', ['medico_id', 'estado', 'prioridad'],
+     {'cantidad': Count('id')}),
+    ('ResumenCitasDia', 'CitaMedica', 'fecha_hora_cita', ['medico_id', 'estado'], {'cantidad': Count('id')}),
+    ('ResumenRecetasDia', 'RecetaMedica', 'tratamiento__consulta__fecha_consulta', ['medicamento_id'],
+     {'recetas': Count('id'), 'unidades': Sum('cantidad')}),
+]
+
+
+def calcular_resumenes(apps, schema_editor):
+    # Los resúmenes arrancan con los conteos de las atenciones existentes
+    for resumen, origen, fecha, claves, medidas in RESUMENES:
+        Resumen = apps.get_model('api', resumen)
+        filas = (
+            apps.get_model('api', origen).objects.annotate(dia=TruncDate(fecha))
+            .values_list('dia', *claves).annotate(**{f'total_{m}': a for m, a in medidas.items()}).order_by()
+        )
+        campos = ['dia', *claves, *medidas]
+        Resumen.objects.bulk_create([Resumen(**dict(zip(campos, fila))) for fila in filas], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_facturacion_mensual'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenCitasDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('estado', models.CharField(choices=[('AGENDADA', 'Agendada'), ('CONFIRMADA', 'Confirmada'), ('REALIZADA', 'Realizada'), ('CANCELADA', 'Cancelada'), ('NO_ASISTIO', 'No Asistió')], max_length=15)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('medico', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.medico')),
+            ],
+            options={
+                'verbose_name_plural': 'Resúmenes de Citas',
+                'constraints': [models.UniqueConstraint(fields=('dia', 'medico', 'estado'), name='resumen_citas_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenConsultasDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('REALIZADA', 'Realizada'), ('CANCELADA', 'Cancelada')], max_length=10)),
+                ('prioridad', models.CharField(choices=[('BAJA', 'Baja'), ('NORMAL', 'Normal'), ('ALTA', 'Alta'), ('URGENTE', 'Urgente')], max_length=10)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('medico', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.medico')),
+            ],
+            options={
+                'verbose_name_plural': 'Resúmenes de Consultas',
+                'constraints': [models.UniqueConstraint(fields=('dia', 'medico', 'estado', 'prioridad'), name='resumen_consultas_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenRecetasDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('recetas', models.IntegerField(default=0)),
+                ('unidades', models.IntegerField(default=0)),
+                ('medicamento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.medicamento')),
+            ],
+            options={
+                'verbose_name_plural': 'Resúmenes de Recetas',
+                'constraints': [models.UniqueConstraint(fields=('dia', 'medicamento'), name='resumen_recetas_unico')],
+            },
+        ),
+        migrations.RunPython(calcular_resumenes, migrations.RunPython.noop),
+    ]
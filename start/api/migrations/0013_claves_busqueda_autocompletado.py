@@ -0,0 +1,97 @@
+import unicodedata
+
+from django.db import migrations, models
+
+TAMANO_LOTE = 2000
+
+# (modelo, {clave: campos que la forman}) tal como estaban al crear esta migración
+CLAVES_BUSQUEDA = [
+    ('Especialidad', {'busqueda_nombre': ('nombre',)}),
+    ('Medico', {'busqueda_apellido': ('apellido', 'nombre'), 'busqueda_nombre': ('nombre', 'apellido')}),
+    ('Medicamento', {'busqueda_nombre': ('nombre',)}),
+    ('Tratamiento', {'busqueda_descripcion': ('descripcion',)}),
+]
+
+
+# Copia de api.models.plegar (ver 0007_paciente_claves_busqueda)
+def plegar(texto):
+    descompuesto = unicodedata.normalize('NFKD', texto)
+    return ' '.join(''.join(c for c in descompuesto if not unicodedata.combining(c)).lower().split())
+
+
+def completar_claves(apps, schema_editor):
+    # Mismo cálculo que ClavesBusquedaMixin.completar_claves (el modelo histórico no tiene métodos)
+    for nombre, claves in CLAVES_BUSQUEDA:
+        modelo = apps.get_model('api', nombre)
+        origen = sorted({campo for campos in claves.values() for campo in campos})
+        lote = []
+        for objeto in modelo.objects.only('id', *origen).iterator(chunk_size=TAMANO_LOTE):
+            for clave, campos in claves.items():
+                texto = plegar(' '.join(getattr(objeto, campo) or '' for campo in campos))
+                setattr(objeto, clave, texto[:modelo._meta.get_field(clave).max_length])
+            lote.append(objeto)
+            if len(lote) == TAMANO_LOTE:
+                modelo.objects.bulk_update(lote, list(claves))
+                lote = []
+        modelo.objects.bulk_update(lote, list(claves))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_resumenes_tableros'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='especialidad',
+            name='busqueda_nombre',
+            field=models.CharField(default='', editable=False, max_length=100),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='medicamento',
+            name='busqueda_nombre',
+            field=models.CharField(default='', editable=False, max_length=100),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='medico',
+            name='busqueda_apellido',
+            field=models.CharField(default='', editable=False, max_length=201),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='medico',
+            name='busqueda_nombre',
+            field=models.CharField(default='', editable=False, max_length=201),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='tratamiento',
+            name='busqueda_descripcion',
+            field=models.CharField(default='', editable=False, max_length=500),
+            preserve_default=False,
+        ),
+        migrations.RunPython(completar_claves, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='especialidad',
+            index=models.Index(fields=['busqueda_nombre'], name='especialidad_busqueda_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicamento',
+            index=models.Index(fields=['busqueda_nombre'], name='medicamento_busqueda_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medico',
+            index=models.Index(fields=['busqueda_apellido'], name='medico_busqueda_apellido_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medico',
+            index=models.Index(fields=['busqueda_nombre'], name='medico_busqueda_nombre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tratamiento',
+            index=models.Index(fields=['busqueda_descripcion'], name='tratamiento_busqueda_idx'),
+        ),
+    ]
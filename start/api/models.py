@@ -1,6 +1,13 @@
-from django.db import models
+import unicodedata
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models import Q
 from django.utils import timezone
 
+from .rut import CARACTERES_RUT, clave_rut, formatear_rut, normalizar_rut, validar_rut
+
 # ======================================================================
 # BLOQUE DE CONSTANTES DE CHOICES
 # Se definen las opciones para campos que deben tener un conjunto fijo de valores.
@@ -91,13 +98,235 @@ TIPO_COBERTURA_CHOICES = [
     ('PREMIUM', 'Cobertura Premium'),
 ]
 
+# CHOICES para el campo 'tipo' en MovimientoInventario
+TIPO_MOVIMIENTO_CHOICES = [
+    ('INGRESO', 'Ingreso de stock'),
+    ('RESERVA', 'Reserva por receta'),
+    ('LIBERACION', 'Liberación de receta'),
+    ('AJUSTE', 'Ajuste manual'),
+    ('CONCILIACION', 'Conciliación'),
+]
+
+# ======================================================================
+# BÚSQUEDA DE PACIENTES
+# Paciente guarda, además de los datos escritos, claves de búsqueda
+# calculadas al guardar (save, bulk_create y bulk_update):
+#   - rut_normalizado: clave del RUT sin formato, con índice único. Un RUT
+#     escrito en cualquier formato se resuelve con una sola búsqueda en ese
+#     índice, y dos formatos del mismo RUT no pueden registrarse dos veces;
+#   - busqueda_apellido / busqueda_nombre: 'apellido nombre' y
+#     'nombre apellido' en minúsculas y sin tildes, con índice B-tree. La
+#     búsqueda por nombre es un rango de prefijo sobre esos índices (igual
+#     que en cualquier motor, sin depender de LIKE ni de la collation).
+# QuerySet.update() no pasa por aquí: quien cambie rut, nombre o apellido
+# con update() debe recalcular las claves.
+# ======================================================================
+
+CAMPOS_CLAVE_PACIENTE = {
+    'rut': ('rut_normalizado',),
+    'nombre': ('busqueda_apellido', 'busqueda_nombre'),
+    'apellido': ('busqueda_apellido', 'busqueda_nombre'),
+}
+
+
+def plegar(texto):
+    """ 'texto' en minúsculas, sin tildes y con los espacios simplificados ('  Núñez ' -> 'nunez'). """
+    descompuesto = unicodedata.normalize('NFKD', texto)
+    return ' '.join(''.join(c for c in descompuesto if not unicodedata.combining(c)).lower().split())
+
+
+def _prefijo(campo, prefijo):
+    # Igual que autocompletar.prefijo_rango: "empieza con" resuelto por el índice B-tree
+    return Q(**{f'{campo}__gte': prefijo, f'{campo}__lt': prefijo + '\uffff'})
+
+
+def condicion_busqueda_paciente(texto):
+    """
+    Q para buscar pacientes por lo que se escriba en recepción:
+    - un RUT completo o parcial, en cualquier formato -> prefijo de rut_normalizado;
+    - un correo (contiene '@') -> prefijo del correo;
+    - cualquier otra cosa -> prefijo de 'apellido nombre' o de 'nombre apellido'.
+    """
+    texto = texto.strip()
+    if CARACTERES_RUT.fullmatch(texto) and any(c.isdigit() for c in texto):
+        return _prefijo('rut_normalizado', clave_rut(texto))
+    if '@' in texto:
+        return _prefijo('correo', texto)
+    clave = plegar(texto)
+    return _prefijo('busqueda_apellido', clave) | _prefijo('busqueda_nombre', clave)
+
+
+class PacienteQuerySet(models.QuerySet):
+
+    def buscar(self, texto):
+        return self.filter(condicion_busqueda_paciente(texto))
+
+    def por_rut(self, texto):
+        """ Paciente con ese RUT (cualquier formato). ValueError si el RUT no es válido. """
+        return self.get(rut_normalizado=normalizar_rut(texto))
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.completar_claves()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.completar_claves()
+        fields = list(fields) + _campos_clave(fields)
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+
+def _campos_clave(campos):
+    """ Claves de búsqueda que dependen de alguno de 'campos'. """
+    return sorted({clave for campo in campos for clave in CAMPOS_CLAVE_PACIENTE.get(campo, ())})
+
+
+# ======================================================================
+# CLAVES DE BÚSQUEDA DEL AUTOCOMPLETADO
+# Médicos, especialidades, medicamentos y tratamientos guardan, igual que
+# Paciente, sus textos de búsqueda plegados (minúsculas y sin tildes) en
+# columnas con índice B-tree: el autocompletado y el admin buscan por
+# rango de prefijo sobre ellas en vez de istartswith/icontains, que no
+# usan índices. Cada modelo declara en 'claves_busqueda' qué campos forman
+# cada clave; se calculan en save(), bulk_create y bulk_update.
+# QuerySet.update() no pasa por aquí.
+# ======================================================================
+
+class ClavesBusquedaQuerySet(models.QuerySet):
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.completar_claves()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.completar_claves()
+        fields = list(fields) + self.model.campos_clave(fields)
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+
+class ClavesBusquedaMixin:
+    """ Modelo con claves de búsqueda plegadas: {clave: (campos que la forman, en orden)}. """
+    claves_busqueda = {}
+
+    def completar_claves(self):
+        # Recortada al largo de la columna: NFKD puede alargar el texto (ej: 'ﬁ' -> 'fi')
+        for clave, campos in self.claves_busqueda.items():
+            texto = plegar(' '.join(getattr(self, campo) or '' for campo in campos))
+            setattr(self, clave, texto[:self._meta.get_field(clave).max_length])
+
+    @classmethod
+    def campos_clave(cls, campos):
+        """ Claves de búsqueda que dependen de alguno de 'campos'. """
+        return sorted(clave for clave, origen in cls.claves_busqueda.items() if set(origen) & set(campos))
+
+    def save(self, *args, **kwargs):
+        self.completar_claves()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = list(kwargs['update_fields']) + self.campos_clave(kwargs['update_fields'])
+        super().save(*args, **kwargs)
+
+
+# ======================================================================
+# RESÚMENES PARA TABLEROS
+# Consultas, citas, tratamientos y recetas mantienen al día las tablas de
+# conteos por día de los tableros (ver api/resumenes.py): save() y delete()
+# con señales, y bulk_create/bulk_update con el QuerySet de abajo.
+# QuerySet.update() y el SQL directo no pasan por aquí.
+# ======================================================================
+
+class ResumenQuerySet(models.QuerySet):
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from .resumenes import registrar_altas
+
+        with transaction.atomic(using=self.db):
+            creados = super().bulk_create(objs, *args, **kwargs)
+            registrar_altas(self.model, creados)
+        return creados
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        from .resumenes import afecta, completar_originales, registrar_cambios
+
+        if not afecta(self.model, fields):
+            return super().bulk_update(objs, fields, *args, **kwargs)
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            completar_originales(self.model, objs)
+            filas = super().bulk_update(objs, fields, *args, **kwargs)
+            registrar_cambios(self.model, objs, fields)
+        return filas
+
+
+class TratamientoQuerySet(ClavesBusquedaQuerySet, ResumenQuerySet):
+    pass
+
+
+# ======================================================================
+# INVENTARIO DE MEDICAMENTOS
+# El stock de cada medicamento se mueve solo con movimientos de
+# inventario (MovimientoInventario, un libro al que solo se agregan
+# filas): el stock inicial, las reservas de las recetas y sus
+# liberaciones, y los ajustes manuales. Cada movimiento se aplica con un
+# UPDATE ... SET stock = stock + n que, para las salidas, exige stock
+# suficiente en el mismo WHERE; así dos reservas simultáneas del mismo
+# medicamento no pueden dejarlo en negativo ni perderse una a la otra.
+# Guardar, crear o actualizar en lote y eliminar recetas reserva o
+# libera su 'cantidad' (ver api/inventario.py). QuerySet.update() y el
+# SQL directo no pasan por aquí.
+# ======================================================================
+
+class MedicamentoQuerySet(ClavesBusquedaQuerySet):
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from .inventario import registrar_stock_inicial
+
+        with transaction.atomic(using=self.db):
+            creados = super().bulk_create(objs, *args, **kwargs)
+            registrar_stock_inicial(creados)
+        return creados
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        # Igual que Medicamento.save(): el stock no se escribe desde las instancias
+        fields = [campo for campo in fields if campo != 'stock']
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+
+class RecetaQuerySet(ResumenQuerySet):
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from .inventario import reservar_recetas
+
+        with transaction.atomic(using=self.db):
+            creadas = super().bulk_create(objs, *args, **kwargs)
+            reservar_recetas(creadas, nuevas=True)
+        return creadas
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        from .inventario import reservar_recetas
+
+        if not {'medicamento', 'cantidad'} & set(fields):
+            return super().bulk_update(objs, fields, *args, **kwargs)
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            filas = super().bulk_update(objs, fields, *args, **kwargs)
+            reservar_recetas(objs)
+        return filas
+
+
 # ======================================================================
 # MODELOS BASE DEL DIAGRAMA
 # Se definen los modelos principales de la clínica Salud Vital Ltda.
 # Cada modelo representa una tabla en la base de datos.
 # ======================================================================
 
-class Especialidad(models.Model):
+class Especialidad(ClavesBusquedaMixin, models.Model):
     """
     Modelo para registrar las diferentes especialidades médicas disponibles.
     Contiene un nombre único y una descripción de la especialidad.
@@ -106,9 +335,20 @@ class Especialidad(models.Model):
     nombre = models.CharField(max_length=100, unique=True) # string, nombre
     descripcion = models.CharField(max_length=255, blank=True, null=True) # string, descripcion
 
+    # Clave de búsqueda (ver CLAVES DE BÚSQUEDA DEL AUTOCOMPLETADO)
+    busqueda_nombre = models.CharField(max_length=100, editable=False) # string, nombre plegado
+    claves_busqueda = {'busqueda_nombre': ('nombre',)}
+
+    objects = ClavesBusquedaQuerySet.as_manager()
+
     def __str__(self):
         return self.nombre
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['busqueda_nombre'], name='especialidad_busqueda_idx'),
+        ]
+
 class Laboratorio(models.Model):
     """
     Modelo para registrar la información de los laboratorios clínicos.
@@ -129,7 +369,7 @@ class Paciente(models.Model):
     Incluye un CHOICES para el tipo de sangre y género.
     """
     # id (int, PK) se crea automáticamente por Django
-    rut = models.CharField(max_length=12, unique=True) # string, rut
+    rut = models.CharField(max_length=12, unique=True, validators=[validar_rut]) # string, rut
     nombre = models.CharField(max_length=100) # string, nombre
     apellido = models.CharField(max_length=100) # string, apellido
     fecha_nacimiento = models.DateField() # date, fecha_nacimiento
@@ -140,10 +380,49 @@ class Paciente(models.Model):
     direccion = models.CharField(max_length=255) # string, direccion
     activo = models.BooleanField(default=True) # boolean, activo
 
+    # Claves de búsqueda (ver BÚSQUEDA DE PACIENTES); se calculan al guardar
+    rut_normalizado = models.CharField(max_length=12, unique=True, editable=False) # string, ej: 123456785
+    busqueda_apellido = models.CharField(max_length=201, editable=False) # string, 'apellido nombre' plegado
+    busqueda_nombre = models.CharField(max_length=201, editable=False) # string, 'nombre apellido' plegado
+
+    objects = PacienteQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.nombre} {self.apellido} ({self.rut})"
 
-class Medico(models.Model):
+    def completar_claves(self):
+        self.rut_normalizado = clave_rut(self.rut)
+        self.busqueda_apellido = plegar(f'{self.apellido} {self.nombre}')
+        self.busqueda_nombre = plegar(f'{self.nombre} {self.apellido}')
+
+    def clean(self):
+        # Formularios y admin: el RUT se guarda con el formato estándar y no
+        # puede repetirse aunque el existente esté escrito de otra forma
+        super().clean()
+        try:
+            clave = normalizar_rut(self.rut or '')
+        except ValueError:
+            return  # Lo informa validar_rut
+        self.rut = formatear_rut(clave[:-1])
+        if Paciente.objects.filter(rut_normalizado=clave).exclude(pk=self.pk).exists():
+            raise ValidationError({'rut': 'Ya existe un paciente con este RUT.'})
+
+    def save(self, *args, **kwargs):
+        self.completar_claves()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = list(kwargs['update_fields']) + _campos_clave(kwargs['update_fields'])
+        super().save(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            # Orden del admin y búsqueda por apellido (autocompletado)
+            models.Index(fields=['apellido', 'nombre'], name='paciente_apellido_idx'),
+            # Búsqueda por prefijo del nombre completo, en ambos órdenes
+            models.Index(fields=['busqueda_apellido'], name='paciente_busqueda_apellido_idx'),
+            models.Index(fields=['busqueda_nombre'], name='paciente_busqueda_nombre_idx'),
+        ]
+
+class Medico(ClavesBusquedaMixin, models.Model):
     """
     Modelo para registrar la información de un médico.
     Tiene una relación de uno a muchos con Especialidad (un médico tiene una especialidad).
@@ -161,9 +440,29 @@ class Medico(models.Model):
     # on_delete=models.PROTECT evita borrar una especialidad si hay médicos asociados.
     especialidad = models.ForeignKey(Especialidad, on_delete=models.PROTECT) 
 
+    # Claves de búsqueda (ver CLAVES DE BÚSQUEDA DEL AUTOCOMPLETADO)
+    busqueda_apellido = models.CharField(max_length=201, editable=False) # string, 'apellido nombre' plegado
+    busqueda_nombre = models.CharField(max_length=201, editable=False) # string, 'nombre apellido' plegado
+    claves_busqueda = {
+        'busqueda_apellido': ('apellido', 'nombre'),
+        'busqueda_nombre': ('nombre', 'apellido'),
+    }
+
+    objects = ClavesBusquedaQuerySet.as_manager()
+
     def __str__(self):
         return f"Dr(a). {self.nombre} {self.apellido} - {self.especialidad.nombre}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['apellido', 'nombre'], name='medico_apellido_idx'),
+            models.Index(fields=['busqueda_apellido'], name='medico_busqueda_apellido_idx'),
+            models.Index(fields=['busqueda_nombre'], name='medico_busqueda_nombre_idx'),
+            # Médicos activos por especialidad (disponibilidad multi-médico)
+            models.Index(fields=['especialidad', 'apellido'], condition=models.Q(activo=True),
+                         name='medico_activo_esp_idx'),
+        ]
+
 class ConsultaMedica(models.Model):
     """
     Modelo para registrar una atención médica específica.
@@ -185,10 +484,21 @@ class ConsultaMedica(models.Model):
     estado = models.CharField(max_length=10, choices=ESTADO_CONSULTA_CHOICES, default='PENDIENTE') # string, estado
     prioridad = models.CharField(max_length=10, choices=PRIORIDAD_CHOICES, default='NORMAL') # string, prioridad (NUEVO)
 
+    objects = ResumenQuerySet.as_manager()
+
     def __str__(self):
         return f"Consulta N°{self.id} - {self.paciente.apellido} con Dr(a). {self.medico.apellido}"
 
-class Tratamiento(models.Model):
+    class Meta:
+        indexes = [
+            # Filtros ?medico=&estado= / ?paciente= de la API, en el orden de la paginación
+            models.Index(fields=['medico', 'estado', '-fecha_consulta'], name='consulta_medico_estado_idx'),
+            models.Index(fields=['paciente', '-fecha_consulta'], name='consulta_paciente_fecha_idx'),
+            # Orden del listado (cursor) y date_hierarchy del admin
+            models.Index(fields=['-fecha_consulta', '-id'], name='consulta_fecha_idx'),
+        ]
+
+class Tratamiento(ClavesBusquedaMixin, models.Model):
     """
     Modelo para registrar un tratamiento derivado de una consulta médica.
     Relación de uno a muchos con ConsultaMedica.
@@ -203,28 +513,73 @@ class Tratamiento(models.Model):
     duracion_dias = models.IntegerField() # int, duracion_dias
     observaciones = models.TextField(blank=True, null=True) # string, observaciones
 
+    # Clave de búsqueda (ver CLAVES DE BÚSQUEDA DEL AUTOCOMPLETADO)
+    busqueda_descripcion = models.CharField(max_length=500, editable=False) # string, descripcion plegada
+    claves_busqueda = {'busqueda_descripcion': ('descripcion',)}
+
+    objects = TratamientoQuerySet.as_manager()
+
     def __str__(self):
-        return f"Tratamiento de Consulta N°{self.consulta.id} - {self.descripcion[:30]}..."
+        return f"Tratamiento de Consulta N°{self.consulta_id} - {self.descripcion[:30]}..."
 
-class Medicamento(models.Model):
+    class Meta:
+        indexes = [
+            models.Index(fields=['busqueda_descripcion'], name='tratamiento_busqueda_idx'),
+        ]
+
+class Medicamento(ClavesBusquedaMixin, models.Model):
     """
     Modelo para registrar la información de un medicamento.
+    El stock de un medicamento ya guardado solo cambia con movimientos de
+    inventario (ver INVENTARIO DE MEDICAMENTOS): save() no lo escribe.
     """
     # id (int, PK) se crea automáticamente por Django
     nombre = models.CharField(max_length=100) # string, nombre
     laboratorio = models.CharField(max_length=100) # string, laboratorio
     categoria = models.CharField(max_length=20, choices=CATEGORIA_MEDICAMENTO_CHOICES, default='OTRO') # string, categoria (NUEVO)
     stock = models.IntegerField(default=0) # int, stock
+    # int, punto de reposición: bajo este stock el barrido de inventario lo informa
+    stock_minimo = models.PositiveIntegerField(default=10)
     # decimal, precio_unitario - Uso de DecimalField para mayor precisión monetaria.
     precio_unitario = models.DecimalField(max_digits=10, decimal_places=2) 
 
+    # Clave de búsqueda (ver CLAVES DE BÚSQUEDA DEL AUTOCOMPLETADO)
+    busqueda_nombre = models.CharField(max_length=100, editable=False) # string, nombre plegado
+    claves_busqueda = {'busqueda_nombre': ('nombre',)}
+
+    objects = MedicamentoQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.nombre} ({self.laboratorio})"
 
+    def save(self, *args, **kwargs):
+        from .inventario import registrar_stock_inicial
+
+        if not self._state.adding:
+            # Escribir el stock leído antes pisaría las reservas concurrentes
+            campos = kwargs.get('update_fields')
+            if campos is None:
+                campos = [campo.name for campo in self._meta.concrete_fields if not campo.primary_key]
+            kwargs['update_fields'] = [campo for campo in campos if campo != 'stock']
+            super().save(*args, **kwargs)
+            return
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            registrar_stock_inicial([self])
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['nombre'], name='medicamento_nombre_idx'),
+            models.Index(fields=['categoria', 'nombre'], name='medicamento_categoria_idx'),
+            models.Index(fields=['busqueda_nombre'], name='medicamento_busqueda_idx'),
+        ]
+
 class RecetaMedica(models.Model):
     """
     Modelo que representa la relación (tabla intermedia) entre un Tratamiento y los Medicamentos.
     Es una tabla de detalle para la relación muchos a muchos implícita.
+    Guardar una receta reserva 'cantidad' unidades del medicamento y
+    eliminarla las libera (ver INVENTARIO DE MEDICAMENTOS).
     """
     # id (int, PK) se crea automáticamente por Django
     
@@ -239,9 +594,20 @@ class RecetaMedica(models.Model):
     frecuencia = models.CharField(max_length=100) # string, frecuencia
     duracion = models.CharField(max_length=100) # string, duracion (ej: '7 días', '1 mes')
     via_administracion = models.CharField(max_length=15, choices=VIA_ADMINISTRACION_CHOICES, default='ORAL') # string, via_administracion (NUEVO)
+    cantidad = models.PositiveIntegerField(default=1) # int, unidades que se reservan del stock
+
+    objects = RecetaQuerySet.as_manager()
 
     def __str__(self):
-        return f"Receta para {self.medicamento.nombre} - Trat. {self.tratamiento.id}"
+        return f"Receta para {self.medicamento.nombre} - Trat. {self.tratamiento_id}"
+
+    def save(self, *args, **kwargs):
+        from .inventario import reservar_recetas
+
+        with transaction.atomic():
+            nueva = self._state.adding
+            super().save(*args, **kwargs)
+            reservar_recetas([self], nuevas=nueva)
 
 
 # ======================================================================
@@ -271,6 +637,14 @@ class Seguro(models.Model):
     
     class Meta:
         verbose_name_plural = "Seguros"
+        indexes = [
+            models.Index(fields=['paciente', 'activo'], name='seguro_paciente_activo_idx'),
+            # date_hierarchy del admin
+            models.Index(fields=['fecha_vencimiento'], name='seguro_vencimiento_idx'),
+            # Pólizas vigentes: búsqueda de vencidas aún activas y cobertura por fecha
+            models.Index(fields=['fecha_vencimiento', 'paciente'], condition=models.Q(activo=True),
+                         name='seguro_activo_vencimiento_idx'),
+        ]
 
 
 class Horario(models.Model):
@@ -296,6 +670,13 @@ class Horario(models.Model):
     class Meta:
         verbose_name_plural = "Horarios"
         ordering = ['dia_semana', 'hora_inicio']
+        indexes = [
+            # Filtros ?medico=&dia_semana=&activo= de la API
+            models.Index(fields=['medico', 'dia_semana', 'activo'], name='horario_medico_dia_idx'),
+            # Horarios activos de un grupo de médicos (motor de disponibilidad)
+            models.Index(fields=['medico', 'dia_semana'], condition=models.Q(activo=True),
+                         name='horario_activo_idx'),
+        ]
 
 
 class CitaMedica(models.Model):
@@ -327,12 +708,33 @@ class CitaMedica(models.Model):
         related_name='cita_origen'
     )
 
+    objects = ResumenQuerySet.as_manager()
+
     def __str__(self):
         return f"Cita N°{self.id} - {self.paciente.apellido} con Dr(a). {self.medico.apellido} ({self.fecha_hora_cita.strftime('%d/%m/%Y %H:%M')})"
     
     class Meta:
         verbose_name_plural = "Citas Médicas"
         ordering = ['-fecha_hora_cita']
+        constraints = [
+            # Clave única de cupo: un médico no puede tener dos citas vigentes
+            # que comiencen a la misma hora (las canceladas liberan el cupo).
+            models.UniqueConstraint(
+                fields=['medico', 'fecha_hora_cita'],
+                condition=~models.Q(estado='CANCELADA'),
+                name='cita_unica_medico_fecha_hora',
+            ),
+        ]
+        indexes = [
+            # Filtros ?paciente=&estado= de la API, en el orden de la paginación
+            models.Index(fields=['paciente', 'estado', '-fecha_hora_cita'], name='cita_paciente_estado_idx'),
+            # Línea de tiempo del paciente (todas sus citas, por fecha)
+            models.Index(fields=['paciente', '-fecha_hora_cita', '-id'], name='cita_paciente_fecha_idx'),
+            # Agenda de un médico por rango de fechas (disponibilidad y ?medico=)
+            models.Index(fields=['medico', 'fecha_hora_cita'], name='cita_medico_fecha_idx'),
+            # Orden del listado (cursor) y date_hierarchy del admin
+            models.Index(fields=['-fecha_hora_cita', '-id'], name='cita_fecha_idx'),
+        ]
 
 
 class HistorialClinico(models.Model):
@@ -365,3 +767,210 @@ class HistorialClinico(models.Model):
     class Meta:
         verbose_name_plural = "Historiales Clínicos"
         ordering = ['-fecha_registro']
+        indexes = [
+            models.Index(fields=['paciente', '-fecha_registro'], name='historial_paciente_fecha_idx'),
+            models.Index(fields=['tipo_registro'], name='historial_tipo_idx'),
+            # Orden del listado (cursor) y date_hierarchy del admin
+            models.Index(fields=['-fecha_registro', '-id'], name='historial_fecha_idx'),
+        ]
+
+
+# ======================================================================
+# TABLAS DEL INVENTARIO (ver INVENTARIO DE MEDICAMENTOS)
+# ======================================================================
+
+class MovimientoInventario(models.Model):
+    """
+    Entrada o salida de stock de un medicamento. Las filas no se
+    modifican ni se borran: el stock en cualquier momento es el último
+    corte anterior más la suma de los movimientos posteriores.
+    """
+    medicamento = models.ForeignKey(Medicamento, on_delete=models.CASCADE, related_name='movimientos')
+    tipo = models.CharField(max_length=15, choices=TIPO_MOVIMIENTO_CHOICES) # string, tipo
+    cantidad = models.IntegerField() # int, positiva si entra stock y negativa si sale
+    # Receta que reservó o liberó; sin restricción en la base para que el
+    # movimiento sobreviva a la receta anulada
+    receta = models.ForeignKey(
+        RecetaMedica,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        blank=True,
+        null=True,
+        related_name='movimientos_inventario',
+    )
+    fecha = models.DateTimeField(default=timezone.now) # datetime, fecha
+    nota = models.CharField(max_length=255, blank=True, default='') # string, nota
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.cantidad:+d} - {self.medicamento_id} ({self.fecha})"
+
+    class Meta:
+        verbose_name_plural = "Movimientos de Inventario"
+        indexes = [
+            # Historial de un medicamento y suma de movimientos desde un corte
+            models.Index(fields=['medicamento', 'fecha'], name='movimiento_medicamento_idx'),
+        ]
+
+
+class CorteInventario(models.Model):
+    """
+    Stock de un medicamento al cierre de 'fecha' según el libro de
+    movimientos. Acota la suma necesaria para conocer el stock en una
+    fecha a los movimientos posteriores al último corte.
+    """
+    medicamento = models.ForeignKey(Medicamento, on_delete=models.CASCADE, related_name='cortes')
+    fecha = models.DateTimeField() # datetime, fecha
+    stock = models.IntegerField() # int, stock
+
+    def __str__(self):
+        return f"Corte de {self.medicamento_id} al {self.fecha}: {self.stock}"
+
+    class Meta:
+        verbose_name_plural = "Cortes de Inventario"
+        constraints = [
+            # Su índice sirve también para buscar el último corte de un medicamento
+            models.UniqueConstraint(fields=['medicamento', 'fecha'], name='corte_unico_medicamento_fecha'),
+        ]
+
+
+# ======================================================================
+# PROCESOS POR LOTES (ver api/barridos.py)
+# ======================================================================
+
+class PuntoControl(models.Model):
+    """
+    Avance de un barrido por lotes: la clave de la última fila procesada y
+    el resumen acumulado. Se guarda en la misma transacción que cada lote,
+    así un barrido interrumpido se retoma sin repetir ni saltar filas.
+    La facturación mensual lo usa igual, con una aseguradora por lote.
+    """
+    nombre = models.CharField(max_length=50, unique=True) # string, nombre del barrido
+    posicion = models.JSONField(encoder=DjangoJSONEncoder, blank=True, null=True) # clave de la última fila
+    resumen = models.JSONField(encoder=DjangoJSONEncoder, default=dict) # totales de la ejecución
+    iniciado = models.DateTimeField(default=timezone.now) # datetime, inicio de la ejecución
+    actualizado = models.DateTimeField(auto_now=True) # datetime, último lote
+    terminado = models.DateTimeField(blank=True, null=True) # datetime, None mientras no termina
+
+    def __str__(self):
+        estado = f"terminado {self.terminado}" if self.terminado else f"en curso desde {self.iniciado}"
+        return f"Barrido {self.nombre} ({estado})"
+
+    class Meta:
+        verbose_name_plural = "Puntos de Control"
+
+
+# ======================================================================
+# FACTURACIÓN MENSUAL (ver api/facturacion.py)
+# Tablas de resumen que escribe el comando facturar_mes; se recalculan
+# por completo para cada (periodo, aseguradora).
+# ======================================================================
+
+class FacturaAseguradora(models.Model):
+    """ Totales del mes de las recetas cubiertas por una aseguradora ('' = sin seguro). """
+    periodo = models.DateField() # date, primer día del mes facturado
+    aseguradora = models.CharField(max_length=100, blank=True) # string, nombre_aseguradora del seguro aplicado
+    pacientes = models.PositiveIntegerField() # int, pacientes con recetas en el mes
+    recetas = models.PositiveIntegerField() # int, recetas facturadas
+    total = models.DecimalField(max_digits=14, decimal_places=2) # decimal, precio_unitario x cantidad
+    cubierto = models.DecimalField(max_digits=14, decimal_places=2) # decimal, a cargo de la aseguradora
+    copago = models.DecimalField(max_digits=14, decimal_places=2) # decimal, a cargo de los pacientes
+    generado = models.DateTimeField(default=timezone.now) # datetime, fecha del cálculo
+
+    def __str__(self):
+        return f"Facturación {self.periodo:%Y-%m} - {self.aseguradora or 'Sin seguro'}: {self.total}"
+
+    class Meta:
+        verbose_name_plural = "Facturas por Aseguradora"
+        constraints = [
+            models.UniqueConstraint(fields=['periodo', 'aseguradora'], name='factura_unica_periodo_aseguradora'),
+        ]
+
+
+class FacturaPaciente(models.Model):
+    """ Totales del mes de un paciente con una aseguradora (un cambio de seguro en el mes da dos filas). """
+    periodo = models.DateField() # date, primer día del mes facturado
+    aseguradora = models.CharField(max_length=100, blank=True) # string, '' = sin seguro
+    # on_delete=models.PROTECT: lo facturado se conserva (igual que sus consultas)
+    paciente = models.ForeignKey(Paciente, on_delete=models.PROTECT, related_name='facturas')
+    recetas = models.PositiveIntegerField() # int, recetas facturadas
+    total = models.DecimalField(max_digits=12, decimal_places=2) # decimal, total
+    cubierto = models.DecimalField(max_digits=12, decimal_places=2) # decimal, cubierto
+    copago = models.DecimalField(max_digits=12, decimal_places=2) # decimal, copago
+
+    def __str__(self):
+        return f"Facturación {self.periodo:%Y-%m} - paciente {self.paciente_id} ({self.aseguradora or 'Sin seguro'})"
+
+    class Meta:
+        verbose_name_plural = "Facturas por Paciente"
+        constraints = [
+            # Su índice sirve también para reemplazar las filas de una aseguradora
+            models.UniqueConstraint(fields=['periodo', 'aseguradora', 'paciente'],
+                                    name='factura_unica_periodo_paciente'),
+        ]
+        indexes = [
+            # Facturas de un paciente, las más recientes primero
+            models.Index(fields=['paciente', '-periodo'], name='factura_paciente_idx'),
+        ]
+
+
+# ======================================================================
+# RESÚMENES PARA TABLEROS (ver api/resumenes.py)
+# Conteos por día que se mantienen al guardar y eliminar consultas, citas
+# y recetas: un tablero suma unas pocas filas por día en lugar de agrupar
+# las tablas de atenciones completas.
+# ======================================================================
+
+class ResumenConsultasDia(models.Model):
+    """ Consultas de un médico en un día (fecha local), por estado y prioridad. """
+    dia = models.DateField() # date, día local de fecha_consulta
+    medico = models.ForeignKey(Medico, on_delete=models.CASCADE, related_name='+')
+    estado = models.CharField(max_length=10, choices=ESTADO_CONSULTA_CHOICES) # string, estado
+    prioridad = models.CharField(max_length=10, choices=PRIORIDAD_CHOICES) # string, prioridad
+    cantidad = models.IntegerField(default=0) # int, consultas
+
+    def __str__(self):
+        return f"{self.dia} - Dr(a). {self.medico_id} {self.estado}/{self.prioridad}: {self.cantidad}"
+
+    class Meta:
+        verbose_name_plural = "Resúmenes de Consultas"
+        constraints = [
+            # Empieza por el día: su índice resuelve los rangos de fechas de los tableros
+            models.UniqueConstraint(fields=['dia', 'medico', 'estado', 'prioridad'], name='resumen_consultas_unico'),
+        ]
+
+
+class ResumenCitasDia(models.Model):
+    """ Citas de un médico en un día (fecha local), por estado (incluye NO_ASISTIO). """
+    dia = models.DateField() # date, día local de fecha_hora_cita
+    medico = models.ForeignKey(Medico, on_delete=models.CASCADE, related_name='+')
+    estado = models.CharField(max_length=15, choices=ESTADO_CITA_CHOICES) # string, estado
+    cantidad = models.IntegerField(default=0) # int, citas
+
+    def __str__(self):
+        return f"{self.dia} - Dr(a). {self.medico_id} {self.estado}: {self.cantidad}"
+
+    class Meta:
+        verbose_name_plural = "Resúmenes de Citas"
+        constraints = [
+            models.UniqueConstraint(fields=['dia', 'medico', 'estado'], name='resumen_citas_unico'),
+        ]
+
+
+class ResumenRecetasDia(models.Model):
+    """
+    Recetas de un medicamento en un día (fecha local de la consulta). La
+    categoría se toma del medicamento al leer: cambiarla no descuadra el resumen.
+    """
+    dia = models.DateField() # date, día local de la consulta
+    medicamento = models.ForeignKey(Medicamento, on_delete=models.CASCADE, related_name='+')
+    recetas = models.IntegerField(default=0) # int, recetas
+    unidades = models.IntegerField(default=0) # int, suma de 'cantidad'
+
+    def __str__(self):
+        return f"{self.dia} - medicamento {self.medicamento_id}: {self.recetas} recetas"
+
+    class Meta:
+        verbose_name_plural = "Resúmenes de Recetas"
+        constraints = [
+            models.UniqueConstraint(fields=['dia', 'medicamento'], name='resumen_recetas_unico'),
+        ]
@@ -0,0 +1,126 @@
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+# ======================================================================
+# PAGINACIÓN POR CURSOR (KEYSET)
+# En vez de OFFSET, cada página filtra por la posición del último registro
+# entregado, por lo que una página profunda cuesta lo mismo que la
+# primera. El orden debe ser estable y estar indexado.
+# El cursor de DRF solo guarda el primer campo del orden y desempata con
+# un offset (limitado a offset_cutoff): con muchas filas en la misma
+# fecha, las páginas se repiten y algunas filas nunca se entregan. Aquí el
+# cursor guarda todos los campos del orden, terminando en el id, y cada
+# página filtra por la tupla completa:
+#   (fecha < f) OR (fecha = f AND id < i)
+# ======================================================================
+
+
+class CursorPaginacion(CursorPagination):
+    """
+    Paginación por cursor usada por todos los ViewSets de la API.
+    Cada ViewSet puede declarar su propio orden con el atributo
+    'cursor_ordering'; por defecto se ordena por id descendente. Si el
+    orden no termina en el id se le agrega, para que cada posición sea única.
+    El cliente elige el tamaño de página con ?page_size= (hasta max_page_size).
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('-id',)
+
+    def get_ordering(self, request, queryset, view):
+        orden = tuple(getattr(view, 'cursor_ordering', type(self).ordering))
+        if orden[-1].lstrip('-') not in ('id', 'pk'):
+            orden += ('-id',)
+        self.ordering = orden
+        return super().get_ordering(request, queryset, view)
+
+    def _campos(self, queryset):
+        opciones = queryset.model._meta
+        return [opciones.pk if campo.lstrip('-') == 'pk' else opciones.get_field(campo.lstrip('-'))
+                for campo in self.ordering]
+
+    def _posicion(self, fila):
+        # Las filas son instancias o diccionarios (listados leídos con values());
+        # isoformat conserva los microsegundos de las fechas y horas
+        valores = [
+            fila[campo.name] if isinstance(fila, dict) else getattr(fila, campo.attname)
+            for campo in self.campos
+        ]
+        return json.dumps([valor.isoformat() if hasattr(valor, 'isoformat') else valor for valor in valores])
+
+    def _leer_posicion(self, texto):
+        try:
+            valores = json.loads(texto)
+            if not isinstance(valores, list) or len(valores) != len(self.campos):
+                raise ValueError
+            return [campo.to_python(valor) for campo, valor in zip(self.campos, valores)]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def _posteriores(orden, posicion):
+        """ Q de las filas que van después de 'posicion' en 'orden' (acotada por el primer campo, para el índice). """
+        condicion = Q()
+        iguales = {}
+        for campo, valor in zip(orden, posicion):
+            nombre = campo.lstrip('-')
+            comparacion = 'lt' if campo.startswith('-') else 'gt'
+            condicion |= Q(**iguales, **{f'{nombre}__{comparacion}': valor})
+            iguales[nombre] = valor
+        primero = orden[0].lstrip('-')
+        cota = Q(**{f"{primero}__{'lte' if orden[0].startswith('-') else 'gte'}": posicion[0]})
+        return cota & condicion
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.campos = self._campos(queryset)
+        self.cursor = self.decode_cursor(request)
+        reverso = bool(self.cursor and self.cursor.reverse)
+
+        orden = self.ordering
+        if reverso:
+            orden = tuple(campo[1:] if campo.startswith('-') else '-' + campo for campo in orden)
+        queryset = queryset.order_by(*orden)
+        if self.cursor and self.cursor.position is not None:
+            queryset = queryset.filter(self._posteriores(orden, self._leer_posicion(self.cursor.position)))
+
+        resultados = list(queryset[:self.page_size + 1])
+        self.page = resultados[:self.page_size]
+        hay_mas = len(resultados) > self.page_size
+        if reverso:
+            self.page.reverse()
+            self.has_next, self.has_previous = self.cursor is not None, hay_mas
+        else:
+            self.has_next, self.has_previous = hay_mas, self.cursor is not None
+
+        if self.page:
+            self.previous_position = self._posicion(self.page[0])
+            self.next_position = self._posicion(self.page[-1])
+        else:
+            # Página vacía: ambos enlaces vuelven a la posición pedida
+            self.previous_position = self.next_position = self.cursor.position if self.cursor else None
+
+        if self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.next_position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.previous_position))
@@ -0,0 +1,154 @@
+import cProfile
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+# ======================================================================
+# PERFILADO DE PETICIONES POR MUESTREO
+# Con PERFILADO_ACTIVO = True se perfila una fracción de las peticiones
+# (PERFILADO_FRACCION) y, además, las que coinciden con alguna expresión
+# de PERFILADO_RUTAS o traen la cabecera PERFILADO_CABECERA.
+# Cada perfil se guarda en PERFILADO_DIRECTORIO como volcado de cProfile
+# (.prof, se abre con pstats o snakeviz) o como pilas colapsadas (.folded,
+# entrada de flamegraph.pl / speedscope). El directorio rota: al superar
+# PERFILADO_MAX_MB se borran los perfiles más antiguos.
+# Una petición no muestreada solo paga un random() y una comparación.
+# ======================================================================
+
+FORMATO_PSTATS = 'pstats'
+FORMATO_COLAPSADO = 'colapsado'
+
+
+def _configuracion(nombre, por_defecto):
+    return getattr(settings, f'PERFILADO_{nombre}', por_defecto)
+
+
+class MuestreadorPilas:
+    """
+    Perfilador de muestreo: un hilo auxiliar toma cada 'intervalo' segundos
+    la pila del hilo que atiende la petición y cuenta las pilas repetidas.
+    """
+
+    def __init__(self, hilo_id, intervalo):
+        self.hilo_id = hilo_id
+        self.intervalo = intervalo
+        self.pilas = Counter()
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+
+    def _muestrear(self):
+        while not self._detener.wait(self.intervalo):
+            marco = sys._current_frames().get(self.hilo_id)
+            pila = []
+            while marco is not None:
+                codigo = marco.f_code
+                pila.append(f'{os.path.basename(codigo.co_filename)}:{codigo.co_name}')
+                marco = marco.f_back
+            if pila:
+                self.pilas[';'.join(reversed(pila))] += 1
+
+    def iniciar(self):
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        self._hilo.join()
+
+    def guardar(self, ruta):
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            for pila, cantidad in self.pilas.most_common():
+                archivo.write(f'{pila} {cantidad}\n')
+
+
+class PerfiladoMiddleware:
+    """
+    Decide qué peticiones perfilar y guarda su perfil. Agrega la cabecera
+    X-Perfil con el nombre del archivo generado. Solo se perfila una
+    petición a la vez por proceso (cProfile no admite perfiles simultáneos);
+    si llega otra mientras tanto, se atiende sin perfilar.
+    """
+
+    def __init__(self, get_response):
+        if not _configuracion('ACTIVO', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.fraccion = _configuracion('FRACCION', 0.0)
+        self.rutas = [re.compile(patron) for patron in _configuracion('RUTAS', ())]
+        self.cabecera = _configuracion('CABECERA', None)
+        self.directorio = Path(_configuracion('DIRECTORIO', settings.BASE_DIR / 'perfiles'))
+        self.max_bytes = int(_configuracion('MAX_MB', 100) * 1024 * 1024)
+        self.formato = _configuracion('FORMATO', FORMATO_PSTATS)
+        self.intervalo = _configuracion('INTERVALO_MS', 5) / 1000
+        self._en_curso = threading.Lock()
+
+    def debe_perfilar(self, request):
+        if self.fraccion and random.random() < self.fraccion:
+            return True
+        if self.cabecera and request.headers.get(self.cabecera):
+            return True
+        return any(patron.search(request.path) for patron in self.rutas)
+
+    def __call__(self, request):
+        if not self.debe_perfilar(request) or not self._en_curso.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self._perfilar(request)
+        finally:
+            self._en_curso.release()
+
+    def _perfilar(self, request):
+        if self.formato == FORMATO_COLAPSADO:
+            perfilador = MuestreadorPilas(threading.get_ident(), self.intervalo)
+            perfilador.iniciar()
+        else:
+            perfilador = cProfile.Profile()
+            perfilador.enable()
+
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            if self.formato == FORMATO_COLAPSADO:
+                perfilador.detener()
+            else:
+                perfilador.disable()
+        duracion_ms = (time.perf_counter() - inicio) * 1000
+
+        ruta = self._ruta_perfil(request, duracion_ms)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        if self.formato == FORMATO_COLAPSADO:
+            perfilador.guardar(ruta)
+        else:
+            perfilador.dump_stats(ruta)
+        self.rotar()
+        response['X-Perfil'] = ruta.name
+        return response
+
+    def _ruta_perfil(self, request, duracion_ms):
+        extension = 'folded' if self.formato == FORMATO_COLAPSADO else 'prof'
+        ruta = re.sub(r'[^A-Za-z0-9]+', '-', request.path).strip('-')[:80] or 'raiz'
+        momento = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        return self.directorio / f'{momento}_{request.method}_{ruta}_{duracion_ms:.0f}ms.{extension}'
+
+    def rotar(self):
+        """ Borra los perfiles más antiguos hasta que el directorio quepa en el límite. """
+        perfiles = sorted(
+            (p for p in self.directorio.iterdir() if p.suffix in ('.prof', '.folded')),
+            key=lambda p: p.stat().st_mtime,
+        )
+        total = sum(p.stat().st_size for p in perfiles)
+        # El perfil recién escrito (el último) se conserva siempre
+        for perfil in perfiles[:-1]:
+            if total <= self.max_bytes:
+                break
+            total -= perfil.stat().st_size
+            perfil.unlink(missing_ok=True)
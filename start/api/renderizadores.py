@@ -0,0 +1,79 @@
+import json
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser, get_encoding
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # dependencia opcional: sin ella se usa el json de la biblioteca estándar
+    orjson = None
+
+# ======================================================================
+# JSON RÁPIDO (orjson) PARA LA API
+# Renderizador y parser JSON configurados para todo el proyecto en
+# REST_FRAMEWORK (drf/settings.py). Con orjson instalado codifican y
+# decodifican en C; si no está, o si la petición pide algo que orjson no
+# hace igual (JSON indentado distinto de 2, ASCII forzado), delegan en las
+# clases de DRF. La salida es la misma en ambos casos: los tipos que
+# orjson no conoce (Decimal, datetime, UUID, textos traducibles...) pasan
+# por el JSONEncoder de DRF.
+# ======================================================================
+
+_ENCODER_DRF = JSONEncoder()
+
+
+def _por_defecto(valor):
+    return _ENCODER_DRF.default(valor)
+
+
+SEPARADORES_JS = ('\u2028'.encode(), '\u2029'.encode())
+
+if orjson is not None:
+    # Las fechas con hora se delegan en DRF: usa 'Z' y trunca a milisegundos
+    OPCIONES_ORJSON = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def codificar_json(valor):
+    """ JSON compacto en UTF-8 (bytes), con orjson si está disponible. """
+    if orjson is None:
+        return json.dumps(valor, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+    return orjson.dumps(valor, default=_por_defecto, option=OPCIONES_ORJSON)
+
+
+class JSONRapidoRenderer(JSONRenderer):
+    """ JSONRenderer de DRF respaldado por orjson cuando está disponible. """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        indentacion = self.get_indent(accepted_media_type, renderer_context or {})
+        if indentacion is None:
+            opciones = OPCIONES_ORJSON
+        elif indentacion == 2:
+            opciones = OPCIONES_ORJSON | orjson.OPT_INDENT_2
+        else:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        contenido = orjson.dumps(data, default=_por_defecto, option=opciones)
+        # Igual que DRF: U+2028 y U+2029 se escapan para que la salida sea JavaScript válido
+        if SEPARADORES_JS[0] in contenido or SEPARADORES_JS[1] in contenido:
+            contenido = contenido.replace(SEPARADORES_JS[0], b'\\u2028').replace(SEPARADORES_JS[1], b'\\u2029')
+        return contenido
+
+
+class JSONRapidoParser(JSONParser):
+    """ JSONParser de DRF respaldado por orjson (solo cuerpos en UTF-8). """
+    renderer_class = JSONRapidoRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        codificacion = get_encoding(parser_context or {})
+        if orjson is None or codificacion.lower().replace('-', '') != 'utf8' or not self.strict:
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as error:
+            raise ParseError(f'JSON parse error - {error}')
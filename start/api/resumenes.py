@@ -0,0 +1,458 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    CitaMedica,
+    ConsultaMedica,
+    RecetaMedica,
+    ResumenCitasDia,
+    ResumenConsultasDia,
+    ResumenRecetasDia,
+    Tratamiento,
+)
+
+# ======================================================================
+# RESÚMENES PARA TABLEROS
+# Tablas de conteos por día (fecha local) que los tableros suman para
+# cualquier rango de fechas sin agrupar las tablas de atenciones:
+#   - consultas por médico, estado y prioridad;
+#   - citas por médico y estado;
+#   - recetas y unidades por medicamento (la categoría se une al leer).
+# Se mantienen de forma incremental: las señales de ConsultaMedica,
+# CitaMedica, Tratamiento y RecetaMedica (y sus bulk_create/bulk_update)
+# calculan cuánto cambia cada grupo y lo aplican con un
+# UPDATE ... SET cantidad = cantidad + n, que no pierde cambios
+# concurrentes; si el grupo todavía no existe se inserta. Los valores con
+# que se cargó cada fila se guardan en post_init (como en api/versiones.py)
+# para restar del grupo de origen cuando una edición la mueve de grupo.
+# QuerySet.update() y el SQL directo no pasan por aquí: después de una
+# carga así se reconstruye desde una fecha (reconstruir_resumenes --desde)
+# y conciliar_resumenes compara los resúmenes con las tablas de origen.
+# ======================================================================
+
+# Días por consulta y por transacción al reconstruir o conciliar
+DIAS_POR_TRAMO = 31
+
+
+class Resumen:
+    """
+    Tabla 'modelo' con los conteos por día de 'origen'. 'fecha' es la ruta
+    (desde 'origen') al instante que define el día; 'claves' son los
+    campos del resumen que forman el grupo junto con el día, con su ruta
+    en 'origen'; 'medidas' son los campos sumables y su agregado.
+    'dimensiones' son los nombres públicos por los que se puede agrupar y
+    filtrar al leer, con su ruta en 'modelo'.
+    """
+
+    def __init__(self, nombre, modelo, origen, fecha, claves, medidas, dimensiones):
+        self.nombre = nombre
+        self.modelo = modelo
+        self.origen = origen
+        self.fecha = fecha
+        self.claves = claves
+        self.medidas = medidas
+        self.dimensiones = dimensiones
+
+    @property
+    def campos_grupo(self):
+        return ('dia',) + tuple(self.claves)
+
+    def vacias(self):
+        return [0] * len(self.medidas)
+
+    # ------------------------------------------------------------------
+    # Cálculo desde las tablas de origen
+    # ------------------------------------------------------------------
+
+    def agrupar(self, desde, hasta):
+        """ {(dia, *claves): [medidas]} calculado desde 'origen' para los días [desde, hasta]. """
+        filas = (
+            self.origen.objects
+            .filter(**{f'{self.fecha}__gte': _inicio_del_dia(desde),
+                       f'{self.fecha}__lt': _inicio_del_dia(hasta + timedelta(days=1))})
+            .annotate(dia_resumen=TruncDate(self.fecha))
+            .values_list('dia_resumen', *self.claves.values())
+            .annotate(**{f'total_{campo}': agregado for campo, agregado in self.medidas.items()})
+            .order_by()
+        )
+        claves = len(self.claves) + 1
+        return {fila[:claves]: list(fila[claves:]) for fila in filas}
+
+    def leer(self, desde, hasta):
+        """ {(dia, *claves): [medidas]} guardado en el resumen para los días [desde, hasta] (sin grupos en cero). """
+        filas = self.modelo.objects.filter(dia__gte=desde, dia__lte=hasta).values_list(
+            *self.campos_grupo, *self.medidas,
+        )
+        claves = len(self.claves) + 1
+        return {fila[:claves]: list(fila[claves:]) for fila in filas if any(fila[claves:])}
+
+    def rango(self):
+        """ (primer día, último día) con datos en el origen o en el resumen; None si ambos están vacíos. """
+        origen = self.origen.objects.aggregate(primero=Min(self.fecha), ultimo=Max(self.fecha))
+        resumen = self.modelo.objects.aggregate(primero=Min('dia'), ultimo=Max('dia'))
+        dias = [_dia(origen[extremo]) for extremo in ('primero', 'ultimo') if origen[extremo] is not None]
+        dias += [resumen[extremo] for extremo in ('primero', 'ultimo') if resumen[extremo] is not None]
+        return (min(dias), max(dias)) if dias else None
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+
+    def aplicar(self, deltas):
+        """
+        Suma 'deltas' ({(dia, *claves): [medidas]}) a los grupos. Los grupos
+        se recorren ordenados, así dos transacciones concurrentes bloquean
+        las filas en el mismo orden.
+        """
+        for clave, valores in sorted(deltas.items()):
+            if not any(valores):
+                continue
+            grupo = dict(zip(self.campos_grupo, clave))
+            cambios = {campo: F(campo) + valor for campo, valor in zip(self.medidas, valores)}
+            if self.modelo.objects.filter(**grupo).update(**cambios):
+                continue
+            if any(valor < 0 for valor in valores):
+                # Restar de un grupo que no existe: el resumen ya estaba
+                # descuadrado (carga sin señales); conciliar_resumenes lo corrige
+                continue
+            try:
+                with transaction.atomic():
+                    self.modelo.objects.create(**grupo, **dict(zip(self.medidas, valores)))
+            except IntegrityError:
+                # Otra transacción creó el grupo entre el UPDATE y el INSERT
+                self.modelo.objects.filter(**grupo).update(**cambios)
+
+    def reemplazar(self, desde, hasta):
+        """ Reescribe los grupos de los días [desde, hasta] desde el origen. Devuelve los grupos escritos. """
+        grupos = self.agrupar(desde, hasta)
+        with transaction.atomic():
+            self.modelo.objects.filter(dia__gte=desde, dia__lte=hasta).delete()
+            self.modelo.objects.bulk_create(
+                [
+                    self.modelo(**dict(zip(self.campos_grupo, clave)), **dict(zip(self.medidas, valores)))
+                    for clave, valores in sorted(grupos.items())
+                ],
+                batch_size=1000,
+            )
+        return len(grupos)
+
+
+RESUMENES = {
+    resumen.nombre: resumen for resumen in [
+        Resumen(
+            'consultas', ResumenConsultasDia, ConsultaMedica, 'fecha_consulta',
+            claves={'medico_id': 'medico_id', 'estado': 'estado', 'prioridad': 'prioridad'},
+            medidas={'cantidad': Count('id')},
+            dimensiones={'dia': 'dia', 'medico': 'medico', 'estado': 'estado', 'prioridad': 'prioridad'},
+        ),
+        Resumen(
+            'citas', ResumenCitasDia, CitaMedica, 'fecha_hora_cita',
+            claves={'medico_id': 'medico_id', 'estado': 'estado'},
+            medidas={'cantidad': Count('id')},
+            dimensiones={'dia': 'dia', 'medico': 'medico', 'estado': 'estado'},
+        ),
+        Resumen(
+            'recetas', ResumenRecetasDia, RecetaMedica, 'tratamiento__consulta__fecha_consulta',
+            claves={'medicamento_id': 'medicamento_id'},
+            medidas={'recetas': Count('id'), 'unidades': Sum('cantidad')},
+            dimensiones={'dia': 'dia', 'categoria': 'medicamento__categoria', 'medicamento': 'medicamento'},
+        ),
+    ]
+}
+
+
+def _dia(instante):
+    return timezone.localtime(instante).date()
+
+
+def _inicio_del_dia(fecha):
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def _tramos(desde, hasta):
+    """ Rangos de días [inicio, fin] de a DIAS_POR_TRAMO que cubren [desde, hasta]. """
+    while desde <= hasta:
+        fin = min(desde + timedelta(days=DIAS_POR_TRAMO - 1), hasta)
+        yield desde, fin
+        desde = fin + timedelta(days=1)
+
+
+# ======================================================================
+# LECTURA (endpoints de los tableros)
+# ======================================================================
+
+def consultar(resumen, desde, hasta, agrupar, filtros=None):
+    """
+    Suma de las medidas de 'resumen' en los días [desde, hasta] por las
+    dimensiones de 'agrupar', con 'filtros' ({dimension: valor}) exactos.
+    Una consulta sobre el índice (dia, ...) del resumen.
+    """
+    rutas = [resumen.dimensiones[dimension] for dimension in agrupar]
+    queryset = resumen.modelo.objects.filter(
+        dia__gte=desde, dia__lte=hasta,
+        **{resumen.dimensiones[dimension]: valor for dimension, valor in (filtros or {}).items()},
+    )
+    filas = (
+        queryset.values_list(*rutas)
+        .annotate(**{f'total_{medida}': Sum(medida) for medida in resumen.medidas})
+        .order_by(*rutas)
+    )
+    resultados = []
+    for fila in filas:
+        medidas = fila[len(rutas):]
+        if any(medidas):
+            resultados.append({**dict(zip(agrupar, fila)), **dict(zip(resumen.medidas, medidas))})
+    return resultados
+
+
+# ======================================================================
+# MANTENIMIENTO INCREMENTAL (señales y operaciones en lote)
+# ======================================================================
+
+# Atributos de cada modelo de origen que deciden a qué grupos pertenece una fila
+SEGUIDOS = {
+    ConsultaMedica: ('fecha_consulta', 'medico_id', 'estado', 'prioridad'),
+    CitaMedica: ('fecha_hora_cita', 'medico_id', 'estado'),
+    Tratamiento: ('consulta_id',),
+    RecetaMedica: ('tratamiento_id', 'medicamento_id', 'cantidad'),
+}
+
+
+def _actuales(instancia, campos=None):
+    """ Valores seguidos de la instancia; con 'campos' (update_fields), los demás quedan como se cargaron. """
+    atributos = SEGUIDOS[type(instancia)]
+    valores = tuple(getattr(instancia, atributo) for atributo in atributos)
+    original = getattr(instancia, '_resumen_original', None)
+    if campos is None or original is None:
+        return valores
+    nombres = {instancia._meta.get_field(atributo).name for atributo in atributos} & set(campos)
+    return tuple(
+        valor if instancia._meta.get_field(atributo).name in nombres else anterior
+        for atributo, valor, anterior in zip(atributos, valores, original)
+    )
+
+
+def recordar_valores(sender, instance, **kwargs):
+    """
+    Receptor de post_init: guarda los valores seguidos con que se cargó la
+    fila (None si alguno está diferido; se leen antes de escribir).
+    """
+    atributos = SEGUIDOS[sender]
+    if all(atributo in instance.__dict__ for atributo in atributos):
+        instance._resumen_original = tuple(instance.__dict__[atributo] for atributo in atributos)
+    else:
+        instance._resumen_original = None
+
+
+def completar_originales(modelo, instancias):
+    """
+    Lee de la base los valores seguidos de las instancias que no los tienen
+    (cargadas con campos diferidos, o armadas a mano con la pk de una fila
+    existente). Las nuevas quedan con None. Una consulta como máximo.
+    """
+    faltantes = {
+        instancia.pk: instancia for instancia in instancias
+        if instancia.pk is not None and (instancia._state.adding or instancia._resumen_original is None)
+    }
+    for instancia in instancias:
+        if instancia._state.adding:
+            instancia._resumen_original = None
+    if not faltantes:
+        return
+    for pk, *valores in modelo.objects.filter(pk__in=list(faltantes)).values_list('pk', *SEGUIDOS[modelo]):
+        faltantes[pk]._resumen_original = tuple(valores)
+
+
+def antes_de_guardar(sender, instance, **kwargs):
+    """ Receptor de pre_save y pre_delete. """
+    if instance._state.adding or instance._resumen_original is None:
+        completar_originales(sender, [instance])
+
+
+def fila_guardada(sender, instance, created, update_fields=None, **kwargs):
+    """ Receptor de post_save. """
+    original = None if created else instance._resumen_original
+    actual = _actuales(instance, update_fields)
+    registrar(sender, [(instance.pk, original, actual)])
+    instance._resumen_original = actual
+
+
+def fila_eliminada(sender, instance, **kwargs):
+    """ Receptor de post_delete (también en cascada). """
+    if instance._resumen_original is not None:
+        registrar(sender, [(instance.pk, instance._resumen_original, None)])
+
+
+def afecta(modelo, campos):
+    """ Si escribir 'campos' (nombres de campo) puede mover filas de 'modelo' de grupo. """
+    return any(modelo._meta.get_field(atributo).name in campos for atributo in SEGUIDOS[modelo])
+
+
+def registrar_altas(modelo, instancias):
+    """ Suma a los resúmenes filas creadas con bulk_create. """
+    for instancia in instancias:
+        instancia._resumen_original = _actuales(instancia)
+    registrar(modelo, [(instancia.pk, None, instancia._resumen_original) for instancia in instancias])
+
+
+def registrar_cambios(modelo, instancias, campos):
+    """
+    Mueve de grupo las filas actualizadas con bulk_update (llamar a
+    completar_originales antes de escribirlas).
+    """
+    pares = []
+    for instancia in instancias:
+        actual = _actuales(instancia, campos)
+        pares.append((instancia.pk, instancia._resumen_original, actual))
+        instancia._resumen_original = actual
+    registrar(modelo, pares)
+
+
+def registrar(modelo, cambios):
+    """
+    Aplica a los resúmenes los cambios de filas de 'modelo': tuplas
+    (pk, valores originales o None si es nueva, valores actuales o None si
+    se eliminó).
+    """
+    cambios = [(pk, original, actual) for pk, original, actual in cambios if original != actual]
+    if not cambios:
+        return
+    deltas = defaultdict(lambda: defaultdict(lambda: [0, 0]))
+    CALCULOS[modelo](cambios, deltas)
+    for nombre, grupos in deltas.items():
+        resumen = RESUMENES[nombre]
+        resumen.aplicar({clave: valores[:len(resumen.medidas)] for clave, valores in grupos.items()})
+
+
+def _sumar(grupos, clave, valores, signo):
+    acumulado = grupos[clave]
+    for i, valor in enumerate(valores):
+        acumulado[i] += signo * valor
+
+
+def _cambios_consultas(cambios, deltas):
+    movidas = {}
+    for pk, original, actual in cambios:
+        if original is not None:
+            _sumar(deltas['consultas'], (_dia(original[0]), *original[1:]), [1], -1)
+        if actual is not None:
+            _sumar(deltas['consultas'], (_dia(actual[0]), *actual[1:]), [1], 1)
+        if original is not None and actual is not None and _dia(original[0]) != _dia(actual[0]):
+            movidas[pk] = (_dia(original[0]), _dia(actual[0]))
+    # Las recetas de una consulta que cambia de día cambian de día con ella
+    _mover_recetas('tratamiento__consulta_id', movidas, deltas)
+
+
+def _cambios_citas(cambios, deltas):
+    for _, original, actual in cambios:
+        if original is not None:
+            _sumar(deltas['citas'], (_dia(original[0]), *original[1:]), [1], -1)
+        if actual is not None:
+            _sumar(deltas['citas'], (_dia(actual[0]), *actual[1:]), [1], 1)
+
+
+def _cambios_tratamientos(cambios, deltas):
+    cambios = [(pk, original, actual) for pk, original, actual in cambios if original and actual]
+    if not cambios:
+        return
+    consultas = {consulta for _, original, actual in cambios for consulta in (original[0], actual[0])}
+    dias = {
+        pk: _dia(fecha)
+        for pk, fecha in ConsultaMedica.objects.filter(pk__in=consultas).values_list('pk', 'fecha_consulta')
+    }
+    movidos = {
+        pk: (dias.get(original[0]), dias.get(actual[0]))
+        for pk, original, actual in cambios if dias.get(original[0]) != dias.get(actual[0])
+    }
+    _mover_recetas('tratamiento_id', movidos, deltas)
+
+
+def _mover_recetas(campo, movidas, deltas):
+    """ Pasa las recetas agrupadas por 'campo' (pk -> (día anterior, día nuevo)) de un día al otro. """
+    if not movidas:
+        return
+    filas = (
+        RecetaMedica.objects.filter(**{f'{campo}__in': list(movidas)})
+        .values_list(campo, 'medicamento_id')
+        .annotate(recetas=Count('id'), unidades=Sum('cantidad'))
+        .order_by()
+    )
+    for pk, medicamento, recetas, unidades in filas:
+        anterior, nuevo = movidas[pk]
+        if anterior is not None:
+            _sumar(deltas['recetas'], (anterior, medicamento), [recetas, unidades], -1)
+        if nuevo is not None:
+            _sumar(deltas['recetas'], (nuevo, medicamento), [recetas, unidades], 1)
+
+
+def _cambios_recetas(cambios, deltas):
+    tratamientos = {valores[0] for _, original, actual in cambios for valores in (original, actual) if valores}
+    dias = {
+        pk: _dia(fecha)
+        for pk, fecha in Tratamiento.objects.filter(pk__in=tratamientos).values_list('pk', 'consulta__fecha_consulta')
+    }
+    for _, original, actual in cambios:
+        for valores, signo in ((original, -1), (actual, 1)):
+            if valores is not None and valores[0] in dias:
+                tratamiento, medicamento, cantidad = valores
+                _sumar(deltas['recetas'], (dias[tratamiento], medicamento), [1, cantidad], signo)
+
+
+CALCULOS = {
+    ConsultaMedica: _cambios_consultas,
+    CitaMedica: _cambios_citas,
+    Tratamiento: _cambios_tratamientos,
+    RecetaMedica: _cambios_recetas,
+}
+
+
+# ======================================================================
+# RECONSTRUCCIÓN Y CONCILIACIÓN (comandos)
+# ======================================================================
+
+def reconstruir(resumen, desde=None, hasta=None, informar=None):
+    """
+    Reescribe 'resumen' desde el origen para los días [desde, hasta] (por
+    defecto todo el rango con datos), un tramo por transacción. Devuelve
+    los grupos escritos.
+    """
+    rango = resumen.rango()
+    if rango is None:
+        return 0
+    desde = desde or rango[0]
+    hasta = hasta or rango[1]
+    escritos = 0
+    for inicio, fin in _tramos(desde, hasta):
+        escritos += resumen.reemplazar(inicio, fin)
+        if informar is not None:
+            informar(resumen, fin, escritos)
+    return escritos
+
+
+def conciliar(resumen, desde=None, hasta=None, corregir=False):
+    """
+    Compara 'resumen' con el origen en los días [desde, hasta], por tramos.
+    Devuelve las diferencias [(grupo, esperado, guardado)]; con 'corregir'
+    reescribe los tramos que tienen alguna.
+    """
+    rango = resumen.rango()
+    if rango is None:
+        return []
+    diferencias = []
+    for inicio, fin in _tramos(desde or rango[0], hasta or rango[1]):
+        esperados = resumen.agrupar(inicio, fin)
+        guardados = resumen.leer(inicio, fin)
+        tramo = [
+            (grupo, esperados.get(grupo, resumen.vacias()), guardados.get(grupo, resumen.vacias()))
+            for grupo in sorted(set(esperados) | set(guardados))
+            if esperados.get(grupo) != guardados.get(grupo)
+        ]
+        if tramo and corregir:
+            resumen.reemplazar(inicio, fin)
+        diferencias += tramo
+    return diferencias
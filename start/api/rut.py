@@ -0,0 +1,63 @@
+import re
+
+from django.core.exceptions import ValidationError
+
+# ======================================================================
+# UTILIDADES DE RUT (ROL ÚNICO TRIBUTARIO)
+# Cálculo del dígito verificador con el algoritmo módulo 11 y formato
+# estándar con puntos y guion (ej: 12.345.678-5).
+# ======================================================================
+
+
+def digito_verificador(cuerpo):
+    """ Dígito verificador ('0'-'9' o 'K') del cuerpo numérico de un RUT. """
+    suma = 0
+    factor = 2
+    for digito in reversed(str(cuerpo)):
+        suma += int(digito) * factor
+        factor = 2 if factor == 7 else factor + 1
+    resto = 11 - suma % 11
+    if resto == 11:
+        return '0'
+    if resto == 10:
+        return 'K'
+    return str(resto)
+
+
+def formatear_rut(cuerpo):
+    """ RUT completo con puntos y guion a partir del cuerpo numérico. """
+    return f'{int(cuerpo):,}'.replace(',', '.') + '-' + digito_verificador(cuerpo)
+
+
+# ======================================================================
+# NORMALIZACIÓN Y VALIDACIÓN
+# En recepción el RUT se escribe de muchas formas ('12.345.678-5',
+# '12345678-5', '123456785', '12 345 678 5'). La clave normalizada
+# (solo cuerpo y dígito, sin ceros a la izquierda y con la K mayúscula)
+# es la misma para todas y es la que se indexa como única.
+# ======================================================================
+
+CARACTERES_RUT = re.compile(r'[0-9kK.\-\s]+')
+SEPARADORES_RUT = re.compile(r'[.\-\s]')
+CLAVE_RUT = re.compile(r'[1-9][0-9]{0,8}[0-9K]')
+
+
+def clave_rut(texto):
+    """ Clave normalizada de 'texto' sin validar el dígito (ej: '12.345.678-k' -> '12345678K'). """
+    return SEPARADORES_RUT.sub('', texto).upper().lstrip('0')
+
+
+def normalizar_rut(texto):
+    """ Clave normalizada de un RUT escrito en cualquier formato; ValueError si no es válido. """
+    clave = clave_rut(texto) if CARACTERES_RUT.fullmatch(texto.strip()) else ''
+    if not CLAVE_RUT.fullmatch(clave) or digito_verificador(clave[:-1]) != clave[-1]:
+        raise ValueError(f'RUT inválido: {texto!r}')
+    return clave
+
+
+def validar_rut(valor):
+    """ Validador de campo (modelos, formularios y serializers). """
+    try:
+        normalizar_rut(valor)
+    except ValueError:
+        raise ValidationError('RUT inválido: revise el número y el dígito verificador.')
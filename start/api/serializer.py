@@ -1,4 +1,12 @@
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Case, CharField, Value, When
+from django.db.models.functions import Concat
+from django.utils import timezone
+from django.utils.functional import cached_property
 from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
 from .models import (
     Especialidad,
     Medico,
@@ -7,24 +15,82 @@ from .models import (
     Tratamiento,
     Medicamento,
     RecetaMedica,
+    MovimientoInventario,
     Seguro, # NUEVO
     Horario, # NUEVO
     CitaMedica, # NUEVO
     HistorialClinico, # NUEVO
+    ESTADO_CONSULTA_CHOICES,
+    PRIORIDAD_CHOICES,
+    TIPO_COBERTURA_CHOICES,
+    DIA_SEMANA_CHOICES,
+    ESTADO_CITA_CHOICES,
 )
+from .busqueda_texto import INDICES
+from .coberturas import MAX_TRATAMIENTOS_ESTIMACION
+from .disponibilidad import MAX_DIAS_CONSULTA
+from .linea_tiempo import TIPOS as TIPOS_LINEA_TIEMPO
+from .pagination import CursorPaginacion
+from .rut import formatear_rut, normalizar_rut
+
+
+# ======================================================================
+# 0. CLASES BASE
+# ======================================================================
+
+class PrimaryKeyRelatedFieldLote(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField que, en las operaciones masivas, toma el objeto
+    de las FK ya resueltas para todo el lote (contexto 'fk_precargadas')
+    en vez de hacer una consulta por cada elemento.
+    """
+
+    def to_internal_value(self, data):
+        precargados = self.context.get('fk_precargadas', {}).get(self.field_name)
+        if precargados is None or self.pk_field is not None or isinstance(data, bool):
+            return super().to_internal_value(data)
+        try:
+            pk = self.get_queryset().model._meta.pk.to_python(data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in precargados:
+            self.fail('does_not_exist', pk_value=data)
+        return precargados[pk]
+
+
+class BaseModelSerializer(serializers.ModelSerializer):
+    """
+    ModelSerializer base: las FK generadas usan PrimaryKeyRelatedFieldLote.
+    En las operaciones masivas (contexto 'unicos_por_lote') los campos no
+    llevan UniqueValidator: los duplicados se buscan para todo el lote con
+    una consulta IN por campo (ver lotes.comprobar_unicos).
+    """
+    serializer_related_field = PrimaryKeyRelatedFieldLote
+
+    # Campos únicos cuyo duplicado se busca en otra columna del modelo
+    # (ej: el RUT por su clave normalizada); por defecto, la del propio campo
+    columnas_unicas = {}
+
+    def get_fields(self):
+        campos = super().get_fields()
+        if self.context.get('unicos_por_lote'):
+            for campo in campos.values():
+                campo.validators = [v for v in campo.validators if not isinstance(v, UniqueValidator)]
+        return campos
+
 
 # ======================================================================
 # 1. SERIALIZERS DE ENTIDADES BASE (Sin FKs)
 # ======================================================================
 
-class EspecialidadSerializer(serializers.ModelSerializer):
+class EspecialidadSerializer(BaseModelSerializer):
     """ Serializador para la entidad Especialidad. """
     class Meta:
         model = Especialidad
         fields = '__all__' # Incluye 'id', 'nombre', 'descripcion'
 
 
-class PacienteSerializer(serializers.ModelSerializer):
+class PacienteSerializer(BaseModelSerializer):
     """ Serializador para la entidad Paciente, incluyendo el campo CHOICES. """
     # Muestra el nombre legible del tipo de sangre en lugar del código (e.g., "A Positivo" en lugar de "A+")
     tipo_sangre_display = serializers.CharField(source='get_tipo_sangre_display', read_only=True)
@@ -40,20 +106,39 @@ class PacienteSerializer(serializers.ModelSerializer):
             'direccion', 'activo'
         ]
 
-class MedicamentoSerializer(serializers.ModelSerializer):
+    columnas_unicas = {'rut': 'rut_normalizado'}
+
+    def validate_rut(self, valor):
+        # Se acepta en cualquier formato y se guarda con el estándar (12.345.678-5);
+        # el duplicado se busca por la clave normalizada, no por el texto
+        clave = normalizar_rut(valor)
+        if self.context.get('unicos_por_lote'):
+            return formatear_rut(clave[:-1])
+        duplicados = Paciente.objects.filter(rut_normalizado=clave)
+        if self.instance is not None:
+            duplicados = duplicados.exclude(pk=self.instance.pk)
+        if duplicados.exists():
+            raise serializers.ValidationError('Ya existe un paciente con este RUT.')
+        return formatear_rut(clave[:-1])
+
+class MedicamentoSerializer(BaseModelSerializer):
     """ Serializador para la entidad Medicamento. """
     categoria_display = serializers.CharField(source='get_categoria_display', read_only=True) # NUEVO
     
     class Meta:
         model = Medicamento
-        fields = ['id', 'nombre', 'laboratorio', 'categoria', 'categoria_display', 'stock', 'precio_unitario'] # ACTUALIZADO
+        fields = [
+            'id', 'nombre', 'laboratorio', 'categoria', 'categoria_display', 'stock', 'stock_minimo', 'precio_unitario',
+        ] # ACTUALIZADO
+        # El stock cambia solo con movimientos de inventario (POST /api/medicamentos/{id}/movimientos/)
+        read_only_fields = ['stock']
 
 
 # ======================================================================
 # 2. SERIALIZERS DE ENTIDADES CON RELACIONES (Con FKs)
 # ======================================================================
 
-class MedicoSerializer(serializers.ModelSerializer):
+class MedicoSerializer(BaseModelSerializer):
     """ 
     Serializador para Medico. 
     Usa un campo de relación para mostrar el nombre de la Especialidad.
@@ -66,7 +151,7 @@ class MedicoSerializer(serializers.ModelSerializer):
         slug_field='nombre'
     )
     # También se incluye el ID de la FK para facilitar la escritura/actualización
-    especialidad_id = serializers.PrimaryKeyRelatedField(
+    especialidad_id = PrimaryKeyRelatedFieldLote(
         source='especialidad',
         queryset=Especialidad.objects.all(),
         write_only=True # Solo se usa para POST/PUT, no se muestra en el GET principal
@@ -82,7 +167,7 @@ class MedicoSerializer(serializers.ModelSerializer):
         
 # ---
 
-class ConsultaMedicaSerializer(serializers.ModelSerializer):
+class ConsultaMedicaSerializer(BaseModelSerializer):
     """ 
     Serializador para ConsultaMedica. 
     Usa campos anidados o de relación para Paciente y Medico.
@@ -116,12 +201,12 @@ class ConsultaMedicaSerializer(serializers.ModelSerializer):
     
 # ---
 
-class TratamientoSerializer(serializers.ModelSerializer):
+class TratamientoSerializer(BaseModelSerializer):
     """ 
     Serializador para Tratamiento. 
     Muestra el ID de la consulta a la que está asociado.
     """
-    consulta_id = serializers.PrimaryKeyRelatedField(
+    consulta_id = PrimaryKeyRelatedFieldLote(
         source='consulta',
         queryset=ConsultaMedica.objects.all()
     )
@@ -132,7 +217,7 @@ class TratamientoSerializer(serializers.ModelSerializer):
 
 # ---
 
-class RecetaMedicaSerializer(serializers.ModelSerializer):
+class RecetaMedicaSerializer(BaseModelSerializer):
     """ 
     Serializador para RecetaMedica (Tabla M:N). 
     Muestra el nombre del Medicamento asociado.
@@ -149,7 +234,8 @@ class RecetaMedicaSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'tratamiento', 'medicamento', 'medicamento_nombre', 
             'dosis', 'frecuencia', 'duracion', 
-            'via_administracion', 'via_administracion_display' # NUEVO
+            'via_administracion', 'via_administracion_display', # NUEVO
+            'cantidad',
         ]
         extra_kwargs = {
             # Los IDs de FK se usan para escribir, no para mostrar por defecto
@@ -162,7 +248,7 @@ class RecetaMedicaSerializer(serializers.ModelSerializer):
 # SERIALIZERS PARA NUEVAS TABLAS ADICIONALES
 # ======================================================================
 
-class SeguroSerializer(serializers.ModelSerializer):
+class SeguroSerializer(BaseModelSerializer):
     """
     Serializador para la nueva entidad Seguro.
     """
@@ -184,7 +270,7 @@ class SeguroSerializer(serializers.ModelSerializer):
         return f"{obj.paciente.nombre} {obj.paciente.apellido}"
 
 
-class HorarioSerializer(serializers.ModelSerializer):
+class HorarioSerializer(BaseModelSerializer):
     """
     Serializador para la nueva entidad Horario.
     """
@@ -205,7 +291,7 @@ class HorarioSerializer(serializers.ModelSerializer):
         return f"Dr(a). {obj.medico.nombre} {obj.medico.apellido}"
 
 
-class CitaMedicaSerializer(serializers.ModelSerializer):
+class CitaMedicaSerializer(BaseModelSerializer):
     """
     Serializador para la nueva entidad CitaMedica.
     """
@@ -225,6 +311,9 @@ class CitaMedicaSerializer(serializers.ModelSerializer):
             'paciente': {'write_only': True},
             'medico': {'write_only': True},
         }
+        # El cupo único (medico, fecha_hora_cita) lo resuelve el servicio de
+        # agendamiento bajo bloqueo, respondiendo 409 en vez de 400.
+        validators = []
     
     def get_paciente_nombre_completo(self, obj):
         return f"{obj.paciente.nombre} {obj.paciente.apellido}"
@@ -233,7 +322,7 @@ class CitaMedicaSerializer(serializers.ModelSerializer):
         return f"Dr(a). {obj.medico.nombre} {obj.medico.apellido}"
 
 
-class HistorialClinicoSerializer(serializers.ModelSerializer):
+class HistorialClinicoSerializer(BaseModelSerializer):
     """
     Serializador para la nueva entidad HistorialClinico.
     """
@@ -259,3 +348,455 @@ class HistorialClinicoSerializer(serializers.ModelSerializer):
         if obj.registrado_por:
             return f"Dr(a). {obj.registrado_por.nombre} {obj.registrado_por.apellido}"
         return "No especificado"
+
+
+# ======================================================================
+# SERIALIZERS DEL EXPEDIENTE (solo lectura)
+# Documento anidado de /api/pacientes/{id}/expediente/. Trabajan sobre el
+# árbol ya precargado por expediente.con_expediente: no hacen consultas.
+# Los elementos anidados no repiten los datos del paciente.
+# ======================================================================
+
+def _nombre_doctor(medico):
+    return f"Dr(a). {medico.nombre} {medico.apellido}" if medico else "No especificado"
+
+
+class RecetaExpedienteSerializer(serializers.ModelSerializer):
+    medicamento = MedicamentoSerializer(read_only=True)
+    via_administracion_display = serializers.CharField(source='get_via_administracion_display', read_only=True)
+
+    class Meta:
+        model = RecetaMedica
+        fields = ['id', 'dosis', 'frecuencia', 'duracion', 'via_administracion', 'via_administracion_display',
+                  'cantidad', 'medicamento']
+
+
+class TratamientoExpedienteSerializer(serializers.ModelSerializer):
+    recetas = RecetaExpedienteSerializer(source='recetamedica_set', many=True, read_only=True)
+
+    class Meta:
+        model = Tratamiento
+        fields = ['id', 'descripcion', 'duracion_dias', 'observaciones', 'recetas']
+
+
+class ConsultaExpedienteSerializer(serializers.ModelSerializer):
+    medico_nombre_completo = serializers.SerializerMethodField()
+    estado_display = serializers.CharField(source='get_estado_display', read_only=True)
+    prioridad_display = serializers.CharField(source='get_prioridad_display', read_only=True)
+    tratamientos = TratamientoExpedienteSerializer(source='tratamiento_set', many=True, read_only=True)
+
+    class Meta:
+        model = ConsultaMedica
+        fields = ['id', 'medico', 'medico_nombre_completo', 'fecha_consulta', 'motivo', 'diagnostico',
+                  'estado', 'estado_display', 'prioridad', 'prioridad_display', 'tratamientos']
+
+    def get_medico_nombre_completo(self, obj):
+        return _nombre_doctor(obj.medico)
+
+
+class CitaExpedienteSerializer(serializers.ModelSerializer):
+    medico_nombre_completo = serializers.SerializerMethodField()
+    estado_display = serializers.CharField(source='get_estado_display', read_only=True)
+
+    class Meta:
+        model = CitaMedica
+        fields = ['id', 'medico', 'medico_nombre_completo', 'fecha_hora_cita', 'motivo', 'estado',
+                  'estado_display', 'observaciones', 'consulta_realizada']
+
+    def get_medico_nombre_completo(self, obj):
+        return _nombre_doctor(obj.medico)
+
+
+class HistorialExpedienteSerializer(serializers.ModelSerializer):
+    registrado_por_nombre = serializers.SerializerMethodField()
+
+    class Meta:
+        model = HistorialClinico
+        fields = ['id', 'fecha_registro', 'tipo_registro', 'descripcion', 'medicamentos_asociados',
+                  'registrado_por', 'registrado_por_nombre']
+
+    def get_registrado_por_nombre(self, obj):
+        return _nombre_doctor(obj.registrado_por)
+
+
+class SeguroExpedienteSerializer(serializers.ModelSerializer):
+    tipo_cobertura_display = serializers.CharField(source='get_tipo_cobertura_display', read_only=True)
+
+    class Meta:
+        model = Seguro
+        fields = ['id', 'nombre_aseguradora', 'numero_poliza', 'tipo_cobertura', 'tipo_cobertura_display',
+                  'fecha_inicio', 'fecha_vencimiento', 'porcentaje_cobertura', 'activo']
+
+
+class ExpedienteSerializer(PacienteSerializer):
+    """ Paciente con todo su árbol clínico (ver api/expediente.py). """
+    seguros = SeguroExpedienteSerializer(many=True, read_only=True)
+    historial = HistorialExpedienteSerializer(source='historial_clinico', many=True, read_only=True)
+    citas = CitaExpedienteSerializer(many=True, read_only=True)
+    consultas = ConsultaExpedienteSerializer(source='consultamedica_set', many=True, read_only=True)
+
+    class Meta(PacienteSerializer.Meta):
+        fields = PacienteSerializer.Meta.fields + ['seguros', 'historial', 'citas', 'consultas']
+
+
+class ExpedienteParametrosSerializer(serializers.Serializer):
+    """ Ventana opcional ?desde=&hasta= (fechas, ambas incluidas) del expediente. """
+    desde = serializers.DateField(required=False)
+    hasta = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        desde, hasta = attrs.get('desde'), attrs.get('hasta')
+        if desde and hasta and hasta < desde:
+            raise serializers.ValidationError("'hasta' debe ser posterior o igual a 'desde'.")
+        return attrs
+
+
+# ======================================================================
+# SERIALIZERS DEL INVENTARIO
+# ======================================================================
+
+class MovimientoInventarioSerializer(serializers.ModelSerializer):
+    """ Un movimiento del libro de inventario (solo lectura). """
+    tipo_display = serializers.CharField(source='get_tipo_display', read_only=True)
+
+    class Meta:
+        model = MovimientoInventario
+        fields = ['id', 'medicamento', 'tipo', 'tipo_display', 'cantidad', 'receta', 'fecha', 'nota']
+        read_only_fields = fields
+
+
+class MovimientoParametrosSerializer(serializers.Serializer):
+    """
+    Cuerpo de POST /api/medicamentos/{id}/movimientos/: un ingreso (cantidad
+    positiva) o un ajuste manual (positivo o negativo, ej. mermas o recuento).
+    Las reservas y liberaciones las registran las recetas.
+    """
+    tipo = serializers.ChoiceField(choices=['INGRESO', 'AJUSTE'])
+    cantidad = serializers.IntegerField()
+    nota = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+
+    def validate(self, attrs):
+        if attrs['cantidad'] == 0:
+            raise serializers.ValidationError({'cantidad': 'La cantidad no puede ser 0.'})
+        if attrs['tipo'] == 'INGRESO' and attrs['cantidad'] < 0:
+            raise serializers.ValidationError({'cantidad': 'Un ingreso debe tener cantidad positiva.'})
+        return attrs
+
+
+class StockParametrosSerializer(serializers.Serializer):
+    """ ?fecha= (fecha y hora) de /api/medicamentos/{id}/stock/; sin ella, el stock actual. """
+    fecha = serializers.DateTimeField(required=False)
+
+
+# ======================================================================
+# SERIALIZERS DE COBERTURA Y COSTOS (ver api/coberturas.py)
+# ======================================================================
+
+def _monto():
+    return serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+
+
+class PolizaSerializer(serializers.Serializer):
+    """ La póliza que aplica (Poliza de api/coberturas.py). """
+    id = serializers.IntegerField()
+    nombre_aseguradora = serializers.CharField()
+    numero_poliza = serializers.CharField()
+    porcentaje_cobertura = serializers.DecimalField(max_digits=5, decimal_places=2)
+    fecha_inicio = serializers.DateField(source='inicio')
+    fecha_vencimiento = serializers.DateField(source='fin')
+
+
+class CostoRecetaSerializer(serializers.Serializer):
+    receta = serializers.IntegerField()
+    medicamento = serializers.IntegerField()
+    medicamento_nombre = serializers.CharField()
+    cantidad = serializers.IntegerField()
+    precio_unitario = _monto()
+    subtotal = _monto()
+    cubierto = _monto()
+    copago = _monto()
+
+
+class CostoTratamientoSerializer(serializers.Serializer):
+    """ Costo estimado de las recetas de un tratamiento, con la cobertura aplicada. """
+    tratamiento = serializers.IntegerField()
+    paciente = serializers.IntegerField()
+    fecha = serializers.DateField()
+    seguro = PolizaSerializer(allow_null=True)
+    recetas = CostoRecetaSerializer(many=True)
+    total = _monto()
+    cubierto = _monto()
+    copago = _monto()
+
+
+class CoberturaParametrosSerializer(serializers.Serializer):
+    """ ?fecha= de la cobertura o del costo estimado (por defecto, hoy o la fecha de la consulta). """
+    fecha = serializers.DateField(required=False)
+
+
+class CostosParametrosSerializer(CoberturaParametrosSerializer):
+    """ Cuerpo de POST /api/tratamientos/costos/: ids de tratamientos y fecha opcional. """
+    tratamientos = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), min_length=1, max_length=MAX_TRATAMIENTOS_ESTIMACION,
+    )
+
+
+# ======================================================================
+# SERIALIZERS DE LOS RESÚMENES PARA TABLEROS (ver api/resumenes.py)
+# ======================================================================
+
+# Días que cubre un resumen sin ?desde=
+DIAS_RESUMEN_POR_DEFECTO = 30
+
+
+def _filtro_dimension(modelo, ruta):
+    """ Campo de filtro exacto para la dimensión en 'ruta': elección si el campo tiene choices, id si no. """
+    *relaciones, nombre = ruta.split('__')
+    for relacion in relaciones:
+        modelo = modelo._meta.get_field(relacion).related_model
+    campo = modelo._meta.get_field(nombre)
+    if campo.choices:
+        return serializers.ChoiceField(choices=campo.choices, required=False)
+    return serializers.IntegerField(min_value=1, required=False)
+
+
+class ResumenParametrosSerializer(serializers.Serializer):
+    """
+    Parámetros de /api/resumenes/{tipo}/: ?desde=&hasta= (días locales,
+    ambos incluidos; por defecto los últimos 30 días), ?agrupar= (una o
+    varias dimensiones del resumen; por defecto todas menos el día) y un
+    filtro exacto por dimensión (ej. ?medico=3&estado=NO_ASISTIO).
+    """
+    desde = serializers.DateField(required=False)
+    hasta = serializers.DateField(required=False)
+
+    def __init__(self, *args, resumen, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.resumen = resumen
+        self.fields['agrupar'] = serializers.MultipleChoiceField(choices=list(resumen.dimensiones), required=False)
+        for dimension, ruta in resumen.dimensiones.items():
+            if dimension != 'dia':
+                self.fields[dimension] = _filtro_dimension(resumen.modelo, ruta)
+
+    def validate(self, attrs):
+        attrs['hasta'] = attrs.get('hasta') or timezone.localdate()
+        attrs['desde'] = attrs.get('desde') or attrs['hasta'] - timedelta(days=DIAS_RESUMEN_POR_DEFECTO - 1)
+        if attrs['hasta'] < attrs['desde']:
+            raise serializers.ValidationError("'hasta' debe ser posterior o igual a 'desde'.")
+        # En el orden de las dimensiones del resumen
+        agrupar = attrs.get('agrupar') or set(self.resumen.dimensiones) - {'dia'}
+        attrs['agrupar'] = [dimension for dimension in self.resumen.dimensiones if dimension in agrupar]
+        attrs['filtros'] = {
+            dimension: attrs[dimension] for dimension in self.resumen.dimensiones if dimension in attrs
+        }
+        return attrs
+
+
+# ======================================================================
+# SERIALIZERS DE DISPONIBILIDAD (parámetros y respuesta)
+# ======================================================================
+
+class DisponibilidadParametrosSerializer(serializers.Serializer):
+    """
+    Valida los parámetros ?desde=&hasta= de las consultas de disponibilidad.
+    Si se omiten, se consulta desde hoy y durante los próximos 7 días.
+    """
+    desde = serializers.DateField(required=False)
+    hasta = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        desde = attrs.get('desde') or timezone.localdate()
+        hasta = attrs.get('hasta') or desde + timedelta(days=6)
+        if hasta < desde:
+            raise serializers.ValidationError("'hasta' debe ser posterior o igual a 'desde'.")
+        if (hasta - desde).days >= MAX_DIAS_CONSULTA:
+            raise serializers.ValidationError(f"El rango no puede superar {MAX_DIAS_CONSULTA} días.")
+        attrs['desde'] = desde
+        attrs['hasta'] = hasta
+        return attrs
+
+
+class BusquedaParametrosSerializer(serializers.Serializer):
+    """
+    Valida los parámetros de /api/busqueda/: ?q= (texto), ?tipo= (uno o
+    varios de INDICES; por defecto todos) y ?limite= (resultados).
+    """
+    q = serializers.CharField(max_length=200)
+    tipo = serializers.MultipleChoiceField(choices=sorted(INDICES), required=False)
+    limite = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+
+class LineaTiempoParametrosSerializer(serializers.Serializer):
+    """
+    Parámetros de /api/pacientes/{id}/linea-tiempo/: ?cursor= (el 'next' de
+    la página anterior), ?page_size= y ?tipo= (uno o varios; por defecto todos).
+    """
+    cursor = serializers.CharField(required=False)
+    page_size = serializers.IntegerField(min_value=1, max_value=CursorPaginacion.max_page_size,
+                                         default=CursorPaginacion.page_size)
+    tipo = serializers.MultipleChoiceField(choices=list(TIPOS_LINEA_TIEMPO), required=False)
+
+
+class SlotSerializer(serializers.Serializer):
+    """ Un cupo libre de atención. """
+    inicio = serializers.DateTimeField()
+    fin = serializers.DateTimeField()
+
+
+# ======================================================================
+# SERIALIZERS DE LECTURA PARA LISTADOS
+# Versión de solo lectura de los serializers con *_nombre_completo: los
+# nombres se calculan en SQL (anotaciones Concat) y el listado trabaja
+# sobre diccionarios de values(), sin instanciar Paciente ni Medico.
+# La respuesta es idéntica a la del serializer de escritura.
+# ======================================================================
+
+def _nombre_medico(prefijo):
+    return Concat(
+        Value('Dr(a). '), f'{prefijo}__nombre', Value(' '), f'{prefijo}__apellido',
+        output_field=CharField(),
+    )
+
+
+def _nombre_paciente(prefijo='paciente', con_rut=False):
+    partes = [f'{prefijo}__nombre', Value(' '), f'{prefijo}__apellido']
+    if con_rut:
+        partes += [Value(' ('), f'{prefijo}__rut', Value(')')]
+    return Concat(*partes, output_field=CharField())
+
+
+class ChoiceDisplayField(serializers.Field):
+    """ Equivalente a get_<campo>_display() para filas de values(). """
+
+    def __init__(self, choices, **kwargs):
+        self.etiquetas = {valor: str(etiqueta) for valor, etiqueta in choices}
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, valor):
+        return self.etiquetas.get(valor, valor)
+
+
+class LecturaSerializer(serializers.Serializer):
+    """
+    Base de los serializers de lectura. Cada subclase declara en Meta las
+    'anotaciones' SQL que necesita; preparar_queryset() las aplica y deja
+    el queryset como values() con exactamente las columnas a serializar.
+    """
+
+    class Meta:
+        anotaciones = {}
+
+    @classmethod
+    def preparar_queryset(cls, queryset):
+        columnas = []
+        for campo in cls().fields.values():
+            if campo.source not in columnas:
+                columnas.append(campo.source)
+        return queryset.annotate(**cls.Meta.anotaciones).values(*columnas)
+
+    @cached_property
+    def conversores(self):
+        """ (nombre, columna, to_representation) de cada campo, calculado una vez por serializer. """
+        return [(campo.field_name, campo.source, campo.to_representation) for campo in self._readable_fields]
+
+    def to_representation(self, fila):
+        # La fila ya trae exactamente las columnas: se evita el get_attribute
+        # campo por campo de Serializer.to_representation, que en listados
+        # grandes es la mayor parte del costo de serializar.
+        return {
+            nombre: None if fila[columna] is None else convertir(fila[columna])
+            for nombre, columna, convertir in self.conversores
+        }
+
+
+class ConsultaMedicaLecturaSerializer(LecturaSerializer):
+    id = serializers.IntegerField()
+    paciente_nombre_completo = serializers.CharField()
+    medico_nombre_completo = serializers.CharField()
+    fecha_consulta = serializers.DateTimeField()
+    motivo = serializers.CharField()
+    diagnostico = serializers.CharField(allow_null=True)
+    estado = serializers.CharField()
+    estado_display = ChoiceDisplayField(ESTADO_CONSULTA_CHOICES, source='estado')
+    prioridad = serializers.CharField()
+    prioridad_display = ChoiceDisplayField(PRIORIDAD_CHOICES, source='prioridad')
+
+    class Meta:
+        anotaciones = {
+            'paciente_nombre_completo': _nombre_paciente(con_rut=True),
+            'medico_nombre_completo': _nombre_medico('medico'),
+        }
+
+
+class SeguroLecturaSerializer(LecturaSerializer):
+    id = serializers.IntegerField()
+    nombre_aseguradora = serializers.CharField()
+    numero_poliza = serializers.CharField()
+    tipo_cobertura = serializers.CharField()
+    tipo_cobertura_display = ChoiceDisplayField(TIPO_COBERTURA_CHOICES, source='tipo_cobertura')
+    fecha_inicio = serializers.DateField()
+    fecha_vencimiento = serializers.DateField()
+    porcentaje_cobertura = serializers.DecimalField(max_digits=5, decimal_places=2)
+    paciente_nombre = serializers.CharField()
+    activo = serializers.BooleanField()
+
+    class Meta:
+        anotaciones = {
+            'paciente_nombre': _nombre_paciente(),
+        }
+
+
+class HorarioLecturaSerializer(LecturaSerializer):
+    id = serializers.IntegerField()
+    medico_nombre = serializers.CharField()
+    dia_semana = serializers.IntegerField()
+    dia_semana_display = ChoiceDisplayField(DIA_SEMANA_CHOICES, source='dia_semana')
+    hora_inicio = serializers.TimeField()
+    hora_fin = serializers.TimeField()
+    duracion_consulta_minutos = serializers.IntegerField()
+    activo = serializers.BooleanField()
+
+    class Meta:
+        anotaciones = {
+            'medico_nombre': _nombre_medico('medico'),
+        }
+
+
+class CitaMedicaLecturaSerializer(LecturaSerializer):
+    id = serializers.IntegerField()
+    paciente_nombre_completo = serializers.CharField()
+    medico_nombre_completo = serializers.CharField()
+    fecha_hora_cita = serializers.DateTimeField()
+    motivo = serializers.CharField()
+    estado = serializers.CharField()
+    estado_display = ChoiceDisplayField(ESTADO_CITA_CHOICES, source='estado')
+    observaciones = serializers.CharField(allow_null=True)
+    fecha_creacion = serializers.DateTimeField()
+    consulta_realizada = serializers.IntegerField(allow_null=True)
+
+    class Meta:
+        anotaciones = {
+            'paciente_nombre_completo': _nombre_paciente(),
+            'medico_nombre_completo': _nombre_medico('medico'),
+        }
+
+
+class HistorialClinicoLecturaSerializer(LecturaSerializer):
+    id = serializers.IntegerField()
+    paciente_nombre = serializers.CharField()
+    fecha_registro = serializers.DateField()
+    tipo_registro = serializers.CharField()
+    descripcion = serializers.CharField()
+    medicamentos_asociados = serializers.CharField(allow_null=True)
+    registrado_por_nombre = serializers.CharField()
+
+    class Meta:
+        anotaciones = {
+            'paciente_nombre': _nombre_paciente(),
+            'registrado_por_nombre': Case(
+                When(registrado_por__isnull=True, then=Value('No especificado')),
+                default=_nombre_medico('registrado_por'),
+                output_field=CharField(),
+            ),
+        }
@@ -0,0 +1,42 @@
+/* Autocompletado de los selectores de FK (ver api/autocompletar.py) */
+document.addEventListener('DOMContentLoaded', function () {
+  document.querySelectorAll('[data-autocompletar]').forEach(function (contenedor) {
+    var oculto = contenedor.querySelector('input[type=hidden]');
+    var texto = contenedor.querySelector('input[type=text]');
+    var menu = contenedor.querySelector('.dropdown-menu');
+    var espera = null;
+
+    function cerrar() { menu.classList.remove('show'); menu.innerHTML = ''; }
+
+    function mostrar(resultados) {
+      menu.innerHTML = '';
+      resultados.forEach(function (r) {
+        var opcion = document.createElement('button');
+        opcion.type = 'button';
+        opcion.className = 'dropdown-item';
+        opcion.textContent = r.texto;
+        opcion.addEventListener('click', function () {
+          oculto.value = r.id;
+          texto.value = r.texto;
+          cerrar();
+        });
+        menu.appendChild(opcion);
+      });
+      menu.classList.toggle('show', resultados.length > 0);
+    }
+
+    texto.addEventListener('input', function () {
+      oculto.value = '';
+      clearTimeout(espera);
+      espera = setTimeout(function () {
+        fetch(contenedor.dataset.url + '?q=' + encodeURIComponent(texto.value))
+          .then(function (r) { return r.json(); })
+          .then(function (datos) { mostrar(datos.resultados); });
+      }, 200);
+    });
+
+    document.addEventListener('click', function (e) {
+      if (!contenedor.contains(e.target)) { cerrar(); }
+    });
+  });
+});
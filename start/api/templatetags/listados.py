@@ -0,0 +1,35 @@
+from django import template
+
+register = template.Library()
+
+
+def _querystring(request, **cambios):
+    """ Copia los parámetros GET actuales aplicando 'cambios' (None elimina el parámetro). """
+    parametros = request.GET.copy()
+    for clave, valor in cambios.items():
+        if valor is None:
+            parametros.pop(clave, None)
+        else:
+            parametros[clave] = valor
+    return '?' + parametros.urlencode()
+
+
+@register.simple_tag(takes_context=True)
+def url_pagina(context, numero):
+    """ URL de la página 'numero' conservando búsqueda, filtros y orden. """
+    return _querystring(context['request'], page=numero)
+
+
+@register.inclusion_tag('_encabezado_orden.html', takes_context=True)
+def encabezado_orden(context, campo, titulo):
+    """
+    Celda <th> con enlace para ordenar por 'campo'. Un segundo clic invierte
+    el sentido. Al cambiar el orden se vuelve a la primera página.
+    """
+    orden = context.get('orden', '')
+    siguiente = f'-{campo}' if orden == campo else campo
+    return {
+        'titulo': titulo,
+        'url': _querystring(context['request'], orden=siguiente, page=None),
+        'indicador': '▲' if orden == campo else '▼' if orden == f'-{campo}' else '',
+    }
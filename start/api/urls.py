@@ -12,6 +12,8 @@ from .views import (
     HorarioViewSet, # NUEVO
     CitaMedicaViewSet, # NUEVO
     HistorialClinicoViewSet, # NUEVO
+    busqueda,
+    resumen,
 )
 
 # Creamos una instancia del DefaultRouter
@@ -41,4 +43,8 @@ urlpatterns = [
     # - /especialidades/ (GET, POST)
     # - /especialidades/{pk}/ (GET, PUT, PATCH, DELETE)
     path('', include(router.urls)),
+    # Búsqueda de texto completo por relevancia (historiales, consultas y tratamientos)
+    path('busqueda/', busqueda, name='busqueda'),
+    # Conteos para tableros desde las tablas de resumen: consultas, citas o recetas
+    path('resumenes/<str:tipo>/', resumen, name='resumen'),
 ]
\ No newline at end of file
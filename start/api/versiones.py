@@ -0,0 +1,243 @@
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+
+# ======================================================================
+# VERSIONES POR MODELO
+# Cada modelo de la app tiene un contador de versión en la caché
+# 'respuestas'. Toda escritura lo incrementa: las señales post_save /
+# post_delete lo hacen solas y las operaciones masivas (bulk_create,
+# bulk_update o SQL directo, que no emiten señales) llaman a
+# registrar_cambio(). Una clave de caché que incluye las versiones de los
+# modelos de los que depende queda obsoleta apenas uno de ellos cambia.
+#
+# Además del contador global hay contadores más finos:
+#   - uno por fila ('pk'), para el detalle de un objeto;
+#   - uno por valor de los campos de PARTICIONES (ej. las citas de un
+#     médico), para los listados filtrados por ese campo;
+#   - una 'época' por modelo, que avanza con los cambios masivos (de los
+#     que no se sabe qué filas tocaron) e invalida todas sus particiones.
+# Junto a los contadores se guarda el instante de la última modificación
+# de cada modelo, para la cabecera Last-Modified.
+# ======================================================================
+
+ALIAS_CACHE = 'respuestas'
+
+# Campos con contador propio por valor: un listado filtrado por uno de ellos
+# solo cambia de versión cuando cambia una fila con ese valor.
+PARTICIONES = {
+    'api.citamedica': ('medico', 'paciente'),
+    # Las pólizas de cada paciente (caché de coberturas, ver api/coberturas.py)
+    'api.seguro': ('paciente',),
+}
+
+# Modelos cuyas versiones se leen: los que sirven los ViewSets de la API
+# (con ETag o caché de respuestas) y sus 'modelos_relacionados'. Las
+# señales post_save/post_delete se conectan solo a ellos: un receptor de
+# post_delete le quita al modelo el borrado rápido de Django (un DELETE
+# sin cargar las filas), también en las cascadas.
+MODELOS_VERSIONADOS = (
+    'api.especialidad', 'api.paciente', 'api.medico', 'api.consultamedica', 'api.tratamiento',
+    'api.medicamento', 'api.recetamedica', 'api.seguro', 'api.horario', 'api.citamedica',
+    'api.historialclinico',
+)
+
+CAMPO_PK = 'pk'
+
+
+def cache_respuestas():
+    return caches[ALIAS_CACHE]
+
+
+def cache_activa():
+    """
+    Si las versiones pueden usarse para cachear y validar respuestas: solo
+    con una caché compartida por todos los procesos (ver
+    CACHE_RESPUESTAS_ACTIVA en settings). Las escrituras registran sus
+    cambios de todos modos.
+    """
+    return getattr(settings, 'CACHE_RESPUESTAS_ACTIVA', True)
+
+
+def _clave(modelo, campo=None, valor=None):
+    clave = f'version:{modelo._meta.label_lower}'
+    if campo is None:
+        return clave
+    return f'{clave}:{campo}={valor}'
+
+
+def _clave_epoca(modelo):
+    return f'epoca:{modelo._meta.label_lower}'
+
+
+def _clave_modificado(modelo):
+    return f'modificado:{modelo._meta.label_lower}'
+
+
+def particiones(modelo):
+    return PARTICIONES.get(modelo._meta.label_lower, ())
+
+
+def _inicializar(cache, clave):
+    # Si el contador no existe (primer uso, o la caché lo desalojó) arranca
+    # en un valor tomado del reloj: una versión ya usada no puede reaparecer.
+    cache.add(clave, time.time_ns(), timeout=None)
+    return cache.get(clave)
+
+
+def _incrementar(cache, clave):
+    try:
+        cache.incr(clave)
+    except ValueError:
+        _inicializar(cache, clave)
+
+
+def _leer(claves):
+    cache = cache_respuestas()
+    encontradas = cache.get_many(claves)
+    return [
+        encontradas[clave] if clave in encontradas else _inicializar(cache, clave)
+        for clave in claves
+    ]
+
+
+def versiones(modelos):
+    """ Versión actual de cada modelo, en el mismo orden (una sola lectura de caché). """
+    return _leer([_clave(modelo) for modelo in modelos])
+
+
+def versiones_particion(modelo, campo, valores):
+    """
+    {valor: versión} de las particiones campo=valor del modelo (época más
+    contador del valor), en una sola lectura de caché.
+    """
+    valores = list(valores)
+    epoca, *contadores = _leer([_clave_epoca(modelo)] + [_clave(modelo, campo, valor) for valor in valores])
+    return {valor: f'{epoca}.{contador}' for valor, contador in zip(valores, contadores)}
+
+
+def normalizar_valor(modelo, campo, valor):
+    """
+    Valor de una partición tal como se guarda en su clave (ej. '07' -> 7),
+    o None si no es un valor válido para el campo.
+    """
+    if campo == CAMPO_PK:
+        campo_modelo = modelo._meta.pk
+    else:
+        campo_modelo = modelo._meta.get_field(campo).target_field
+    try:
+        return campo_modelo.to_python(valor)
+    except ValidationError:
+        return None
+
+
+def claves_version(modelo, campo=None, valor=None):
+    """
+    Claves de contador que identifican el estado de los datos del modelo:
+    la global, o la época más la de la partición campo=valor.
+    """
+    if campo is None:
+        return [_clave(modelo)]
+    return [_clave_epoca(modelo), _clave(modelo, campo, valor)]
+
+
+def estado_version(claves, modelos):
+    """
+    (versiones, última modificación) en una sola lectura de caché:
+    los valores de 'claves' y el instante (epoch, en segundos) del último
+    cambio de cualquiera de 'modelos'.
+    """
+    cache = cache_respuestas()
+    claves_modificado = [_clave_modificado(modelo) for modelo in modelos]
+    encontradas = cache.get_many(list(claves) + claves_modificado)
+    valores = [
+        encontradas[clave] if clave in encontradas else _inicializar(cache, clave)
+        for clave in claves
+    ]
+    ahora = time.time()
+    modificado = max(
+        encontradas[clave] if clave in encontradas else _marcar_modificado(cache, clave, ahora)
+        for clave in claves_modificado
+    )
+    return valores, modificado
+
+
+def _marcar_modificado(cache, clave, momento):
+    # Sin registro (caché recién iniciada o desalojada) se toma 'ahora':
+    # la fecha queda posterior al cambio real, nunca anterior.
+    cache.add(clave, momento, timeout=None)
+    return cache.get(clave, momento)
+
+
+def incrementar_version(modelo, claves=()):
+    cache = cache_respuestas()
+    for clave in [_clave(modelo), *claves]:
+        _incrementar(cache, clave)
+    cache.set(_clave_modificado(modelo), time.time(), timeout=None)
+
+
+def _claves_instancia(modelo, instancia):
+    """ Contadores finos que toca la escritura de una fila. """
+    claves = [_clave(modelo, CAMPO_PK, instancia.pk)]
+    originales = getattr(instancia, '_particiones_originales', {})
+    for campo in particiones(modelo):
+        atributo = modelo._meta.get_field(campo).attname
+        if atributo not in originales:
+            # Valor anterior desconocido (campo diferido): se invalida todo el modelo
+            return claves + [_clave_epoca(modelo)]
+        for valor in {originales[atributo], instancia.__dict__.get(atributo)}:
+            if valor is not None:
+                claves.append(_clave(modelo, campo, valor))
+    return claves
+
+
+def registrar_cambio(modelo, instancia=None):
+    """
+    Marca el modelo como modificado. Se incrementa de inmediato (las
+    lecturas de esta misma transacción ya ven datos nuevos) y otra vez al
+    confirmar: un GET concurrente pudo haber guardado, con la versión
+    nueva, los datos previos al commit.
+    Sin 'instancia' (cambios masivos) avanza la época del modelo, que
+    invalida los contadores por fila y por partición.
+    """
+    if instancia is None:
+        claves = [_clave_epoca(modelo)]
+    else:
+        claves = _claves_instancia(modelo, instancia)
+    incrementar_version(modelo, claves)
+    transaction.on_commit(partial(incrementar_version, modelo, claves))
+
+
+def recordar_particiones(sender, instance, **kwargs):
+    """
+    Receptor de post_init para los modelos de PARTICIONES: guarda los
+    valores con que se cargó la fila, para invalidar también la partición
+    de la que sale si se modifica (ej. una cita que cambia de médico).
+    """
+    atributos = [sender._meta.get_field(campo).attname for campo in particiones(sender)]
+    instance._particiones_originales = {
+        atributo: instance.__dict__[atributo] for atributo in atributos if atributo in instance.__dict__
+    }
+
+
+def modelo_guardado(sender, instance, **kwargs):
+    """ Receptor de post_save para los modelos de MODELOS_VERSIONADOS. """
+    registrar_cambio(sender, instance)
+    if particiones(sender):
+        recordar_particiones(sender, instance)
+
+
+def modelo_eliminado(sender, instance, **kwargs):
+    """
+    Receptor de post_delete para los modelos de MODELOS_VERSIONADOS. Las
+    filas que apuntaban a la eliminada con on_delete=SET_NULL se actualizan
+    con un UPDATE sin señales: su modelo se marca como modificado entero.
+    """
+    registrar_cambio(sender, instance)
+    for relacion in sender._meta.related_objects:
+        if relacion.on_delete not in (models.CASCADE, models.PROTECT, models.RESTRICT, models.DO_NOTHING):
+            registrar_cambio(relacion.related_model)
@@ -1,4 +1,10 @@
-from rest_framework import viewsets
+from django.utils import timezone
+from rest_framework import status, viewsets
+from rest_framework.decorators import action, api_view
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from .models import (
     Especialidad,
     Paciente,
@@ -24,112 +30,458 @@ from .serializer import (
     HorarioSerializer, # NUEVO
     CitaMedicaSerializer, # NUEVO
     HistorialClinicoSerializer, # NUEVO
+    ConsultaMedicaLecturaSerializer,
+    SeguroLecturaSerializer,
+    HorarioLecturaSerializer,
+    CitaMedicaLecturaSerializer,
+    HistorialClinicoLecturaSerializer,
+    DisponibilidadParametrosSerializer,
+    BusquedaParametrosSerializer,
+    ExpedienteParametrosSerializer,
+    ExpedienteSerializer,
+    LineaTiempoParametrosSerializer,
+    CoberturaParametrosSerializer,
+    CostosParametrosSerializer,
+    CostoTratamientoSerializer,
+    PolizaSerializer,
+    ResumenParametrosSerializer,
+    MovimientoInventarioSerializer,
+    MovimientoParametrosSerializer,
+    StockParametrosSerializer,
+    SlotSerializer,
 )
+from .busqueda_texto import INDICES, buscar
+from .disponibilidad import calcular_disponibilidad
+from .expediente import con_expediente
+from . import coberturas, inventario, linea_tiempo, resumenes
+from .agendamiento import agendar_cita, comprobar_cupos_lote
+from .lotes import OperacionesMasivasMixin
+from .cache_respuestas import RespuestaEnCacheMixin
+from .condicional import RespuestaCondicionalMixin
+from .exportacion import ExportacionMixin
+
+
+def _parametros_disponibilidad(request):
+    """ Valida y devuelve (desde, hasta) desde los query params. """
+    parametros = DisponibilidadParametrosSerializer(data=request.query_params)
+    parametros.is_valid(raise_exception=True)
+    return parametros.validated_data['desde'], parametros.validated_data['hasta']
+
+
+def _slots(slots):
+    return SlotSerializer([{'inicio': inicio, 'fin': fin} for inicio, fin in slots], many=True).data
 
 # ======================================================================
 # VIEWSETS PARA CADA ENTIDAD
 # Cada ViewSet hereda de ModelViewSet para proporcionar las operaciones
 # CRUD (Create, Retrieve, Update, Destroy, List) automáticamente.
+# BaseModelViewSet agrega además el endpoint de operaciones masivas
+# /<recurso>/lote/ (ver api/lotes.py) y el GET condicional con ETag
+# (ver api/condicional.py).
 # ======================================================================
 
-class EspecialidadViewSet(viewsets.ModelViewSet):
-    """ ViewSet para la entidad Especialidad. """
+class BaseModelViewSet(RespuestaCondicionalMixin, OperacionesMasivasMixin, viewsets.ModelViewSet):
+    """
+    ModelViewSet base de la API con operaciones masivas y GET condicional.
+    Si el ViewSet declara 'lectura_serializer_class', el listado (y la
+    exportación) usa ese serializer de solo lectura sobre filas values()
+    anotadas en SQL; el resto de las acciones sigue usando 'serializer_class'.
+    """
+    lectura_serializer_class = None
+
+    def usa_lectura_optimizada(self):
+        return self.action in ('list', 'exportar') and self.lectura_serializer_class is not None
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.usa_lectura_optimizada():
+            return self.lectura_serializer_class.preparar_queryset(queryset)
+        return queryset
+
+    def get_serializer_class(self):
+        if self.usa_lectura_optimizada():
+            return self.lectura_serializer_class
+        return super().get_serializer_class()
+
+
+class EspecialidadViewSet(RespuestaEnCacheMixin, BaseModelViewSet):
+    """ ViewSet para la entidad Especialidad (respuestas en caché). """
     # Queryset: Define el conjunto de objetos que el ViewSet puede manejar
     queryset = Especialidad.objects.all()
     # Serializer: Define cómo se serializan los datos
     serializer_class = EspecialidadSerializer
 
+    @action(detail=True, methods=['get'])
+    def disponibilidad(self, request, pk=None):
+        """
+        Modo multi-médico: cupos libres de todos los médicos activos de la
+        especialidad. GET /api/especialidades/{id}/disponibilidad/?desde=&hasta=
+        """
+        especialidad = self.get_object()
+        desde, hasta = _parametros_disponibilidad(request)
+        medicos = list(
+            Medico.objects.filter(especialidad=especialidad, activo=True)
+            .order_by('apellido', 'nombre')
+            .values('id', 'nombre', 'apellido')
+        )
+        disponibilidad = calcular_disponibilidad([m['id'] for m in medicos], desde, hasta)
+        return Response({
+            'especialidad': especialidad.id,
+            'desde': desde,
+            'hasta': hasta,
+            'medicos': [
+                {
+                    'medico': m['id'],
+                    'medico_nombre': f"Dr(a). {m['nombre']} {m['apellido']}",
+                    'slots': _slots(disponibilidad[m['id']]),
+                }
+                for m in medicos
+            ],
+        })
 
-class PacienteViewSet(viewsets.ModelViewSet):
+
+class PacienteViewSet(BaseModelViewSet):
     """ ViewSet para la entidad Paciente. """
     queryset = Paciente.objects.all()
     serializer_class = PacienteSerializer
-    
-    # Mejora: permite buscar por RUT, nombre o apellido (Requisito: Filtros y búsquedas)
-    search_fields = ['rut', 'nombre', 'apellido']
 
-class MedicoViewSet(viewsets.ModelViewSet):
-    """ ViewSet para la entidad Medico. """
+    def filter_queryset(self, queryset):
+        # ?search= busca por RUT (cualquier formato), nombre o apellido con los
+        # índices de las claves normalizadas (ver Paciente); no usa SearchFilter
+        queryset = super().filter_queryset(queryset)
+        termino = self.request.query_params.get('search', '').strip()
+        return queryset.buscar(termino) if termino else queryset
+
+    @action(detail=False, methods=['get'], url_path=r'rut/(?P<rut>[^/]+)')
+    def por_rut(self, request, rut=None):
+        """ Paciente por RUT escrito en cualquier formato. GET /api/pacientes/rut/{rut}/ """
+        try:
+            paciente = Paciente.objects.por_rut(rut)
+        except ValueError:
+            raise ValidationError({'rut': ['RUT inválido: revise el número y el dígito verificador.']})
+        except Paciente.DoesNotExist:
+            raise NotFound('No existe un paciente con ese RUT.')
+        return Response(self.get_serializer(paciente).data)
+
+    @action(detail=True, methods=['get'])
+    def expediente(self, request, pk=None):
+        """
+        Paciente con seguros, historial, citas y consultas -> tratamientos ->
+        recetas -> medicamento, en 7 consultas SQL.
+        GET /api/pacientes/{id}/expediente/?desde=&hasta=
+        """
+        parametros = ExpedienteParametrosSerializer(data=request.query_params)
+        parametros.is_valid(raise_exception=True)
+        queryset = con_expediente(
+            self.get_queryset(), parametros.validated_data.get('desde'), parametros.validated_data.get('hasta'),
+        )
+        paciente = get_object_or_404(queryset, pk=pk)
+        self.check_object_permissions(request, paciente)
+        return Response(ExpedienteSerializer(paciente, context=self.get_serializer_context()).data)
+
+    @action(detail=True, methods=['get'])
+    def cobertura(self, request, pk=None):
+        """
+        Seguro que cubre al paciente en ?fecha= (por defecto hoy), o null.
+        GET /api/pacientes/{id}/cobertura/?fecha=
+        """
+        parametros = CoberturaParametrosSerializer(data=request.query_params)
+        parametros.is_valid(raise_exception=True)
+        paciente = self.get_object()
+        fecha = parametros.validated_data.get('fecha') or timezone.localdate()
+        poliza = coberturas.cobertura(paciente.pk, fecha)
+        return Response({
+            'paciente': paciente.pk,
+            'fecha': fecha,
+            'seguro': PolizaSerializer(poliza).data if poliza else None,
+        })
+
+    @action(detail=True, methods=['get'], url_path='linea-tiempo')
+    def linea_tiempo(self, request, pk=None):
+        """
+        Citas, consultas e historial del paciente en un solo feed, del más
+        reciente al más antiguo, paginado por cursor (ver api/linea_tiempo.py).
+        GET /api/pacientes/{id}/linea-tiempo/?cursor=&page_size=&tipo=
+        """
+        parametros = LineaTiempoParametrosSerializer(data=request.query_params)
+        parametros.is_valid(raise_exception=True)
+        datos = parametros.validated_data
+        paciente = self.get_object()
+        try:
+            eventos, siguiente = linea_tiempo.pagina(
+                paciente.pk, datos['page_size'], datos.get('cursor'), datos.get('tipo'),
+            )
+        except ValueError:
+            raise NotFound('Cursor inválido.')
+        if siguiente is not None:
+            siguiente = replace_query_param(request.build_absolute_uri(), 'cursor', siguiente)
+        return Response({'next': siguiente, 'results': eventos})
+
+class MedicoViewSet(RespuestaEnCacheMixin, BaseModelViewSet):
+    """ ViewSet para la entidad Medico (respuestas en caché). """
     # Usamos select_related para optimizar la consulta (cargar la Especialidad en una sola consulta)
     queryset = Medico.objects.select_related('especialidad').all()
     serializer_class = MedicoSerializer
+    # La respuesta incluye especialidad_nombre: renombrar una Especialidad la invalida
+    modelos_relacionados = (Especialidad,)
     
     # Mejora: permite buscar por RUT, nombre o apellido y filtrar por especialidad (Requisito: Filtros y búsquedas)
     search_fields = ['rut', 'nombre', 'apellido', 'especialidad__nombre']
     filterset_fields = ['especialidad', 'activo'] # Filtra por ID de especialidad o por estado activo
 
-class ConsultaMedicaViewSet(viewsets.ModelViewSet):
-    """ ViewSet para la entidad ConsultaMedica. """
+    @action(detail=True, methods=['get'])
+    def disponibilidad(self, request, pk=None):
+        """ Cupos libres del médico. GET /api/medicos/{id}/disponibilidad/?desde=&hasta= """
+        medico = self.get_object()
+        desde, hasta = _parametros_disponibilidad(request)
+        disponibilidad = calcular_disponibilidad([medico.id], desde, hasta)
+        return Response({
+            'medico': medico.id,
+            'desde': desde,
+            'hasta': hasta,
+            'slots': _slots(disponibilidad[medico.id]),
+        })
+
+class ConsultaMedicaViewSet(ExportacionMixin, BaseModelViewSet):
+    """ ViewSet para la entidad ConsultaMedica (con exportación en streaming). """
     # Optimización: Carga Paciente y Medico en una sola consulta
     queryset = ConsultaMedica.objects.select_related('paciente', 'medico').all()
     serializer_class = ConsultaMedicaSerializer
+    lectura_serializer_class = ConsultaMedicaLecturaSerializer
+    # Los nombres del paciente y del médico salen de sus tablas
+    modelos_relacionados = (Paciente, Medico)
+    # Orden estable para la paginación por cursor (más recientes primero)
+    cursor_ordering = ('-fecha_consulta', '-id')
     
     # Mejora: permite filtrar por médico, paciente o estado (Requisito: Filtros y búsquedas)
     filterset_fields = ['medico', 'paciente', 'estado']
+    # ?texto= busca en motivo y diagnóstico con el índice de texto completo
+    indice_texto = 'consulta'
 
 
-class TratamientoViewSet(viewsets.ModelViewSet):
+class TratamientoViewSet(BaseModelViewSet):
     """ ViewSet para la entidad Tratamiento. """
     queryset = Tratamiento.objects.all()
     serializer_class = TratamientoSerializer
+    # ?texto= busca en las observaciones con el índice de texto completo
+    indice_texto = 'tratamiento'
+
+    @action(detail=True, methods=['get'])
+    def costo(self, request, pk=None):
+        """
+        Costo estimado de las recetas del tratamiento con la cobertura del
+        seguro vigente del paciente (en ?fecha= o en la fecha de la consulta).
+        GET /api/tratamientos/{id}/costo/?fecha=
+        """
+        parametros = CoberturaParametrosSerializer(data=request.query_params)
+        parametros.is_valid(raise_exception=True)
+        tratamiento = self.get_object()
+        resultados = coberturas.estimar_costos(
+            self.get_queryset().filter(pk=tratamiento.pk), parametros.validated_data.get('fecha'),
+        )
+        return Response(CostoTratamientoSerializer(resultados[0]).data)
+
+    @action(detail=False, methods=['post'])
+    def costos(self, request):
+        """
+        Costo estimado de muchos tratamientos en una petición (hasta
+        MAX_TRATAMIENTOS_ESTIMACION), con un número fijo de consultas SQL.
+        POST /api/tratamientos/costos/ {"tratamientos": [ids], "fecha": opcional}
+        """
+        parametros = CostosParametrosSerializer(data=request.data)
+        parametros.is_valid(raise_exception=True)
+        ids = parametros.validated_data['tratamientos']
+        resultados = coberturas.estimar_costos(
+            self.get_queryset().filter(pk__in=ids), parametros.validated_data.get('fecha'),
+        )
+        encontrados = {resultado['tratamiento'] for resultado in resultados}
+        return Response({
+            'resultados': CostoTratamientoSerializer(resultados, many=True).data,
+            'no_encontrados': sorted(set(ids) - encontrados),
+        })
 
 
-class MedicamentoViewSet(viewsets.ModelViewSet):
-    """ ViewSet para la entidad Medicamento. """
+class MedicamentoViewSet(RespuestaEnCacheMixin, BaseModelViewSet):
+    """ ViewSet para la entidad Medicamento (respuestas en caché). """
     queryset = Medicamento.objects.all()
     serializer_class = MedicamentoSerializer
     
     # Mejora: permite buscar por nombre o laboratorio
     search_fields = ['nombre', 'laboratorio']
 
+    @action(detail=True, methods=['get', 'post'])
+    def movimientos(self, request, pk=None):
+        """
+        Libro de inventario del medicamento, del más reciente al más antiguo
+        (GET, paginado por cursor), o registro de un ingreso o ajuste manual
+        (POST; responde el movimiento y el stock resultante, 409 si no alcanza).
+        GET/POST /api/medicamentos/{id}/movimientos/
+        """
+        medicamento = self.get_object()
+        if request.method == 'POST':
+            parametros = MovimientoParametrosSerializer(data=request.data)
+            parametros.is_valid(raise_exception=True)
+            movimiento = inventario.registrar_movimiento(medicamento.pk, **parametros.validated_data)
+            medicamento.refresh_from_db(fields=['stock'])
+            return Response(
+                {'movimiento': MovimientoInventarioSerializer(movimiento).data, 'stock': medicamento.stock},
+                status=status.HTTP_201_CREATED,
+            )
+        pagina = self.paginate_queryset(medicamento.movimientos.all())
+        return self.get_paginated_response(MovimientoInventarioSerializer(pagina, many=True).data)
 
-class RecetaMedicaViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'])
+    def stock(self, request, pk=None):
+        """
+        Stock del medicamento en una fecha según el libro de inventario
+        (último corte anterior + movimientos posteriores); sin ?fecha=, el actual.
+        GET /api/medicamentos/{id}/stock/?fecha=
+        """
+        parametros = StockParametrosSerializer(data=request.query_params)
+        parametros.is_valid(raise_exception=True)
+        medicamento = self.get_object()
+        fecha = parametros.validated_data.get('fecha')
+        return Response({
+            'medicamento': medicamento.pk,
+            'fecha': fecha or timezone.now(),
+            'stock': medicamento.stock if fecha is None else inventario.stock_en(medicamento.pk, fecha),
+        })
+
+
+class RecetaMedicaViewSet(BaseModelViewSet):
     """ 
     ViewSet para la entidad RecetaMedica. 
     Representa el detalle de la relación entre Tratamiento y Medicamento.
     """
     queryset = RecetaMedica.objects.all()
     serializer_class = RecetaMedicaSerializer
+    # medicamento_nombre sale del Medicamento
+    modelos_relacionados = (Medicamento,)
 
 
 # ======================================================================
 # VIEWSETS PARA NUEVAS TABLAS ADICIONALES
 # ======================================================================
 
-class SeguroViewSet(viewsets.ModelViewSet):
+class SeguroViewSet(BaseModelViewSet):
     """ ViewSet para la nueva entidad Seguro. """
     queryset = Seguro.objects.select_related('paciente').all()
     serializer_class = SeguroSerializer
+    lectura_serializer_class = SeguroLecturaSerializer
+    modelos_relacionados = (Paciente,)
     
     # Permite filtrar por paciente y buscar por aseguradora
     filterset_fields = ['paciente', 'activo', 'tipo_cobertura']
     search_fields = ['nombre_aseguradora', 'numero_poliza']
 
 
-class HorarioViewSet(viewsets.ModelViewSet):
-    """ ViewSet para la nueva entidad Horario. """
+class HorarioViewSet(RespuestaEnCacheMixin, BaseModelViewSet):
+    """ ViewSet para la nueva entidad Horario (respuestas en caché). """
     queryset = Horario.objects.select_related('medico').all()
     serializer_class = HorarioSerializer
+    lectura_serializer_class = HorarioLecturaSerializer
+    # medico_nombre sale del Medico
+    modelos_relacionados = (Medico,)
     
     # Permite filtrar por médico y día de la semana
     filterset_fields = ['medico', 'dia_semana', 'activo']
 
 
-class CitaMedicaViewSet(viewsets.ModelViewSet):
-    """ ViewSet para la nueva entidad CitaMedica. """
+class CitaMedicaViewSet(ExportacionMixin, BaseModelViewSet):
+    """ ViewSet para la nueva entidad CitaMedica (con exportación en streaming). """
     queryset = CitaMedica.objects.select_related('paciente', 'medico', 'consulta_realizada').all()
     serializer_class = CitaMedicaSerializer
+    lectura_serializer_class = CitaMedicaLecturaSerializer
+    cursor_ordering = ('-fecha_hora_cita', '-id')
+    modelos_relacionados = (Paciente, Medico)
+    # /api/citas/?medico= y ?paciente= se validan con el contador de ese
+    # médico o paciente (ver PARTICIONES en api/versiones.py)
     
     # Permite filtrar por médico, paciente y estado
     filterset_fields = ['medico', 'paciente', 'estado']
     search_fields = ['paciente__rut', 'paciente__nombre', 'medico__rut']
 
+    # Las altas y ediciones pasan por el servicio de agendamiento, que
+    # evita el doble agendamiento de un mismo cupo (responde 409).
+    def perform_create(self, serializer):
+        agendar_cita(serializer)
+
+    def perform_update(self, serializer):
+        agendar_cita(serializer)
 
-class HistorialClinicoViewSet(viewsets.ModelViewSet):
-    """ ViewSet para la nueva entidad HistorialClinico. """
+    # /api/citas/lote/ escribe con bulk_create/bulk_update: los cupos del
+    # lote se revisan de una vez, con los médicos bloqueados
+    def comprobar_lote(self, objetos):
+        comprobar_cupos_lote(objetos)
+
+
+class HistorialClinicoViewSet(ExportacionMixin, BaseModelViewSet):
+    """ ViewSet para la nueva entidad HistorialClinico (con exportación en streaming). """
     queryset = HistorialClinico.objects.select_related('paciente', 'registrado_por').all()
     serializer_class = HistorialClinicoSerializer
+    lectura_serializer_class = HistorialClinicoLecturaSerializer
+    modelos_relacionados = (Paciente, Medico)
+    cursor_ordering = ('-fecha_registro', '-id')
     
-    # Permite filtrar por paciente y buscar por tipo de registro
+    # Permite filtrar por paciente y buscar por tipo de registro o descripción
     filterset_fields = ['paciente', 'registrado_por', 'tipo_registro']
     search_fields = ['tipo_registro', 'descripcion']
+    # ?search= mantiene su búsqueda por subcadena (LIKE '%...%'); ?texto=
+    # busca palabras en la descripción con el índice de texto completo,
+    # sin recorrer la tabla (ver api/busqueda_texto.py)
+    indice_texto = 'historial'
+
+
+# ======================================================================
+# BÚSQUEDA DE TEXTO COMPLETO (ver api/busqueda_texto.py)
+# ======================================================================
+
+@api_view(['GET'])
+def busqueda(request):
+    """
+    Búsqueda por relevancia en el texto clínico (historiales, consultas y
+    tratamientos). GET /api/busqueda/?q=&tipo=&limite=
+    """
+    parametros = BusquedaParametrosSerializer(data=request.query_params)
+    parametros.is_valid(raise_exception=True)
+    texto = parametros.validated_data['q']
+    limite = parametros.validated_data['limite']
+    tipos = sorted(parametros.validated_data.get('tipo') or INDICES)
+
+    resultados = [
+        {'tipo': tipo, **resultado}
+        for tipo in tipos
+        for resultado in buscar(INDICES[tipo], texto, limite)
+    ]
+    # Con varios tipos se mezclan por relevancia y se vuelve a recortar
+    resultados.sort(key=lambda r: r['rango'], reverse=True)
+    return Response({'q': texto, 'resultados': resultados[:limite]})
+
+
+# ======================================================================
+# RESÚMENES PARA TABLEROS (ver api/resumenes.py)
+# ======================================================================
+
+@api_view(['GET'])
+def resumen(request, tipo):
+    """
+    Conteos de consultas, citas o recetas para tableros, sumados desde las
+    tablas de resumen por día: el costo depende de los días del rango, no
+    de las filas de atenciones. GET /api/resumenes/{tipo}/?desde=&hasta=&agrupar=
+    """
+    if tipo not in resumenes.RESUMENES:
+        raise NotFound(f"Resumen desconocido. Opciones: {', '.join(resumenes.RESUMENES)}.")
+    tabla = resumenes.RESUMENES[tipo]
+    parametros = ResumenParametrosSerializer(data=request.query_params, resumen=tabla)
+    parametros.is_valid(raise_exception=True)
+    datos = parametros.validated_data
+
+    resultados = resumenes.consultar(tabla, datos['desde'], datos['hasta'], datos['agrupar'], datos['filtros'])
+    return Response({
+        'tipo': tipo,
+        'desde': datos['desde'],
+        'hasta': datos['hasta'],
+        'agrupar': datos['agrupar'],
+        'totales': {medida: sum(fila[medida] for fila in resultados) for medida in tabla.medidas},
+        'resultados': resultados,
+    })
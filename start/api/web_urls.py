@@ -2,6 +2,7 @@ from django.urls import path
 
 from .web_views import (
     HomeView,
+    AutocompletarView,
     # Especialidad
     EspecialidadListView, EspecialidadCreateView, EspecialidadUpdateView, EspecialidadDeleteView,
     # Paciente
@@ -22,6 +23,9 @@ from .web_views import (
 urlpatterns = [
     path('', HomeView.as_view(), name='home'),
 
+    # Autocompletado de los selectores de FK en los formularios
+    path('autocompletar/<str:fuente>/', AutocompletarView.as_view(), name='autocompletar'),
+
     # Especialidad
     path('especialidades/', EspecialidadListView.as_view(), name='especialidad_list'),
     path('especialidades/nuevo/', EspecialidadCreateView.as_view(), name='especialidad_create'),
@@ -1,4 +1,13 @@
-from django.urls import reverse_lazy
+from functools import reduce
+from operator import or_
+
+from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import Http404, JsonResponse
+from django.urls import reverse, reverse_lazy
+from django.views import View
 from django.views.generic import TemplateView, ListView, CreateView, UpdateView, DeleteView
 
 from .models import (
@@ -10,19 +19,127 @@ from .models import (
     Medicamento,
     RecetaMedica,
 )
+from .autocompletar import FUENTES, autocompletar
+from .inventario import StockInsuficiente
 
 
 class HomeView(TemplateView):
     template_name = "index.html"
 
 
+# ==========================
+# Autocompletado de FK
+# ==========================
+class AutocompletarView(View):
+    """ GET /web/autocompletar/<fuente>/?q=texto -> {"resultados": [{"id", "texto"}, ...]} """
+
+    def get(self, request, fuente):
+        if fuente not in FUENTES:
+            raise Http404("Fuente de autocompletado desconocida")
+        return JsonResponse({"resultados": autocompletar(fuente, request.GET.get("q", ""))})
+
+
+class AutocompletarWidget(forms.Widget):
+    """
+    Reemplaza al <select> de una FK: no carga las opciones, solo un campo de
+    texto que consulta AutocompletarView y guarda el id elegido en un input oculto.
+    """
+    template_name = "widgets/autocompletar.html"
+
+    class Media:
+        js = ("api/js/autocompletar.js",)
+
+    def __init__(self, fuente, attrs=None):
+        self.fuente = fuente
+        super().__init__(attrs)
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context["widget"]["url"] = reverse("autocompletar", args=[self.fuente])
+        context["widget"]["texto"] = FUENTES[self.fuente].texto(value) if value not in (None, "") else ""
+        return context
+
+
+# ==========================
+# Base de los listados
+# ==========================
+class ListadoMixin:
+    """
+    Listado paginado con orden y búsqueda del lado del servidor.
+
+    - relaciones: FK que la plantilla muestra (se cargan con select_related).
+    - campos_orden: campos por los que se puede ordenar con ?orden=campo / ?orden=-campo.
+    - campos_busqueda: campos donde busca ?q= (icontains; buscar() puede redefinirlo).
+    - campos_filtro: campos que aceptan filtro exacto por GET (ej: ?estado=PENDIENTE).
+
+    El tamaño de página se toma de settings.WEB_PAGINATE_BY y el usuario
+    puede cambiarlo con ?page_size= hasta settings.WEB_MAX_PAGINATE_BY.
+    """
+    context_object_name = "items"
+    relaciones = ()
+    campos_orden = ()
+    orden_por_defecto = "-id"
+    campos_busqueda = ()
+    campos_filtro = ()
+
+    def get_paginate_by(self, queryset):
+        por_defecto = getattr(settings, "WEB_PAGINATE_BY", 25)
+        maximo = getattr(settings, "WEB_MAX_PAGINATE_BY", 200)
+        try:
+            tamano = int(self.request.GET.get("page_size", por_defecto))
+        except ValueError:
+            tamano = por_defecto
+        return max(1, min(tamano, maximo))
+
+    def get_orden(self):
+        orden = self.request.GET.get("orden", "")
+        if orden.lstrip("-") in self.campos_orden:
+            return orden
+        return self.orden_por_defecto
+
+    def get_queryset(self):
+        queryset = super().get_queryset().select_related(*self.relaciones)
+
+        q = self.request.GET.get("q", "").strip()
+        if q:
+            queryset = self.buscar(queryset, q)
+
+        for campo in self.campos_filtro:
+            valor = self.request.GET.get(campo)
+            if valor:
+                try:
+                    queryset = queryset.filter(**{campo: valor})
+                except (ValueError, ValidationError):
+                    # Un filtro con un valor inválido (ej: ?medico=abc) no tiene resultados
+                    return queryset.none()
+
+        # El id desempata registros con el mismo valor para que el orden sea estable entre páginas
+        orden = self.get_orden()
+        desempate = "-id" if orden.startswith("-") else "id"
+        return queryset.order_by(*dict.fromkeys([orden, desempate]))
+
+    def buscar(self, queryset, q):
+        if not self.campos_busqueda:
+            return queryset
+        return queryset.filter(reduce(or_, [Q(**{f"{campo}__icontains": q}) for campo in self.campos_busqueda]))
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["q"] = self.request.GET.get("q", "")
+        context["orden"] = self.get_orden()
+        context["page_size"] = self.request.GET.get("page_size", "")
+        return context
+
+
 # ==========================
 # Especialidad CRUD
 # ==========================
-class EspecialidadListView(ListView):
+class EspecialidadListView(ListadoMixin, ListView):
     model = Especialidad
     template_name = "especialidad_list.html"
-    context_object_name = "items"
+    campos_orden = ("id", "nombre")
+    orden_por_defecto = "nombre"
+    campos_busqueda = ("nombre", "descripcion")
 
 
 class EspecialidadCreateView(CreateView):
@@ -48,14 +165,19 @@ class EspecialidadDeleteView(DeleteView):
 # ==========================
 # Paciente CRUD
 # ==========================
-class PacienteListView(ListView):
+class PacienteListView(ListadoMixin, ListView):
     model = Paciente
     template_name = "paciente_list.html"
-    context_object_name = "items"
+    campos_orden = ("rut", "apellido", "genero", "tipo_sangre")
+    orden_por_defecto = "apellido"
+    campos_busqueda = ("rut", "nombre", "apellido")
+    campos_filtro = ("genero", "tipo_sangre", "activo")
 
+    def buscar(self, queryset, q):
+        # RUT en cualquier formato o prefijo de nombre/apellido, con índice (ver Paciente)
+        return queryset.buscar(q)
 
 
-from django import forms
 
 class PacienteForm(forms.ModelForm):
     class Meta:
@@ -99,40 +221,44 @@ class PacienteDeleteView(DeleteView):
 # ==========================
 # Medico CRUD
 # ==========================
-class MedicoListView(ListView):
+class MedicoListView(ListadoMixin, ListView):
     model = Medico
     template_name = "medico_list.html"
-    context_object_name = "items"
+    relaciones = ("especialidad",)
+    campos_orden = ("rut", "apellido", "especialidad__nombre", "genero")
+    orden_por_defecto = "apellido"
+    campos_busqueda = ("rut", "nombre", "apellido")
+    campos_filtro = ("especialidad", "genero", "activo")
+
+
+class MedicoForm(forms.ModelForm):
+    class Meta:
+        model = Medico
+        fields = [
+            "nombre",
+            "apellido",
+            "rut",
+            "genero",
+            "correo",
+            "telefono",
+            "activo",
+            "especialidad",
+        ]
+        widgets = {
+            "especialidad": AutocompletarWidget("especialidades"),
+        }
 
 
 class MedicoCreateView(CreateView):
     model = Medico
-    fields = [
-        "nombre",
-        "apellido",
-        "rut",
-        "genero",
-        "correo",
-        "telefono",
-        "activo",
-        "especialidad",
-    ]
+    form_class = MedicoForm
     template_name = "medico_form.html"
     success_url = reverse_lazy("medico_list")
 
 
 class MedicoUpdateView(UpdateView):
     model = Medico
-    fields = [
-        "nombre",
-        "apellido",
-        "rut",
-        "genero",
-        "correo",
-        "telefono",
-        "activo",
-        "especialidad",
-    ]
+    form_class = MedicoForm
     template_name = "medico_form.html"
     success_url = reverse_lazy("medico_list")
 
@@ -146,38 +272,44 @@ class MedicoDeleteView(DeleteView):
 # ==========================
 # ConsultaMedica CRUD
 # ==========================
-class ConsultaListView(ListView):
+class ConsultaListView(ListadoMixin, ListView):
     model = ConsultaMedica
     template_name = "consulta_list.html"
-    context_object_name = "items"
+    relaciones = ("paciente", "medico__especialidad")
+    campos_orden = ("id", "fecha_consulta", "estado", "prioridad")
+    orden_por_defecto = "-fecha_consulta"
+    campos_busqueda = ("paciente__rut", "paciente__apellido", "medico__apellido", "motivo")
+    campos_filtro = ("estado", "prioridad", "medico", "paciente")
+
+
+class ConsultaForm(forms.ModelForm):
+    class Meta:
+        model = ConsultaMedica
+        fields = [
+            "paciente",
+            "medico",
+            "fecha_consulta",
+            "motivo",
+            "diagnostico",
+            "estado",
+            "prioridad",
+        ]
+        widgets = {
+            "paciente": AutocompletarWidget("pacientes"),
+            "medico": AutocompletarWidget("medicos"),
+        }
 
 
 class ConsultaCreateView(CreateView):
     model = ConsultaMedica
-    fields = [
-        "paciente",
-        "medico",
-        "fecha_consulta",
-        "motivo",
-        "diagnostico",
-        "estado",
-        "prioridad",
-    ]
+    form_class = ConsultaForm
     template_name = "consulta_form.html"
     success_url = reverse_lazy("consulta_list")
 
 
 class ConsultaUpdateView(UpdateView):
     model = ConsultaMedica
-    fields = [
-        "paciente",
-        "medico",
-        "fecha_consulta",
-        "motivo",
-        "diagnostico",
-        "estado",
-        "prioridad",
-    ]
+    form_class = ConsultaForm
     template_name = "consulta_form.html"
     success_url = reverse_lazy("consulta_list")
 
@@ -191,22 +323,33 @@ class ConsultaDeleteView(DeleteView):
 # ==========================
 # Tratamiento CRUD
 # ==========================
-class TratamientoListView(ListView):
+class TratamientoListView(ListadoMixin, ListView):
     model = Tratamiento
     template_name = "tratamiento_list.html"
-    context_object_name = "items"
+    campos_orden = ("id", "consulta", "duracion_dias")
+    campos_busqueda = ("descripcion",)
+    campos_filtro = ("consulta",)
+
+
+class TratamientoForm(forms.ModelForm):
+    class Meta:
+        model = Tratamiento
+        fields = ["consulta", "descripcion", "duracion_dias", "observaciones"]
+        widgets = {
+            "consulta": AutocompletarWidget("consultas"),
+        }
 
 
 class TratamientoCreateView(CreateView):
     model = Tratamiento
-    fields = ["consulta", "descripcion", "duracion_dias", "observaciones"]
+    form_class = TratamientoForm
     template_name = "tratamiento_form.html"
     success_url = reverse_lazy("tratamiento_list")
 
 
 class TratamientoUpdateView(UpdateView):
     model = Tratamiento
-    fields = ["consulta", "descripcion", "duracion_dias", "observaciones"]
+    form_class = TratamientoForm
     template_name = "tratamiento_form.html"
     success_url = reverse_lazy("tratamiento_list")
 
@@ -220,22 +363,26 @@ class TratamientoDeleteView(DeleteView):
 # ==========================
 # Medicamento CRUD
 # ==========================
-class MedicamentoListView(ListView):
+class MedicamentoListView(ListadoMixin, ListView):
     model = Medicamento
     template_name = "medicamento_list.html"
-    context_object_name = "items"
+    campos_orden = ("nombre", "laboratorio", "categoria", "stock", "precio_unitario")
+    orden_por_defecto = "nombre"
+    campos_busqueda = ("nombre", "laboratorio")
+    campos_filtro = ("categoria",)
 
 
 class MedicamentoCreateView(CreateView):
     model = Medicamento
-    fields = ["nombre", "laboratorio", "categoria", "stock", "precio_unitario"]
+    fields = ["nombre", "laboratorio", "categoria", "stock", "stock_minimo", "precio_unitario"]
     template_name = "medicamento_form.html"
     success_url = reverse_lazy("medicamento_list")
 
 
 class MedicamentoUpdateView(UpdateView):
     model = Medicamento
-    fields = ["nombre", "laboratorio", "categoria", "stock", "precio_unitario"]
+    # El stock de un medicamento existente cambia solo con movimientos de inventario
+    fields = ["nombre", "laboratorio", "categoria", "stock_minimo", "precio_unitario"]
     template_name = "medicamento_form.html"
     success_url = reverse_lazy("medicamento_list")
 
@@ -249,36 +396,54 @@ class MedicamentoDeleteView(DeleteView):
 # ==========================
 # RecetaMedica CRUD
 # ==========================
-class RecetaListView(ListView):
+class RecetaListView(ListadoMixin, ListView):
     model = RecetaMedica
     template_name = "receta_list.html"
-    context_object_name = "items"
+    relaciones = ("medicamento",)
+    campos_orden = ("id", "tratamiento", "medicamento__nombre")
+    campos_busqueda = ("medicamento__nombre", "dosis")
+    campos_filtro = ("tratamiento", "medicamento", "via_administracion")
+
+
+class RecetaForm(forms.ModelForm):
+    class Meta:
+        model = RecetaMedica
+        fields = [
+            "tratamiento",
+            "medicamento",
+            "dosis",
+            "frecuencia",
+            "duracion",
+            "via_administracion",
+            "cantidad",
+        ]
+        widgets = {
+            "tratamiento": AutocompletarWidget("tratamientos"),
+            "medicamento": AutocompletarWidget("medicamentos"),
+        }
+
+
+class ReservaStockMixin:
+    """ Guardar la receta reserva stock: si no alcanza, el formulario muestra el error. """
+
+    def form_valid(self, form):
+        try:
+            return super().form_valid(form)
+        except StockInsuficiente as error:
+            form.add_error("cantidad", str(error.detail))
+            return self.form_invalid(form)
 
 
-class RecetaCreateView(CreateView):
+class RecetaCreateView(ReservaStockMixin, CreateView):
     model = RecetaMedica
-    fields = [
-        "tratamiento",
-        "medicamento",
-        "dosis",
-        "frecuencia",
-        "duracion",
-        "via_administracion",
-    ]
+    form_class = RecetaForm
     template_name = "receta_form.html"
     success_url = reverse_lazy("receta_list")
 
 
-class RecetaUpdateView(UpdateView):
+class RecetaUpdateView(ReservaStockMixin, UpdateView):
     model = RecetaMedica
-    fields = [
-        "tratamiento",
-        "medicamento",
-        "dosis",
-        "frecuencia",
-        "duracion",
-        "via_administracion",
-    ]
+    form_class = RecetaForm
     template_name = "receta_form.html"
     success_url = reverse_lazy("receta_list")
 
@@ -0,0 +1,50 @@
+"""
+Utilidades comunes de los benchmarks.
+
+Los benchmarks se ejecutan desde la carpeta 'start' con:
+
+    python -m benchmarks.<nombre> [opciones]
+
+Trabajan sobre la base de datos de tests de Django (se crea y se destruye
+en cada ejecución), por lo que nunca modifican db.sqlite3.
+"""
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+
+def iniciar_django():
+    """ Configura Django con los settings del proyecto. """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'drf.settings')
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import django
+    django.setup()
+
+
+@contextmanager
+def base_de_datos_temporal():
+    """ Crea la base de datos de tests, migrada, y la elimina al terminar. """
+    from django.test.runner import DiscoverRunner
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    runner = DiscoverRunner(verbosity=0, interactive=False)
+    configuracion = runner.setup_databases()
+    try:
+        yield
+    finally:
+        runner.teardown_databases(configuracion)
+        teardown_test_environment()
+
+
+def cronometrar(funcion, repeticiones=3):
+    """ Ejecuta 'funcion' varias veces y devuelve el mejor tiempo (segundos) y su resultado. """
+    mejor = None
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        duracion = time.perf_counter() - inicio
+        mejor = duracion if mejor is None or duracion < mejor else mejor
+    return mejor, resultado
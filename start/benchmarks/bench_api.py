@@ -0,0 +1,349 @@
+"""
+Benchmark de extremo a extremo de la API y de las vistas HTML.
+
+    python -m benchmarks.bench_api --tamanos 1000,10000,100000 --salida actual.json
+    python -m benchmarks.bench_api --tamanos 1000,10000 --comparar base.json
+
+Para cada tamaño crea una base temporal y la llena con el generador de
+datos sintéticos (api/datos_sinteticos.py, siempre con la misma semilla).
+Luego recorre todas las rutas de api/urls.py y api/web_urls.py y mide
+las operaciones que cada una admite: listar, detalle, filtrar, buscar y
+crear (las altas se revierten para que todas las mediciones vean los
+mismos datos). De cada caso registra los percentiles de latencia, la
+cantidad de consultas SQL, el código HTTP y el tamaño de la respuesta.
+
+El reporte JSON incluye el commit y el entorno. Con --comparar se contrasta
+contra un reporte anterior. El comando termina con código 1 si algún caso
+empeora más que --umbral o hace más consultas SQL, para usarlo antes de
+desplegar.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from ._entorno import iniciar_django, base_de_datos_temporal
+
+# Fecha fuera del rango generado, para que el alta de citas encuentre el cupo libre
+FECHA_ALTA_CITA = '2040-01-02T10:00:00Z'
+
+
+class Caso:
+    """ Una petición a medir: ruta (nombre estable para comparar), operación y request. """
+
+    def __init__(self, ruta, operacion, url, metodo='get', datos=None, formato=None):
+        self.ruta = ruta
+        self.operacion = operacion
+        self.url = url
+        self.metodo = metodo
+        self.datos = datos
+        self.formato = formato
+
+    @property
+    def clave(self):
+        return f'{self.ruta} {self.operacion}'
+
+
+def _percentil(valores, p):
+    """ Percentil por rango más cercano de una lista ordenada. """
+    indice = max(0, min(len(valores) - 1, round(p / 100 * len(valores) + 0.5) - 1))
+    return valores[indice]
+
+
+def _muestra(modelo):
+    """ Registro representativo (el del medio según su id) para detalle, filtros y altas. """
+    total = modelo.objects.count()
+    if not total:
+        return None
+    return modelo.objects.order_by('pk')[total // 2]
+
+
+def _valor_simple(valor):
+    return getattr(valor, 'pk', valor)
+
+
+def _alterar_unicos(modelo, datos, nombres):
+    """
+    Cambia los valores de los campos únicos del modelo para que el alta
+    no choque con el registro del que se copió. 'nombres' mapea el nombre
+    del campo del modelo al nombre con el que viaja en 'datos'.
+    """
+    from api.rut import formatear_rut, validar_rut
+
+    for campo in modelo._meta.concrete_fields:
+        nombre = nombres.get(campo.name)
+        if campo.unique and not campo.primary_key and isinstance(datos.get(nombre), str) and datos[nombre]:
+            if validar_rut in campo.validators:
+                # Tiene que seguir siendo un RUT válido: uno fuera del rango del generador
+                datos[nombre] = formatear_rut(99999999)
+            else:
+                datos[nombre] = 'Z' + datos[nombre][1:]
+    return datos
+
+
+def casos_api():
+    from rest_framework.fields import empty
+    from rest_framework.relations import RelatedField
+    from api.models import CitaMedica
+    from api.resumenes import RESUMENES
+    from api.urls import router
+
+    casos = []
+    for prefijo, viewset, _ in router.registry:
+        modelo = viewset.queryset.model
+        base = f'/api/{prefijo}/'
+        ruta = f'api:{prefijo}'
+        casos.append(Caso(ruta, 'listar', base))
+
+        muestra = _muestra(modelo)
+        if muestra is None:
+            continue
+        casos.append(Caso(ruta, 'detalle', f'{base}{muestra.pk}/'))
+
+        serializer = viewset.serializer_class(context={'request': None})
+        filtros = getattr(viewset, 'filterset_fields', None)
+        busqueda = getattr(viewset, 'search_fields', None)
+        if filtros:
+            campo = filtros[0]
+            casos.append(Caso(ruta, 'filtrar', f'{base}?{campo}={_valor_simple(getattr(muestra, campo))}'))
+        if busqueda:
+            valor = muestra
+            for parte in busqueda[0].lstrip('^=@$').split('__'):
+                valor = getattr(valor, parte)
+            casos.append(Caso(ruta, 'buscar', f'{base}?search={str(valor)[:4]}'))
+        elif hasattr(viewset.queryset, 'buscar'):
+            # Búsqueda propia del QuerySet (pacientes: RUT y nombre sobre claves indexadas)
+            casos.append(Caso(ruta, 'buscar', f'{base}?search={muestra.apellido[:4]}'))
+            casos.append(Caso(ruta, 'rut', f'{base}rut/{muestra.rut}/'))
+        if hasattr(viewset, 'expediente'):
+            casos.append(Caso(ruta, 'expediente', f'{base}{muestra.pk}/expediente/'))
+        if hasattr(viewset, 'linea_tiempo'):
+            casos.append(Caso(ruta, 'linea-tiempo', f'{base}{muestra.pk}/linea-tiempo/'))
+        if hasattr(viewset, 'costos'):
+            ids = list(modelo.objects.filter(pk__gte=muestra.pk).order_by('pk').values_list('pk', flat=True)[:200])
+            casos.append(Caso(ruta, 'costo', f'{base}{muestra.pk}/costo/'))
+            casos.append(Caso(ruta, 'costos-lote', f'{base}costos/', 'post', {'tratamientos': ids}, 'json'))
+        indice_texto = getattr(viewset, 'indice_texto', None)
+        if indice_texto:
+            casos.append(Caso(ruta, 'texto', f'{base}?texto=control'))
+
+        datos = {}
+        nombres = {}
+        for nombre, campo in serializer.fields.items():
+            if campo.read_only:
+                continue
+            valor = campo.get_attribute(muestra)
+            if valor is None or valor is empty:
+                continue
+            datos[nombre] = campo.to_representation(valor) if not isinstance(campo, RelatedField) else valor.pk
+            nombres[campo.source.split('.')[0]] = nombre
+        _alterar_unicos(modelo, datos, nombres)
+        if modelo is CitaMedica:
+            datos['fecha_hora_cita'] = FECHA_ALTA_CITA
+        casos.append(Caso(ruta, 'crear', base, 'post', datos, 'json'))
+    # Tableros: todo el historial, sumado desde las tablas de resumen
+    for tipo in RESUMENES:
+        casos.append(Caso('api:resumenes', tipo, f'/api/resumenes/{tipo}/?desde=2000-01-01&hasta=2099-12-31'))
+    return casos
+
+
+def casos_web():
+    from django.views.generic import ListView, CreateView, UpdateView, DeleteView
+    from api.autocompletar import FUENTES
+    from api.web_urls import urlpatterns
+    from api.web_views import AutocompletarView
+
+    casos = []
+    for patron in urlpatterns:
+        vista = patron.callback.view_class
+        ruta = f'web:{patron.name}'
+        modelo = getattr(vista, 'model', None)
+        muestra = _muestra(modelo) if modelo else None
+        url = '/web/' + str(patron.pattern)
+
+        if vista is AutocompletarView:
+            for fuente, definicion in FUENTES.items():
+                fila = _muestra(definicion.modelo)
+                if fila is not None:
+                    termino = str(getattr(fila, definicion.orden[0].lstrip('-')))[:3]
+                    casos.append(Caso(f'{ruta}:{fuente}', 'buscar',
+                                      url.replace('<str:fuente>', fuente) + f'?q={termino}'))
+        elif issubclass(vista, ListView):
+            casos.append(Caso(ruta, 'listar', url))
+            if muestra is not None and vista.campos_busqueda:
+                casos.append(Caso(ruta, 'buscar', f'{url}?q={str(getattr(muestra, vista.campos_busqueda[-1]))[:4]}'))
+            if muestra is not None and vista.campos_filtro:
+                campo = vista.campos_filtro[0]
+                casos.append(Caso(ruta, 'filtrar', f'{url}?{campo}={_valor_simple(getattr(muestra, campo))}'))
+        elif issubclass(vista, (UpdateView, DeleteView)):
+            if muestra is not None:
+                casos.append(Caso(ruta, 'detalle', url.replace('<int:pk>', str(muestra.pk))))
+        elif issubclass(vista, CreateView):
+            casos.append(Caso(ruta, 'formulario', url))
+            if muestra is not None:
+                instancia = vista()
+                instancia.object = None
+                formulario = instancia.get_form_class()(instance=muestra)
+                datos = {nombre: formulario[nombre].value() for nombre in formulario.fields}
+                datos = {nombre: '' if valor is None else valor for nombre, valor in datos.items()}
+                _alterar_unicos(modelo, datos, {nombre: nombre for nombre in datos})
+                casos.append(Caso(ruta, 'crear', url, 'post', datos))
+        else:
+            casos.append(Caso(ruta, 'listar', url))
+    return casos
+
+
+def medir(cliente, caso, repeticiones, calentamiento):
+    from django.db import connection, transaction
+    from django.test.utils import CaptureQueriesContext
+
+    def pedir():
+        if caso.metodo == 'get':
+            return cliente.get(caso.url)
+        # Las altas se revierten: cada repetición parte de los mismos datos
+        opciones = {'format': caso.formato} if caso.formato else {}
+        with transaction.atomic():
+            respuesta = getattr(cliente, caso.metodo)(caso.url, caso.datos, **opciones)
+            transaction.set_rollback(True)
+        return respuesta
+
+    for _ in range(calentamiento):
+        pedir()
+
+    tiempos = []
+    for _ in range(repeticiones):
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            respuesta = pedir()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+
+    return {
+        'ruta': caso.ruta,
+        'operacion': caso.operacion,
+        'metodo': caso.metodo.upper(),
+        'url': caso.url,
+        'estado': respuesta.status_code,
+        'bytes': len(getattr(respuesta, 'content', b'')),
+        # Se descuentan los SAVEPOINT/ROLLBACK de la transacción de las altas
+        'consultas_sql': sum(1 for c in consultas.captured_queries if 'SAVEPOINT' not in c['sql']),
+        'p50_ms': round(_percentil(tiempos, 50), 3),
+        'p95_ms': round(_percentil(tiempos, 95), 3),
+        'p99_ms': round(_percentil(tiempos, 99), 3),
+        'media_ms': round(sum(tiempos) / len(tiempos), 3),
+        'max_ms': round(tiempos[-1], 3),
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ejecutar(tamanos, semilla, repeticiones, calentamiento):
+    import django
+    from django.db import connection
+    from django.test import Client
+    from rest_framework.test import APIClient
+    from api.datos_sinteticos import GeneradorDatos
+
+    reporte = {
+        'commit': _commit(),
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'entorno': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'motor': connection.vendor,
+            'plataforma': platform.platform(),
+        },
+        'parametros': {'semilla': semilla, 'repeticiones': repeticiones, 'calentamiento': calentamiento},
+        'resultados': [],
+    }
+    for tamano in tamanos:
+        with base_de_datos_temporal():
+            inicio = time.perf_counter()
+            GeneradorDatos(tamano, semilla).generar()
+            print(f'[{tamano} consultas] datos generados en {time.perf_counter() - inicio:.1f} s', file=sys.stderr)
+
+            clientes = {'api': APIClient(), 'web': Client()}
+            for caso in casos_api() + casos_web():
+                cliente = clientes[caso.ruta.split(':')[0]]
+                resultado = medir(cliente, caso, repeticiones, calentamiento)
+                resultado['tamano'] = tamano
+                reporte['resultados'].append(resultado)
+                print(f'  {caso.clave:<45}{resultado["estado"]:>5}{resultado["p50_ms"]:>10.2f} ms'
+                      f'{resultado["p95_ms"]:>10.2f} ms{resultado["consultas_sql"]:>5} q', file=sys.stderr)
+    return reporte
+
+
+def comparar(base, actual, umbral, tolerancia_ms):
+    """
+    Imprime la diferencia de p50 y de consultas SQL por caso y devuelve
+    la lista de regresiones: más consultas, otro código HTTP, o una
+    latencia peor que 'umbral' % y a la vez más de 'tolerancia_ms' (así
+    el ruido en los casos de pocos milisegundos no cuenta como regresión).
+    """
+    anteriores = {(r['tamano'], r['ruta'], r['operacion']): r for r in base['resultados']}
+    regresiones = []
+    print(f'Base: {base.get("commit")}  Actual: {actual.get("commit")}')
+    print(f'{"tamaño":>8}  {"caso":<45}{"p50 base":>10}{"p50 actual":>12}{"Δ%":>8}{"SQL":>10}')
+    for r in actual['resultados']:
+        previo = anteriores.get((r['tamano'], r['ruta'], r['operacion']))
+        if previo is None:
+            continue
+        delta = (r['p50_ms'] - previo['p50_ms']) / previo['p50_ms'] * 100 if previo['p50_ms'] else 0.0
+        consultas = f'{previo["consultas_sql"]}→{r["consultas_sql"]}'
+        marca = ''
+        empeora = delta > umbral and r['p50_ms'] - previo['p50_ms'] > tolerancia_ms
+        if empeora or r['consultas_sql'] > previo['consultas_sql'] or r['estado'] != previo['estado']:
+            marca = '  <-- regresión'
+            regresiones.append(r)
+        print(f'{r["tamano"]:>8}  {r["ruta"] + " " + r["operacion"]:<45}{previo["p50_ms"]:>10.2f}'
+              f'{r["p50_ms"]:>12.2f}{delta:>+8.1f}{consultas:>10}{marca}')
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanos', default='1000,10000,100000',
+                        help='Cantidades de consultas a generar, separadas por coma.')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    parser.add_argument('--calentamiento', type=int, default=2)
+    parser.add_argument('--salida', help='Archivo donde guardar el reporte JSON (por defecto, la salida estándar).')
+    parser.add_argument('--comparar', help='Reporte JSON anterior contra el cual comparar.')
+    parser.add_argument('--umbral', type=float, default=20.0, help='Empeoramiento de p50 tolerado, en %%.')
+    parser.add_argument('--tolerancia-ms', type=float, default=2.0,
+                        help='Diferencia absoluta de p50 por debajo de la cual no se informa regresión.')
+    opciones = parser.parse_args()
+
+    iniciar_django()
+    tamanos = [int(t) for t in opciones.tamanos.split(',') if t.strip()]
+    reporte = ejecutar(tamanos, opciones.semilla, opciones.repeticiones, opciones.calentamiento)
+
+    contenido = json.dumps(reporte, indent=2, ensure_ascii=False)
+    if opciones.salida:
+        with open(opciones.salida, 'w', encoding='utf-8') as archivo:
+            archivo.write(contenido)
+    elif not opciones.comparar:
+        print(contenido)
+
+    if opciones.comparar:
+        with open(opciones.comparar, encoding='utf-8') as archivo:
+            regresiones = comparar(json.load(archivo), reporte, opciones.umbral, opciones.tolerancia_ms)
+        if regresiones:
+            print(f'{len(regresiones)} caso(s) con regresión.')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: búsqueda en el texto clínico con LIKE '%...%' (SearchFilter)
+vs. el índice de texto completo de api/busqueda_texto.py.
+
+    python -m benchmarks.bench_busqueda --consultas 200000
+
+Genera los datos con generar_datos y, para cada término, mide:
+  - LIKE: primera página del listado filtrando con icontains, y el conteo total;
+  - índice: lo mismo con ?texto= (filtrar) y el conteo total;
+  - relevancia: las 20 mejores coincidencias de /api/busqueda/ (buscar).
+"""
+import argparse
+
+from ._entorno import iniciar_django, base_de_datos_temporal, cronometrar
+
+# Términos frecuentes del generador y uno raro (el caso típico en texto clínico real)
+TERMINOS = ['lumbago', 'dermatitis contacto', 'hiper', 'rinitis alerg', 'feocromocitoma']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--consultas', type=int, default=200000)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    opciones = parser.parse_args()
+
+    iniciar_django()
+    from django.db.models import Q
+    from api.busqueda_texto import INDICES, buscar, filtrar, terminos
+    from api.datos_sinteticos import GeneradorDatos
+    from api.models import ConsultaMedica, HistorialClinico
+
+    casos = [
+        ('consulta', ConsultaMedica.objects.order_by('-fecha_consulta', '-id')),
+        ('historial', HistorialClinico.objects.order_by('-fecha_registro', '-id')),
+    ]
+
+    def like(queryset, indice, texto):
+        condicion = Q()
+        for palabra in terminos(texto):
+            condicion &= Q(*[Q(**{f'{campo}__icontains': palabra}) for campo in indice.campos], _connector=Q.OR)
+        return queryset.filter(condicion)
+
+    with base_de_datos_temporal():
+        segundos, _ = cronometrar(lambda: GeneradorDatos(opciones.consultas, semilla=0).generar(), 1)
+        print(f'Datos generados (con el índice al día) en {segundos:.1f} s')
+        consulta = ConsultaMedica.objects.first()
+        for n in range(5):
+            ConsultaMedica.objects.create(paciente_id=consulta.paciente_id, medico_id=consulta.medico_id,
+                                          motivo='Crisis hipertensiva', diagnostico='Feocromocitoma')
+            HistorialClinico.objects.create(paciente_id=consulta.paciente_id, tipo_registro='Cirugía',
+                                            descripcion='Resección de feocromocitoma')
+        print(f'{"tipo":<10}{"término":<22}{"filas":>8}{"LIKE pág.":>11}{"índice pág.":>13}'
+              f'{"LIKE total":>12}{"índice total":>14}{"relevancia":>12}   (ms)')
+        for tipo, queryset in casos:
+            indice = INDICES[tipo]
+            for texto in TERMINOS:
+                pagina_like, _ = cronometrar(lambda: list(like(queryset, indice, texto)[:50]), opciones.repeticiones)
+                pagina_fts, _ = cronometrar(lambda: list(filtrar(queryset, indice, texto)[:50]), opciones.repeticiones)
+                total_like, _ = cronometrar(lambda: like(queryset, indice, texto).count(), opciones.repeticiones)
+                total_fts, m = cronometrar(lambda: filtrar(queryset, indice, texto).count(), opciones.repeticiones)
+                relevancia, _ = cronometrar(lambda: buscar(indice, texto, 20), opciones.repeticiones)
+                # Los conteos pueden diferir: LIKE encuentra subcadenas en medio de una
+                # palabra y el índice, en cambio, no distingue tildes ('alerg' ~ 'alérgica')
+                print(f'{tipo:<10}{texto:<22}{m:>8}{pagina_like * 1000:>11.1f}{pagina_fts * 1000:>13.1f}'
+                      f'{total_like * 1000:>12.1f}{total_fts * 1000:>14.1f}{relevancia * 1000:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
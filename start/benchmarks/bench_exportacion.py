@@ -0,0 +1,72 @@
+"""
+Benchmark: memoria pico de exportar todas las consultas armando la lista
+completa (lo que hacía el listado con un page_size enorme) vs. el
+endpoint /api/consultas/exportar/ en streaming.
+
+    python -m benchmarks.bench_exportacion --filas 20000 50000
+
+Para cada tamaño mide, con tracemalloc, el pico de memoria de Python y el
+tiempo total. En streaming el pico debe mantenerse plano al crecer las filas.
+"""
+import argparse
+import tracemalloc
+
+from ._entorno import iniciar_django, base_de_datos_temporal, cronometrar
+
+
+def poblar(filas):
+    from api.datos_sinteticos import GeneradorDatos
+
+    GeneradorDatos(filas, semilla=0).generar()
+
+
+def medir(funcion):
+    tracemalloc.start()
+    try:
+        segundos, resultado = cronometrar(funcion, repeticiones=1)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return segundos, pico, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, nargs='+', default=[20000, 50000])
+    opciones = parser.parse_args()
+
+    iniciar_django()
+    from django.test import Client
+    from api.models import ConsultaMedica
+    from api.views import ConsultaMedicaViewSet
+
+    def lista_completa():
+        lectura = ConsultaMedicaViewSet.lectura_serializer_class
+        queryset = lectura.preparar_queryset(ConsultaMedicaViewSet.queryset.all())
+        return len(lectura(queryset, many=True).data)
+
+    def streaming(formato):
+        def exportar():
+            respuesta = Client().get(f'/api/consultas/exportar/?format={formato}')
+            return sum(trozo.count(b'\n') for trozo in respuesta.streaming_content)
+        return exportar
+
+    print(f'{"filas":>8}  {"modo":<16}{"tiempo (s)":>12}{"pico (MB)":>12}')
+    for filas in opciones.filas:
+        with base_de_datos_temporal():
+            poblar(filas)
+            total = ConsultaMedica.objects.count()
+            # Calentamiento: importaciones y resolución de URLs fuera de la medición
+            paciente = ConsultaMedica.objects.values_list('paciente_id', flat=True).first()
+            b''.join(Client().get(f'/api/consultas/exportar/?paciente={paciente}').streaming_content)
+            for modo, funcion in (('lista completa', lista_completa),
+                                  ('ndjson', streaming('ndjson')),
+                                  ('csv', streaming('csv'))):
+                segundos, pico, lineas = medir(funcion)
+                # El CSV agrega la línea de encabezado
+                assert lineas in (total, total + 1), (modo, lineas, total)
+                print(f'{total:>8}  {modo:<16}{segundos:>12.2f}{pico / 1024 / 1024:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
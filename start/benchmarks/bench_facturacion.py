@@ -0,0 +1,92 @@
+"""
+Benchmark: facturación de un mes recorriendo consultas -> tratamientos ->
+recetas como objetos del ORM (lo que hacía el cierre de mes) vs. el
+cálculo por columnas de api/facturacion.py.
+
+    python -m benchmarks.bench_facturacion --filas 5000 20000
+
+Para cada tamaño factura el mes con más consultas y verifica que ambos
+métodos den los mismos totales por aseguradora.
+"""
+import argparse
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from ._entorno import iniciar_django, base_de_datos_temporal, cronometrar
+
+
+def poblar(filas):
+    from api.datos_sinteticos import GeneradorDatos
+
+    GeneradorDatos(filas, semilla=0).generar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, nargs='+', default=[5000, 20000])
+    opciones = parser.parse_args()
+
+    iniciar_django()
+    from django.db import connection
+    from django.db.models import Count
+    from django.db.models.functions import TruncMonth
+    from django.utils import timezone
+    from api import facturacion
+    from api.models import ConsultaMedica
+
+    def por_objetos(periodo):
+        # Un seguro por consulta y las recetas de cada tratamiento, fila a fila
+        siguiente = facturacion._mes_siguiente(periodo)
+        totales = defaultdict(lambda: [0, Decimal(0), Decimal(0)])
+        consultas = ConsultaMedica.objects.filter(
+            fecha_consulta__date__gte=periodo, fecha_consulta__date__lt=siguiente,
+        ).exclude(estado='CANCELADA')
+        for consulta in consultas:
+            dia = timezone.localtime(consulta.fecha_consulta).date()
+            vigentes = [
+                seguro for seguro in consulta.paciente.seguros.all()
+                if seguro.fecha_inicio <= dia <= seguro.fecha_vencimiento
+                and (seguro.activo or seguro.fecha_vencimiento < timezone.localdate())
+            ]
+            seguro = max(vigentes, key=lambda s: (s.porcentaje_cobertura, s.fecha_inicio, s.id), default=None)
+            for tratamiento in consulta.tratamiento_set.all():
+                for receta in tratamiento.recetamedica_set.all():
+                    subtotal = receta.medicamento.precio_unitario * receta.cantidad
+                    porcentaje = seguro.porcentaje_cobertura if seguro else Decimal(0)
+                    fila = totales[seguro.nombre_aseguradora if seguro else facturacion.SIN_SEGURO]
+                    fila[0] += 1
+                    fila[1] += subtotal
+                    fila[2] += (subtotal * porcentaje / 100).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        return {aseguradora: tuple(fila) for aseguradora, fila in totales.items()}
+
+    def por_columnas(periodo):
+        return {
+            aseguradora: (
+                sum(fila[0] for fila in por_paciente.values()),
+                facturacion._monto(sum(fila[1] for fila in por_paciente.values())),
+                facturacion._monto(sum(fila[2] for fila in por_paciente.values())),
+            )
+            for aseguradora, por_paciente in facturacion.calcular(periodo).items()
+        }
+
+    print(f'{"filas":>8}{"recetas":>10}  {"modo":<12}{"tiempo (s)":>12}{"consultas SQL":>16}')
+    for filas in opciones.filas:
+        with base_de_datos_temporal():
+            poblar(filas)
+            periodo = (
+                ConsultaMedica.objects.annotate(mes=TruncMonth('fecha_consulta')).values('mes')
+                .annotate(n=Count('id')).order_by('-n').first()['mes']
+            )
+            periodo = timezone.localtime(periodo).date()
+            resultados = {}
+            for modo, funcion in (('objetos', por_objetos), ('columnas', por_columnas)):
+                consultas = []
+                with connection.execute_wrapper(lambda ejecutar, *args: consultas.append(1) or ejecutar(*args)):
+                    segundos, resultados[modo] = cronometrar(lambda: funcion(periodo), repeticiones=1)
+                recetas = sum(fila[0] for fila in resultados[modo].values())
+                print(f'{filas:>8}{recetas:>10}  {modo:<12}{segundos:>12.2f}{len(consultas):>16}')
+            assert resultados['objetos'] == resultados['columnas']
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Benchmark: planes de ejecución de los filtros de la API antes y después de
+la migración de índices (0005_indices_filtros_api).
+
+    python -m benchmarks.bench_indices --filas 1000000
+
+Crea una base temporal, la deja en la migración anterior a los índices,
+la puebla con 'filas' consultas, citas e historiales y ejecuta cada consulta
+mostrando su plan (QuerySet.explain()) y su tiempo. Luego aplica la
+migración de índices, actualiza estadísticas y repite las mismas consultas.
+El generador es determinista (--semilla), así que el resultado es reproducible.
+"""
+import argparse
+import random
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+
+from ._entorno import iniciar_django, base_de_datos_temporal, cronometrar
+
+MIGRACION_SIN_INDICES = '0004_cita_unica_medico_fecha_hora'
+MIGRACION_CON_INDICES = '0005_indices_filtros_api'
+
+ESTADOS_CONSULTA = ['PENDIENTE', 'REALIZADA', 'CANCELADA']
+ESTADOS_CITA = ['AGENDADA', 'CONFIRMADA', 'REALIZADA', 'CANCELADA', 'NO_ASISTIO']
+
+
+def modelos_historicos(migracion):
+    """
+    Modelos tal como estaban en 'migracion'. Los de api.models tienen columnas
+    de migraciones posteriores (ej: rut_normalizado), que aún no existen en
+    la base, así que poblar y consultar con ellos falla.
+    """
+    from django.db import connection
+    from django.db.migrations.executor import MigrationExecutor
+
+    return MigrationExecutor(connection).loader.project_state(('api', migracion)).apps
+
+
+def poblar(apps, filas, semilla):
+    Especialidad, Paciente, Medico, ConsultaMedica, Horario, CitaMedica, HistorialClinico, Seguro = (
+        apps.get_model('api', nombre) for nombre in (
+            'Especialidad', 'Paciente', 'Medico', 'ConsultaMedica', 'Horario', 'CitaMedica', 'HistorialClinico', 'Seguro',
+        ))
+
+    azar = random.Random(semilla)
+    lote = 5000
+    n_pacientes = max(filas // 10, 100)
+    n_medicos = max(filas // 2000, 10)
+    inicio = datetime(2020, 1, 1, tzinfo=dt_timezone.utc)
+    segundos = 5 * 365 * 24 * 3600
+
+    especialidades = Especialidad.objects.bulk_create([Especialidad(nombre=f'Especialidad {n}') for n in range(20)])
+    Medico.objects.bulk_create((
+        Medico(nombre=f'Medico{n}', apellido=f'Apellido{n}', rut=f'M{n}', correo=f'm{n}@x.cl', telefono='1',
+               especialidad=especialidades[n % 20], activo=n % 10 != 0)
+        for n in range(n_medicos)), batch_size=lote)
+    Paciente.objects.bulk_create((
+        Paciente(rut=f'P{n}', nombre=f'Paciente{n}', apellido=f'Apellido{n}', fecha_nacimiento=date(1990, 1, 1),
+                 tipo_sangre='O+', correo=f'p{n}@x.cl', telefono='1', direccion='Calle 1')
+        for n in range(n_pacientes)), batch_size=lote)
+    medicos = list(Medico.objects.values_list('id', flat=True))
+    pacientes = list(Paciente.objects.values_list('id', flat=True))
+
+    Horario.objects.bulk_create((
+        Horario(medico_id=m, dia_semana=d, hora_inicio=time(9), hora_fin=time(13), activo=azar.random() < 0.9)
+        for m in medicos for d in range(1, 6)), batch_size=lote)
+    Seguro.objects.bulk_create((
+        Seguro(paciente_id=p, nombre_aseguradora='Fonasa', numero_poliza=f'S{p}', fecha_inicio=date(2020, 1, 1),
+               fecha_vencimiento=date(2020, 1, 1) + timedelta(days=azar.randrange(3000)),
+               porcentaje_cobertura=50, activo=azar.random() < 0.7)
+        for p in pacientes), batch_size=lote)
+
+    def fecha():
+        return inicio + timedelta(seconds=azar.randrange(segundos))
+
+    ConsultaMedica.objects.bulk_create((
+        ConsultaMedica(paciente_id=azar.choice(pacientes), medico_id=azar.choice(medicos), motivo='Control',
+                       fecha_consulta=fecha(), estado=azar.choice(ESTADOS_CONSULTA))
+        for _ in range(filas)), batch_size=lote)
+    # Cada cita recibe una hora distinta dentro de la agenda para no violar el cupo único
+    CitaMedica.objects.bulk_create((
+        CitaMedica(paciente_id=azar.choice(pacientes), medico_id=medicos[n % len(medicos)], motivo='Control',
+                   fecha_hora_cita=inicio + timedelta(minutes=30 * (n // len(medicos))),
+                   estado=azar.choice(ESTADOS_CITA))
+        for n in range(filas)), batch_size=lote)
+    HistorialClinico.objects.bulk_create((
+        HistorialClinico(paciente_id=azar.choice(pacientes), tipo_registro=azar.choice(['Alergia', 'Cirugía', 'Control']),
+                         descripcion='Detalle', fecha_registro=fecha().date())
+        for _ in range(filas)), batch_size=lote)
+    return medicos, pacientes
+
+
+def consultas(apps, medico, paciente, especialidad):
+    """ Consultas representativas de los ViewSets, el admin y el motor de disponibilidad. """
+    ConsultaMedica, Horario, CitaMedica, HistorialClinico, Seguro, Medico = (
+        apps.get_model('api', nombre) for nombre in (
+            'ConsultaMedica', 'Horario', 'CitaMedica', 'HistorialClinico', 'Seguro', 'Medico',
+        ))
+
+    desde = datetime(2022, 3, 1, tzinfo=dt_timezone.utc)
+    return [
+        ('consultas ?medico=&estado=', ConsultaMedica.objects.filter(medico_id=medico, estado='PENDIENTE')
+         .order_by('-fecha_consulta', '-id')[:51]),
+        ('consultas ?paciente=', ConsultaMedica.objects.filter(paciente_id=paciente)
+         .order_by('-fecha_consulta', '-id')[:51]),
+        ('consultas página 1', ConsultaMedica.objects.order_by('-fecha_consulta', '-id')[:51]),
+        ('consultas date_hierarchy (mes)', ConsultaMedica.objects.filter(
+            fecha_consulta__gte=desde, fecha_consulta__lt=desde + timedelta(days=31)).order_by('-fecha_consulta')[:100]),
+        ('horarios ?medico=&dia_semana=&activo=', Horario.objects.filter(medico_id=medico, dia_semana=2, activo=True)),
+        ('citas ?paciente=&estado=', CitaMedica.objects.filter(paciente_id=paciente, estado='AGENDADA')
+         .order_by('-fecha_hora_cita', '-id')[:51]),
+        ('citas página 1', CitaMedica.objects.order_by('-fecha_hora_cita', '-id')[:51]),
+        ('citas agenda médico (semana)', CitaMedica.objects.filter(
+            medico_id=medico, fecha_hora_cita__gte=desde, fecha_hora_cita__lt=desde + timedelta(days=7))
+         .exclude(estado='CANCELADA')),
+        ('historiales ?paciente=', HistorialClinico.objects.filter(paciente_id=paciente)
+         .order_by('-fecha_registro', '-id')[:51]),
+        ('historiales ?tipo_registro=', HistorialClinico.objects.filter(tipo_registro='Cirugía')
+         .order_by('-fecha_registro', '-id')[:51]),
+        ('médicos activos por especialidad', Medico.objects.filter(especialidad_id=especialidad, activo=True)),
+        ('seguros vencidos aún activos', Seguro.objects.filter(activo=True, fecha_vencimiento__lt=date(2021, 1, 1))[:500]),
+    ]
+
+
+def medir(apps, medico, paciente, especialidad, repeticiones):
+    resultados = {}
+    for nombre, queryset in consultas(apps, medico, paciente, especialidad):
+        duracion, _ = cronometrar(lambda: list(queryset.all()), repeticiones)
+        resultados[nombre] = (duracion, queryset.explain())
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, default=1000000)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    opciones = parser.parse_args()
+
+    iniciar_django()
+    from django.core.management import call_command
+    from django.db import connection
+
+    with base_de_datos_temporal():
+        call_command('migrate', 'api', MIGRACION_SIN_INDICES, verbosity=0)
+        # Los índices no cambian las columnas: los mismos modelos sirven antes y después
+        apps = modelos_historicos(MIGRACION_SIN_INDICES)
+        medicos, pacientes = poblar(apps, opciones.filas, opciones.semilla)
+        argumentos = (apps, medicos[len(medicos) // 2], pacientes[len(pacientes) // 2], 1, opciones.repeticiones)
+
+        antes = medir(*argumentos)
+        call_command('migrate', 'api', MIGRACION_CON_INDICES, verbosity=0)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        despues = medir(*argumentos)
+
+    print(f'Filas por tabla: {opciones.filas}  (motor: {connection.vendor})\n')
+    for nombre, (t_antes, plan_antes) in antes.items():
+        t_despues, plan_despues = despues[nombre]
+        print(f'== {nombre}: {t_antes * 1000:.2f} ms -> {t_despues * 1000:.2f} ms')
+        print(f'   antes:   {" | ".join(plan_antes.splitlines())}')
+        print(f'   después: {" | ".join(plan_despues.splitlines())}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark: renderizado y parseo JSON de la API con DRF (json estándar)
+vs. api/renderizadores.py (orjson), sobre listados de 10k filas.
+
+    python -m benchmarks.bench_json --filas 10000
+
+Para cada modelo arma los datos del listado con el serializer de lectura
+(Decimal en porcentaje_cobertura, fechas y fechas con hora) y mide:
+  - serializar: to_representation genérico de DRF vs. el de LecturaSerializer;
+  - renderizar: JSONRenderer vs. JSONRapidoRenderer (y verifica que la salida
+    sea idéntica);
+  - parsear: JSONParser vs. JSONRapidoParser sobre el cuerpo renderizado.
+Los resultados se expresan en filas por segundo.
+"""
+import argparse
+from io import BytesIO
+
+from ._entorno import iniciar_django, base_de_datos_temporal, cronometrar
+from .bench_serializacion import poblar
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, default=10000)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    opciones = parser.parse_args()
+
+    iniciar_django()
+    from rest_framework import serializers
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+    from api import renderizadores, views
+
+    if renderizadores.orjson is None:
+        print('orjson no está instalado: JSONRapido* usa el json estándar (se mide el respaldo).')
+
+    casos = [
+        views.ConsultaMedicaViewSet,
+        views.SeguroViewSet,
+        views.CitaMedicaViewSet,
+        views.HistorialClinicoViewSet,
+    ]
+    repeticiones = opciones.repeticiones
+
+    def por_segundo(segundos):
+        return f'{opciones.filas / segundos:>12,.0f}'
+
+    with base_de_datos_temporal():
+        poblar(opciones.filas)
+        print(f'{"ViewSet":<26}{"etapa":<12}{"DRF (filas/s)":>16}{"rápido (filas/s)":>18}{"mejora":>9}')
+        for viewset in casos:
+            lectura = viewset.lectura_serializer_class
+            filas = list(lectura.preparar_queryset(viewset.queryset.all()))
+
+            instancia = lectura()
+            generico, datos_genericos = cronometrar(
+                lambda: [serializers.Serializer.to_representation(instancia, fila) for fila in filas], repeticiones)
+            rapido, datos = cronometrar(lambda: lectura(filas, many=True).data, repeticiones)
+            assert datos == datos_genericos
+            etapas = [('serializar', generico, rapido)]
+
+            contenido_drf = JSONRenderer().render(datos)
+            antes, _ = cronometrar(lambda: JSONRenderer().render(datos), repeticiones)
+            despues, contenido = cronometrar(lambda: renderizadores.JSONRapidoRenderer().render(datos), repeticiones)
+            assert contenido == contenido_drf
+            etapas.append(('renderizar', antes, despues))
+
+            antes, _ = cronometrar(lambda: JSONParser().parse(BytesIO(contenido)), repeticiones)
+            despues, _ = cronometrar(lambda: renderizadores.JSONRapidoParser().parse(BytesIO(contenido)), repeticiones)
+            etapas.append(('parsear', antes, despues))
+
+            for etapa, antes, despues in etapas:
+                print(f'{viewset.__name__:<26}{etapa:<12}{por_segundo(antes):>16}{por_segundo(despues):>18}'
+                      f'{antes / despues:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
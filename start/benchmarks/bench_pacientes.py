@@ -0,0 +1,68 @@
+"""
+Benchmark: búsqueda de pacientes por RUT y por nombre con icontains sobre
+rut/nombre/apellido (el SearchFilter anterior) vs. las claves normalizadas
+e indexadas de Paciente (buscar / por_rut).
+
+    python -m benchmarks.bench_pacientes --pacientes 1000000
+
+Genera los pacientes con generar_datos y, para cada término, mide la
+primera página (20 filas en el orden del listado) y el conteo total, y
+la búsqueda exacta de un RUT escrito en varios formatos.
+"""
+import argparse
+
+from ._entorno import iniciar_django, base_de_datos_temporal, cronometrar
+
+TERMINOS = ['gonz', 'gonzález muñ', 'perez', 'matias ro', 'zzz']
+PAGINA = 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pacientes', type=int, default=1000000)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    opciones = parser.parse_args()
+
+    iniciar_django()
+    from django.db import transaction
+    from django.db.models import Q
+    from api.datos_sinteticos import CONSULTAS_POR_PACIENTE, GeneradorDatos
+    from api.models import Paciente
+    from api.rut import clave_rut
+
+    def icontains(texto):
+        return Paciente.objects.filter(Q(rut__icontains=texto) | Q(nombre__icontains=texto) | Q(apellido__icontains=texto))
+
+    with base_de_datos_temporal():
+        generador = GeneradorDatos(opciones.pacientes * CONSULTAS_POR_PACIENTE, semilla=0, tamano_lote=10000)
+        with transaction.atomic():
+            segundos, _ = cronometrar(generador.generar_pacientes, 1)
+        print(f'{Paciente.objects.count():,} pacientes generados en {segundos:.1f} s')
+
+        muestra = Paciente.objects.order_by('id')[opciones.pacientes // 2]
+        cuerpo = clave_rut(muestra.rut)[:-1]
+        formatos = [muestra.rut, f'{cuerpo}-{muestra.rut[-1]}', f'{cuerpo}{muestra.rut[-1]}']
+        terminos = TERMINOS + formatos[1:] + [cuerpo[:5]]
+
+        print(f'{"término":<18}{"filas":>9}{"antes":>9}{"pág. (ms)":>11}{"total (ms)":>12}'
+              f'{"antes pág.":>12}{"antes total":>13}')
+        for texto in terminos:
+            pagina, _ = cronometrar(lambda: list(Paciente.objects.buscar(texto).order_by('-id')[:PAGINA]),
+                                    opciones.repeticiones)
+            total, filas = cronometrar(lambda: Paciente.objects.buscar(texto).count(), opciones.repeticiones)
+            pagina_antes, _ = cronometrar(lambda: list(icontains(texto).order_by('-id')[:PAGINA]),
+                                          opciones.repeticiones)
+            total_antes, filas_antes = cronometrar(lambda: icontains(texto).count(), opciones.repeticiones)
+            # Antes no se encontraba el RUT sin el formato guardado ni el nombre sin tildes
+            print(f'{texto:<18}{filas:>9}{filas_antes:>9}{pagina * 1000:>11.2f}{total * 1000:>12.2f}'
+                  f'{pagina_antes * 1000:>12.2f}{total_antes * 1000:>13.2f}')
+
+        print(f'\n{"RUT exacto":<18}{"por_rut (ms)":>14}{"rut= (ms)":>11}')
+        for texto in formatos:
+            exacto, _ = cronometrar(lambda: Paciente.objects.por_rut(texto), opciones.repeticiones)
+            antes, _ = cronometrar(lambda: Paciente.objects.filter(rut=texto).first(), opciones.repeticiones)
+            print(f'{texto:<18}{exacto * 1000:>14.3f}{antes * 1000:>11.3f}')
+
+
+if __name__ == '__main__':
+    main()
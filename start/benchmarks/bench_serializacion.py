@@ -0,0 +1,93 @@
+"""
+Benchmark: serialización de listados con SerializerMethodField vs. nombres
+calculados en SQL (serializers de lectura de api/serializer.py).
+
+    python -m benchmarks.bench_serializacion --filas 10000
+
+Para cada modelo mide el tiempo de consultar y serializar todas las filas
+con el serializer de escritura (modelo completo + get_*) y con el de
+lectura (values() anotado), y lo expresa en milisegundos por 10k filas.
+"""
+import argparse
+from datetime import date, time, timedelta
+
+from ._entorno import iniciar_django, base_de_datos_temporal, cronometrar
+
+
+def poblar(filas):
+    from django.utils import timezone
+    from api.models import (
+        Especialidad, Paciente, Medico, ConsultaMedica, Seguro, Horario, CitaMedica, HistorialClinico,
+    )
+
+    especialidad = Especialidad.objects.create(nombre='Medicina General')
+    medicos = Medico.objects.bulk_create([
+        Medico(nombre=f'Medico{n}', apellido=f'Apellido{n}', rut=f'M{n}', correo=f'm{n}@x.cl',
+               telefono='1', especialidad=especialidad)
+        for n in range(50)
+    ])
+    pacientes = Paciente.objects.bulk_create([
+        Paciente(rut=f'P{n}', nombre=f'Paciente{n}', apellido=f'Apellido{n}', fecha_nacimiento=date(1990, 1, 1),
+                 tipo_sangre='O+', correo=f'p{n}@x.cl', telefono='1', direccion='Calle 1')
+        for n in range(1000)
+    ])
+    ahora = timezone.now()
+    lote = 2000
+    ConsultaMedica.objects.bulk_create((
+        ConsultaMedica(paciente=pacientes[n % 1000], medico=medicos[n % 50], motivo='Control',
+                       fecha_consulta=ahora - timedelta(minutes=n))
+        for n in range(filas)), batch_size=lote)
+    CitaMedica.objects.bulk_create((
+        CitaMedica(paciente=pacientes[n % 1000], medico=medicos[n % 50], motivo='Control',
+                   fecha_hora_cita=ahora - timedelta(minutes=n))
+        for n in range(filas)), batch_size=lote)
+    Seguro.objects.bulk_create((
+        Seguro(paciente=pacientes[n % 1000], nombre_aseguradora='Fonasa', numero_poliza=f'P{n}',
+               fecha_inicio=date(2025, 1, 1), fecha_vencimiento=date(2026, 1, 1), porcentaje_cobertura=50)
+        for n in range(filas)), batch_size=lote)
+    Horario.objects.bulk_create((
+        Horario(medico=medicos[n % 50], dia_semana=n % 7 + 1, hora_inicio=time(9), hora_fin=time(13))
+        for n in range(filas)), batch_size=lote)
+    HistorialClinico.objects.bulk_create((
+        HistorialClinico(paciente=pacientes[n % 1000], tipo_registro='Alergia', descripcion='Detalle',
+                         registrado_por=medicos[n % 50] if n % 2 else None)
+        for n in range(filas)), batch_size=lote)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, default=10000)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    opciones = parser.parse_args()
+
+    iniciar_django()
+    from api import views
+
+    casos = [
+        views.ConsultaMedicaViewSet,
+        views.SeguroViewSet,
+        views.HorarioViewSet,
+        views.CitaMedicaViewSet,
+        views.HistorialClinicoViewSet,
+    ]
+
+    with base_de_datos_temporal():
+        poblar(opciones.filas)
+        escala = 10000 / opciones.filas
+        print(f'{"ViewSet":<26}{"antes (ms/10k)":>16}{"después (ms/10k)":>18}{"mejora":>9}')
+        for viewset in casos:
+            queryset = viewset.queryset
+            lectura = viewset.lectura_serializer_class
+
+            antes, datos_antes = cronometrar(
+                lambda: viewset.serializer_class(queryset.all(), many=True).data, opciones.repeticiones)
+            despues, datos_despues = cronometrar(
+                lambda: lectura(lectura.preparar_queryset(queryset.all()), many=True).data, opciones.repeticiones)
+            assert len(datos_antes) == len(datos_despues) == opciones.filas
+
+            print(f'{viewset.__name__:<26}{antes * 1000 * escala:>16.1f}{despues * 1000 * escala:>18.1f}'
+                  f'{antes / despues:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +45,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para que el tiempo medido incluya al resto de los middleware
+    'api.instrumentacion.InstrumentacionMiddleware',
+    'api.perfilado.PerfiladoMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -80,10 +84,127 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # SQLite no tiene bloqueos de fila: las transacciones toman el
+            # bloqueo de escritura al comenzar y las concurrentes esperan
+            # hasta 'timeout' segundos en vez de fallar con "database is locked".
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # Base de tests en archivo (no en memoria compartida) para que los
+        # tests concurrentes usen el mismo esquema de bloqueos que producción.
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    }
+}
+
+
+# Cachés
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# 'respuestas' guarda las respuestas de los endpoints de catálogo y las
+# versiones por modelo (api/cache_respuestas.py, api/versiones.py).
+# LocMemCache desaloja la entrada usada hace más tiempo (LRU); con
+# CULL_FREQUENCY igual a MAX_ENTRIES, al llenarse desaloja de a una.
+# LocMemCache es propia de cada proceso: con varios workers, una escritura
+# solo avanza las versiones del worker que la atendió y los demás seguirían
+# sirviendo respuestas viejas y contestando 304 a ETag obsoletos. Para
+# producción se configura un backend compartido con la variable de entorno
+# CACHE_RESPUESTAS_URL (redis://host:6379/1 o memcached://host:11211, con
+# política de desalojo allkeys-lru).
+
+CACHE_RESPUESTAS_URL = os.environ.get('CACHE_RESPUESTAS_URL', '')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'respuestas': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'respuestas',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 2000,
+            'CULL_FREQUENCY': 2000,
+        },
+    },
+}
+
+if CACHE_RESPUESTAS_URL.startswith(('redis://', 'rediss://')):
+    CACHES['respuestas'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_RESPUESTAS_URL,
+        'TIMEOUT': 300,
+    }
+elif CACHE_RESPUESTAS_URL.startswith('memcached://'):
+    CACHES['respuestas'] = {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': CACHE_RESPUESTAS_URL.removeprefix('memcached://'),
+        'TIMEOUT': 300,
     }
+
+# La caché de respuestas, los ETag y la caché de coberturas solo se usan
+# con un backend compartido o en desarrollo (DEBUG, un solo proceso); con
+# LocMemCache fuera de DEBUG se responde siempre desde la base de datos.
+CACHE_RESPUESTAS_ACTIVA = DEBUG or bool(CACHE_RESPUESTAS_URL)
+
+
+# Django REST Framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    # Paginación por cursor en todos los listados (ver api/pagination.py)
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.CursorPaginacion',
+    # Activa los 'filterset_fields' y 'search_fields' declarados en los ViewSets
+    'DEFAULT_FILTER_BACKENDS': [
+        'django_filters.rest_framework.DjangoFilterBackend',
+        'rest_framework.filters.SearchFilter',
+        # ?texto= con el índice de texto completo (ver api/busqueda_texto.py)
+        'api.busqueda_texto.BusquedaTextoFilter',
+    ],
+    # JSON con orjson si está instalado; si no, el json estándar (ver api/renderizadores.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderizadores.JSONRapidoRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderizadores.JSONRapidoParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 
+# Listados HTML (api/web_views.py): registros por página y máximo que
+# puede pedir el usuario con ?page_size=
+WEB_PAGINATE_BY = 25
+WEB_MAX_PAGINATE_BY = 200
+
+
+# Instrumentación por vista (api/instrumentacion.py): tiempo, consultas SQL,
+# consultas duplicadas y consultas lentas con su EXPLAIN. Las métricas se
+# publican en /metricas/ (formato Prometheus) para las IPs permitidas.
+INSTRUMENTACION_ACTIVA = False
+INSTRUMENTACION_CONSULTA_LENTA_MS = 100
+INSTRUMENTACION_EXPLAIN = True
+INSTRUMENTACION_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+INSTRUMENTACION_IPS_PERMITIDAS = ('127.0.0.1', '::1')
+
+
+# Perfilado por muestreo (api/perfilado.py). Se perfila la fracción indicada
+# de peticiones, más las que coinciden con PERFILADO_RUTAS (expresiones
+# regulares sobre la ruta) o traen la cabecera PERFILADO_CABECERA.
+# FORMATO: 'pstats' (cProfile) o 'colapsado' (pilas para flamegraphs).
+PERFILADO_ACTIVO = False
+PERFILADO_FRACCION = 0.01
+PERFILADO_RUTAS = ()  # ej: (r'^/api/consultas/$', r'^/admin/api/[^/]+/$')
+PERFILADO_CABECERA = None  # ej: 'X-Perfilar'; solo detrás de un proxy que la filtre
+PERFILADO_DIRECTORIO = BASE_DIR / 'perfiles'
+PERFILADO_MAX_MB = 100
+PERFILADO_FORMATO = 'pstats'
+PERFILADO_INTERVALO_MS = 5
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -4,6 +4,8 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from api.instrumentacion import vista_metricas
+
 # Configuración de la documentación Swagger/OpenAPI
 schema_view = get_schema_view(
    openapi.Info(
@@ -32,6 +34,9 @@ urlpatterns = [
     # Esto es el login de la API navegable de Django REST Framework
     path('api-auth/', include('rest_framework.urls', namespace='rest_framework')),
     
+    # 3.b. Métricas de instrumentación por vista (formato Prometheus, ver INSTRUMENTACION_* en settings)
+    path('metricas/', vista_metricas, name='metricas'),
+
     # 4. Documentación de la API (Swagger y Redoc)
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),